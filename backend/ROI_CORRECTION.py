@@ -9,27 +9,30 @@
 #
 # Prasyarat:
 # 1. Library: pip install pymavlink ultralytics opencv-python
+#    Kamera dan model dijalankan oleh vision_service.py (jalankan lebih dulu).
 # 2. Parameter PX4: 'NAV_YAW_MODE' harus diatur ke 3 (Towards ROI).
 # =================================================================
 
 import time
 import math
+import bisect
+import threading
+from collections import deque, namedtuple
 import cv2
-from ultralytics import YOLO
 from pymavlink import mavutil
+from detections import split_balls, find_best_gate
+from vision_client import VisionClient
 
 # =================================================================
 # BAGIAN 1: KONFIGURASI
 # =================================================================
 class Config:
     """Menyimpan semua parameter konfigurasi di satu tempat."""
-    # --- Pengaturan Model & Kamera ---
-    MODEL_PATH = '../backend/best (3).pt'  # Path ke model YOLOv8 Anda
-    RED_BALL_CLASS_ID = 1
-    GREEN_BALL_CLASS_ID = 0
-    CAMERA_INDEX = 1
+    # --- Pengaturan Vision Service (pemilik kamera & model) ---
+    VISION_SERVICE_HOST = "127.0.0.1"
+    VISION_SERVICE_PORT = 8765
+    VISION_DETECTOR = "buoy_v8"  # Nama detektor di vision_service.Config.DETECTORS (YOLOv8 'best (3).pt')
     FRAME_WIDTH = 640
-    FRAME_HEIGHT = 480
 
     # --- Parameter Kalibrasi (WAJIB DISESUAIKAN) ---
     FOCAL_LENGTH_PX = 500.0  # Nilai hasil kalibrasi Anda yang akurat
@@ -39,32 +42,158 @@ class Config:
     CONNECTION_STRING = 'udp:192.168.4.2:14550' # Sesuaikan (misal: '/dev/ttyUSB0')
     ROI_SEND_RATE_HZ = 4  # Frekuensi pengiriman perintah ROI (2-5 Hz)
 
+    # --- Kompensasi Latensi ---
+    STATE_HISTORY_SECONDS = 2.0  # Panjang riwayat attitude/GPS untuk interpolasi
+    CAMERA_LATENCY_S = 0.03      # Perkiraan jeda sensor kamera -> cap.read() selesai
+
 # =================================================================
 # BAGIAN 2: KELAS BANTUAN
 # =================================================================
 
+class VehicleSnapshot(namedtuple('VehicleSnapshot', [
+        'lat', 'lon', 'alt', 'yaw_rad',
+        'gps_time', 'attitude_time',        # waktu terima (time.monotonic)
+        'gps_rate_hz', 'attitude_rate_hz'])):
+    """Salinan state kendaraan yang tidak bisa diubah; aman dibaca dari thread mana pun."""
+    __slots__ = ()
+
+    def is_ready(self):
+        """Memeriksa apakah semua data telemetri yang dibutuhkan sudah tersedia."""
+        return all(v is not None for v in [self.lat, self.lon, self.alt, self.yaw_rad])
+
+    def age(self, field_time):
+        """Umur data (detik) dari salah satu field waktu, misal snapshot.age(snapshot.attitude_time)."""
+        return None if field_time is None else time.monotonic() - field_time
+
+
 class VehicleState:
-    """Menyimpan dan mengelola data telemetri terakhir dari kendaraan."""
-    def __init__(self):
-        self.lat = None
-        self.lon = None
-        self.alt = None
-        self.yaw_rad = None
-
-    def update_gps(self, msg):
+    """
+    Menyimpan data telemetri terakhir dari kendaraan.
+
+    Hanya thread MavlinkReader yang menulis: setiap pesan menghasilkan snapshot
+    baru yang menggantikan referensi lama (penugasan atribut bersifat atomik),
+    sehingga loop kamera cukup membaca `snapshot` tanpa lock.
+
+    Selain itu disimpan riwayat singkat sampel attitude dan GPS bertimestamp
+    agar pose dapat diinterpolasi pada waktu frame diambil (`pose_at`).
+    """
+    def __init__(self, history_seconds=2.0):
+        self.snapshot = VehicleSnapshot(None, None, None, None, None, None, None, None)
+        self.history_seconds = history_seconds
+        self._history_lock = threading.Lock()
+        self._attitude_history = deque()  # (t, yaw_rad)
+        self._gps_history = deque()       # (t, lat, lon, alt)
+
+    def update_gps(self, msg, now=None):
         """Memperbarui state dari pesan GPS_RAW_INT."""
         if msg.fix_type >= 3:
-            self.lat = msg.lat / 1e7
-            self.lon = msg.lon / 1e7
-            self.alt = msg.alt / 1e3
-
-    def update_attitude(self, msg):
+            now = time.monotonic() if now is None else now
+            snap = self.snapshot
+            self.snapshot = snap._replace(
+                lat=msg.lat / 1e7, lon=msg.lon / 1e7, alt=msg.alt / 1e3, gps_time=now,
+                gps_rate_hz=_update_rate(snap.gps_rate_hz, snap.gps_time, now))
+            self._append_history(self._gps_history, (now, msg.lat / 1e7, msg.lon / 1e7, msg.alt / 1e3))
+
+    def update_attitude(self, msg, now=None):
         """Memperbarui state dari pesan ATTITUDE."""
-        self.yaw_rad = msg.yaw
+        now = time.monotonic() if now is None else now
+        snap = self.snapshot
+        self.snapshot = snap._replace(
+            yaw_rad=msg.yaw, attitude_time=now,
+            attitude_rate_hz=_update_rate(snap.attitude_rate_hz, snap.attitude_time, now))
+        self._append_history(self._attitude_history, (now, msg.yaw))
 
     def is_ready(self):
-        """Memeriksa apakah semua data telemetri yang dibutuhkan sudah tersedia."""
-        return all(v is not None for v in [self.lat, self.lon, self.alt, self.yaw_rad])
+        return self.snapshot.is_ready()
+
+    def _append_history(self, history, sample):
+        with self._history_lock:
+            history.append(sample)
+            while history and sample[0] - history[0][0] > self.history_seconds:
+                history.popleft()
+
+    def pose_at(self, t):
+        """
+        Snapshot dengan yaw dan posisi GPS yang diinterpolasi pada waktu `t`
+        (time.monotonic). Di luar rentang riwayat dipakai sampel terdekat.
+        """
+        snap = self.snapshot
+        with self._history_lock:
+            attitude = _bracket(self._attitude_history, t)
+            gps = _bracket(self._gps_history, t)
+        if attitude:
+            (t0, yaw0), (t1, yaw1) = attitude
+            snap = snap._replace(yaw_rad=_interpolate_angle(yaw0, yaw1, _fraction(t0, t1, t)))
+        if gps:
+            (t0, *p0), (t1, *p1) = gps
+            f = _fraction(t0, t1, t)
+            lat, lon, alt = (a + (b - a) * f for a, b in zip(p0, p1))
+            snap = snap._replace(lat=lat, lon=lon, alt=alt)
+        return snap
+
+
+def _bracket(history, t):
+    """Dua sampel yang mengapit waktu t (atau sampel terdekat dua kali jika di luar rentang)."""
+    if not history:
+        return None
+    if t <= history[0][0]:
+        return history[0], history[0]
+    if t >= history[-1][0]:
+        return history[-1], history[-1]
+    pos = bisect.bisect_right(history, t, key=lambda sample: sample[0])
+    return history[pos - 1], history[pos]
+
+
+def _fraction(t0, t1, t):
+    return 0.0 if t1 <= t0 else (t - t0) / (t1 - t0)
+
+
+def _interpolate_angle(a0, a1, f):
+    """Interpolasi sudut (radian) melalui jalur terpendek, menangani lompatan di ±pi."""
+    diff = math.atan2(math.sin(a1 - a0), math.cos(a1 - a0))
+    return math.atan2(math.sin(a0 + diff * f), math.cos(a0 + diff * f))
+
+
+def _update_rate(rate_hz, last_time, now):
+    """Estimasi laju pesan (Hz) dengan rata-rata bergerak eksponensial."""
+    if last_time is None or now <= last_time:
+        return rate_hz
+    instant = 1.0 / (now - last_time)
+    return instant if rate_hz is None else 0.9 * rate_hz + 0.1 * instant
+
+
+class MavlinkReader(threading.Thread):
+    """
+    Thread yang terus menguras link MAVLink dan memperbarui VehicleState,
+    sehingga loop kamera tidak pernah melakukan I/O link dan selalu memakai
+    attitude/GPS terbaru walaupun autopilot mengirim jauh lebih cepat dari FPS kamera.
+    """
+    MESSAGE_TYPES = ['GPS_RAW_INT', 'ATTITUDE']
+
+    def __init__(self, master, vehicle_state):
+        super().__init__(name="mavlink-reader", daemon=True)
+        self.master = master
+        self.vehicle_state = vehicle_state
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                msg = self.master.recv_match(type=self.MESSAGE_TYPES, blocking=True, timeout=0.5)
+            except Exception as e:
+                print(f"Error membaca MAVLink: {e}")
+                time.sleep(0.5)
+                continue
+            if msg is None:
+                continue
+            msg_type = msg.get_type()
+            if msg_type == 'GPS_RAW_INT':
+                self.vehicle_state.update_gps(msg)
+            elif msg_type == 'ATTITUDE':
+                self.vehicle_state.update_attitude(msg)
 
 # =================================================================
 # BAGIAN 3: KELAS UTAMA NAVIGATOR
@@ -75,28 +204,15 @@ class VisionNavigator:
 
     def __init__(self, config):
         self.config = config
-        self.vehicle_state = VehicleState()
-        self.model = self._load_model()
-        self.cap = self._init_camera()
+        self.vehicle_state = VehicleState(history_seconds=self.config.STATE_HISTORY_SECONDS)
+        self.cap = VisionClient(self.config.VISION_SERVICE_HOST, self.config.VISION_SERVICE_PORT,
+                                detectors=[self.config.VISION_DETECTOR], frames="shm")
         self.master = self._init_mavlink()
+        self.mavlink_reader = MavlinkReader(self.master, self.vehicle_state)
+        self.mavlink_reader.start()
         self.image_center_x = self.config.FRAME_WIDTH / 2.0
         self.last_roi_time = 0
 
-    def _load_model(self):
-        """Memuat model YOLOv8."""
-        print(f"Memuat model YOLOv8 dari: {self.config.MODEL_PATH}")
-        return YOLO(self.config.MODEL_PATH)
-
-    def _init_camera(self):
-        """Menginisialisasi koneksi kamera."""
-        print(f"Membuka kamera di indeks: {self.config.CAMERA_INDEX}")
-        cap = cv2.VideoCapture(self.config.CAMERA_INDEX)
-        cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.config.FRAME_WIDTH)
-        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.config.FRAME_HEIGHT)
-        if not cap.isOpened():
-            raise IOError("FATAL: Tidak bisa membuka kamera.")
-        return cap
-
     def _init_mavlink(self):
         """Menginisialisasi koneksi MAVLink ke flight controller."""
         print(f"Menghubungkan ke PX4 di: {self.config.CONNECTION_STRING}...")
@@ -109,23 +225,26 @@ class VisionNavigator:
         """Menjalankan loop utama program."""
         try:
             while True:
-                # 1. Dapatkan data terbaru dari kendaraan dan kamera
-                self._update_telemetry()
-                ret, frame = self.cap.read()
-                if not ret:
-                    time.sleep(0.1)
+                # 1. Dapatkan frame terbaru beserta deteksinya dari vision service
+                #    (telemetri diperbarui oleh MavlinkReader)
+                packet = self.cap.read_packet(writable=True)  # Frame digambari, jadi salin dari ring
+                if packet is None or packet['frame'] is None:
                     continue
+                frame = packet['frame']
+                capture_time = packet['capture_monotonic'] - self.config.CAMERA_LATENCY_S
 
-                # 2. Lakukan deteksi objek
-                detections = self._detect_objects(frame)
+                # 2. Ambil hasil deteksi objek
+                detections = self._detect_objects(packet)
                 best_gate = self._find_best_gate(detections)
 
-                # 3. Lakukan perhitungan dan kirim perintah jika memungkinkan
-                if best_gate and self.vehicle_state.is_ready():
-                    self._process_gate_logic(best_gate)
+                # 3. Lakukan perhitungan dengan pose kapal saat frame diambil (bukan saat inferensi selesai)
+                state = self.vehicle_state.pose_at(capture_time)
+                if best_gate and state.is_ready():
+                    self._process_gate_logic(best_gate, state)
                 
                 # 4. Tampilkan visualisasi
-                self._visualize(frame, detections, best_gate)
+                latency_ms = (time.monotonic() - capture_time) * 1000
+                self._visualize(frame, detections, best_gate, state, latency_ms)
 
                 if cv2.waitKey(1) & 0xFF == ord('q'):
                     print("Tombol 'q' ditekan, keluar dari program.")
@@ -137,36 +256,16 @@ class VisionNavigator:
         finally:
             self._cleanup()
 
-    def _update_telemetry(self):
-        """Menerima pesan MAVLink dan memperbarui state kendaraan."""
-        msg = self.master.recv_match(type=['GPS_RAW_INT', 'ATTITUDE'], blocking=False)
-        if msg:
-            if msg.get_type() == 'GPS_RAW_INT':
-                self.vehicle_state.update_gps(msg)
-            elif msg.get_type() == 'ATTITUDE':
-                self.vehicle_state.update_attitude(msg)
-
-    def _detect_objects(self, frame):
-        """Menjalankan inferensi YOLO dan memformat hasilnya."""
-        results = self.model(frame, verbose=False)
-        detections = {'red': [], 'green': []}
-        for r in results:
-            for box in r.boxes:
-                cls = int(box.cls[0])
-                x1, y1, x2, y2 = map(int, box.xyxy[0])
-                ball_data = {'cx': (x1 + x2) // 2, 'cy': (y1 + y2) // 2, 'area': (x2 - x1) * (y2 - y1), 'box': (x1, y1, x2, y2)}
-                if cls == self.config.RED_BALL_CLASS_ID:
-                    detections['red'].append(ball_data)
-                elif cls == self.config.GREEN_BALL_CLASS_ID:
-                    detections['green'].append(ball_data)
-        return detections
+    def _detect_objects(self, packet):
+        """Bola hasil vision service; model di sana dijalankan sesuai jadwal, sisanya dari tracker (ID tetap)."""
+        result = packet['detections'].get(self.config.VISION_DETECTOR)
+        return split_balls(result['objects'] if result else [])
 
     def _find_best_gate(self, detections):
         """Mencari pasangan bola terbaik dari hasil deteksi."""
-        # Logika ini bisa dipindahkan dari fungsi global ke sini untuk enkapsulasi
         return find_best_gate(detections['red'], detections['green'])
 
-    def _process_gate_logic(self, best_gate):
+    def _process_gate_logic(self, best_gate, state):
         """Menghitung dan mengirim perintah ROI jika gerbang terdeteksi."""
         r_ball, g_ball = best_gate
         midpoint_x = (r_ball['cx'] + g_ball['cx']) / 2.0
@@ -178,15 +277,15 @@ class VisionNavigator:
             error_m = (error_px * distance_m) / self.config.FOCAL_LENGTH_PX
             correction_rad = math.atan2(error_m, distance_m)
             
-            bearing_rad = self.vehicle_state.yaw_rad + correction_rad
-            target_lat, target_lon = get_gps_of_target(self.vehicle_state.lat, self.vehicle_state.lon, distance_m, bearing_rad)
+            bearing_rad = state.yaw_rad + correction_rad
+            target_lat, target_lon = get_gps_of_target(state.lat, state.lon, distance_m, bearing_rad)
 
             current_time = time.time()
             if (current_time - self.last_roi_time) > (1.0 / self.config.ROI_SEND_RATE_HZ):
-                set_roi(self.master, target_lat, target_lon, self.vehicle_state.alt)
+                set_roi(self.master, target_lat, target_lon, state.alt)
                 self.last_roi_time = current_time
 
-    def _visualize(self, frame, detections, best_gate):
+    def _visualize(self, frame, detections, best_gate, state, latency_ms):
         """Menggambar semua informasi di frame untuk ditampilkan."""
         # Gambar semua deteksi
         for ball in detections['red']:
@@ -204,45 +303,35 @@ class VisionNavigator:
             cv2.circle(frame, (midpoint_x, midpoint_y), 7, (0, 255, 255), -1)
 
         # Tampilkan teks telemetri
-        lat_str = f"{self.vehicle_state.lat:.6f}" if self.vehicle_state.lat is not None else "N/A"
-        lon_str = f"{self.vehicle_state.lon:.6f}" if self.vehicle_state.lon is not None else "N/A"
+        lat_str = f"{state.lat:.6f}" if state.lat is not None else "N/A"
+        lon_str = f"{state.lon:.6f}" if state.lon is not None else "N/A"
+        att_rate = f"{state.attitude_rate_hz:.0f}Hz" if state.attitude_rate_hz else "N/A"
+        gps_rate = f"{state.gps_rate_hz:.0f}Hz" if state.gps_rate_hz else "N/A"
         cv2.putText(frame, f"Lat: {lat_str}", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 2)
         cv2.putText(frame, f"Lon: {lon_str}", (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 2)
+        cv2.putText(frame, f"ATT: {att_rate}  GPS: {gps_rate}  Latensi: {latency_ms:.0f}ms", (10, 90), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2)
         
         cv2.imshow("Navigasi ROI - Tekan 'q' untuk keluar", frame)
 
     def _cleanup(self):
         """Membersihkan semua resource saat program berhenti."""
         print("Membersihkan resource...")
+        if hasattr(self, 'mavlink_reader'):
+            self.mavlink_reader.stop()
+            self.mavlink_reader.join(timeout=2)
         if hasattr(self, 'master') and self.master and self.master.target_system != 0:
             print("Membersihkan target ROI di PX4...")
             set_roi(self.master, 0, 0, 0)
             self.master.close()
-        if hasattr(self, 'cap') and self.cap.isOpened():
+        if hasattr(self, 'cap'):
             self.cap.release()
         cv2.destroyAllWindows()
-        print("Koneksi, kamera, dan jendela dilepaskan. Program selesai.")
+        print("Koneksi dan jendela dilepaskan. Program selesai.")
 
 # =================================================================
 # BAGIAN 4: FUNGSI PEMBANTU GLOBAL (dipisahkan dari class)
 # =================================================================
 
-def find_best_gate(red_balls, green_balls):
-    """Mencari pasangan bola merah dan hijau terbaik yang membentuk gerbang."""
-    best_gate = None
-    max_avg_area = -1
-    if not red_balls or not green_balls:
-        return None
-    for r_ball in red_balls:
-        for g_ball in green_balls:
-            # Pastikan kedua bola berada pada ketinggian vertikal yang mirip
-            if abs(r_ball['cy'] - g_ball['cy']) < 100:
-                avg_area = (r_ball['area'] + g_ball['area']) / 2
-                if avg_area > max_avg_area:
-                    max_avg_area = avg_area
-                    best_gate = (r_ball, g_ball)
-    return best_gate
-
 def get_gps_of_target(lat_deg, lon_deg, distance_m, bearing_rad):
     """Menghitung koordinat GPS target ("titik bayangan")."""
     R = 6378137.0  # Radius Bumi dalam meter
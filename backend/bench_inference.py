@@ -0,0 +1,80 @@
+# =================================================================
+# BENCHMARK LATENSI MODE INFERENSI (full / downscaled / roi_crop)
+# =================================================================
+# Contoh:
+#   python backend/bench_inference.py --source rekaman_lintasan.mp4 --frames 200
+#   python backend/bench_inference.py --source 1      (indeks kamera)
+# =================================================================
+import argparse
+import statistics
+import time
+
+import cv2
+from ultralytics import YOLOv10
+
+from detections import split_balls, find_best_gate
+from inference_modes import RegionInference, INFERENCE_MODES, gate_region
+
+
+def read_frames(source, count):
+    cap = cv2.VideoCapture(int(source) if source.isdigit() else source)
+    frames = []
+    while len(frames) < count:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+def bench_mode(model, frames, mode, args):
+    labels = {args.green_id: 'green', args.red_id: 'red'}
+    inference = RegionInference(model, labels, mode=mode, imgsz=args.imgsz,
+                                downscaled_imgsz=args.downscaled_imgsz, conf=0.25)
+    inference.detect(frames[0])  # Warmup
+    latencies, gates = [], 0
+    for frame in frames:
+        start = time.perf_counter()
+        objects = inference.detect(frame)
+        latencies.append((time.perf_counter() - start) * 1000)
+        detections = split_balls(objects)
+        best_gate = find_best_gate(detections['red'], detections['green'])
+        inference.set_focus(gate_region(best_gate))
+        gates += best_gate is not None
+    latencies.sort()
+    return {
+        "mean": statistics.mean(latencies),
+        "p50": latencies[len(latencies) // 2],
+        "p95": latencies[int(len(latencies) * 0.95) - 1],
+        "gate_rate": gates / len(frames),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark latensi per mode inferensi")
+    parser.add_argument("--model", default="backend/best5.pt")
+    parser.add_argument("--source", default="1", help="File video atau indeks kamera")
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--downscaled-imgsz", type=int, default=320)
+    parser.add_argument("--green-id", type=int, default=0)
+    parser.add_argument("--red-id", type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"Memuat model dari: {args.model}")
+    model = YOLOv10(args.model)
+    frames = read_frames(args.source, args.frames)
+    if not frames:
+        print("FATAL: Tidak ada frame yang bisa dibaca dari sumber.")
+        return
+    print(f"{len(frames)} frame dimuat.\n")
+
+    print(f"{'mode':<12}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'gerbang':>10}")
+    for mode in INFERENCE_MODES:
+        r = bench_mode(model, frames, mode, args)
+        print(f"{mode:<12}{r['mean']:>10.1f}{r['p50']:>10.1f}{r['p95']:>10.1f}{r['gate_rate']:>9.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# =================================================================
+# MICRO-BENCHMARK POST-PROCESSING DETEKSI (loop per box vs array NumPy)
+# =================================================================
+# Membandingkan biaya per frame dari ekstraksi box + pemilihan gerbang
+# untuk jumlah deteksi yang makin banyak, memakai Boxes ultralytics asli
+# (tensor torch) dengan box acak.
+# Contoh:
+#   python backend/bench_postprocess.py --counts 4 16 64 256 --repeat 200
+# =================================================================
+import argparse
+import random
+import time
+from types import SimpleNamespace
+
+import torch
+from ultralytics.engine.results import Boxes
+
+from detections import extract_objects, split_balls, find_best_gate
+
+LABELS = {0: 'green', 1: 'red'}
+
+
+def legacy_extract_objects(results, class_labels):
+    """Implementasi lama: pengindeksan tensor satu per satu untuk setiap box."""
+    objects = []
+    if not results or not results[0].boxes:
+        return objects
+    for box in results[0].boxes:
+        label = class_labels.get(int(box.cls[0]))
+        if label is None:
+            continue
+        x1, y1, x2, y2 = map(int, box.xyxy[0])
+        objects.append({
+            'label': label, 'conf': round(float(box.conf[0]), 3), 'box': (x1, y1, x2, y2),
+            'cx': (x1 + x2) // 2, 'cy': (y1 + y2) // 2, 'area': (x2 - x1) * (y2 - y1),
+        })
+    return objects
+
+
+def legacy_find_best_gate(red_balls, green_balls):
+    """Implementasi lama: loop bersarang merah x hijau."""
+    best_gate = None
+    max_avg_area = -1
+    if not red_balls or not green_balls:
+        return None
+    for r_ball in red_balls:
+        for g_ball in green_balls:
+            if abs(r_ball['cy'] - g_ball['cy']) < 100:
+                avg_area = (r_ball['area'] + g_ball['area']) / 2
+                if avg_area > max_avg_area:
+                    max_avg_area = avg_area
+                    best_gate = (r_ball, g_ball)
+    return best_gate
+
+
+def make_results(count, width=640, height=480):
+    rows = []
+    for _ in range(count):
+        x, y = random.uniform(0, width - 60), random.uniform(0, height - 60)
+        w, h = random.uniform(8, 60), random.uniform(8, 60)
+        rows.append([x, y, x + w, y + h, random.uniform(0.25, 1.0), random.choice((0, 1))])
+    data = torch.tensor(rows, dtype=torch.float32).reshape(-1, 6)
+    return [SimpleNamespace(boxes=Boxes(data, (height, width)))]
+
+
+def time_ms(fn, repeat):
+    fn()  # Warmup
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) * 1000 / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmark post-processing deteksi")
+    parser.add_argument("--counts", type=int, nargs="+", default=[2, 8, 32, 128, 512])
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    print(f"{'box':>6}{'ekstrak lama':>15}{'ekstrak baru':>15}{'gerbang lama':>15}{'gerbang baru':>15}{'total x':>10}")
+    for count in args.counts:
+        results = make_results(count)
+        balls = split_balls(extract_objects(results, LABELS))
+        old_gate = legacy_find_best_gate(balls['red'], balls['green'])
+        assert find_best_gate(balls['red'], balls['green']) == old_gate, "Hasil pemilihan gerbang berbeda"
+
+        ext_old = time_ms(lambda: legacy_extract_objects(results, LABELS), args.repeat)
+        ext_new = time_ms(lambda: extract_objects(results, LABELS), args.repeat)
+        gate_old = time_ms(lambda: legacy_find_best_gate(balls['red'], balls['green']), args.repeat)
+        gate_new = time_ms(lambda: find_best_gate(balls['red'], balls['green']), args.repeat)
+        speedup = (ext_old + gate_old) / (ext_new + gate_new)
+        print(f"{count:>6}{ext_old:>13.3f}ms{ext_new:>13.3f}ms{gate_old:>13.3f}ms{gate_new:>13.3f}ms{speedup:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+import bisect
+import json
+import os
+import threading
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+
+class CaptureIndex:
+    """
+    Indeks foto capture di memori, terurut berdasarkan waktu, dan dipersist
+    sebagai file JSONL append-only di dalam folder uploads.
+
+    Setiap entri: {"id", "path" (relatif terhadap folder uploads), "ts" (epoch), "size"}.
+    Query latest-N O(N), halaman/rentang waktu O(log n + N) via bisect.
+    """
+
+    def __init__(self, root_dir, index_name="index.jsonl"):
+        self.root_dir = root_dir
+        self.index_path = os.path.join(root_dir, index_name)
+        self._lock = threading.Lock()
+        self._entries = []
+        self._keys = []  # (ts, id) sejajar dengan _entries, untuk bisect
+        self._next_id = 1
+
+    def __len__(self):
+        return len(self._entries)
+
+    def load(self):
+        """Memuat indeks dari file; jika belum ada, dibangun sekali dari isi folder."""
+        with self._lock:
+            self._entries, self._keys = [], []
+            if os.path.exists(self.index_path):
+                with open(self.index_path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        line = line.strip()
+                        if line:
+                            self._insert(json.loads(line))
+                self._next_id = max((e["id"] for e in self._entries), default=0) + 1
+                print(f"Info: Indeks capture dimuat ({len(self._entries)} gambar).")
+            else:
+                self._rebuild()
+
+    def _rebuild(self):
+        print("Info: Indeks capture belum ada, memindai folder uploads...")
+        found = []
+        for dirpath, _dirnames, filenames in os.walk(self.root_dir):
+            for name in filenames:
+                if name.lower().endswith(IMAGE_EXTENSIONS):
+                    full_path = os.path.join(dirpath, name)
+                    st = os.stat(full_path)
+                    rel_path = os.path.relpath(full_path, self.root_dir).replace(os.sep, "/")
+                    found.append((st.st_mtime, rel_path, st.st_size))
+        found.sort()
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for ts, rel_path, size in found:
+                entry = {"id": self._next_id, "path": rel_path, "ts": ts, "size": size}
+                self._next_id += 1
+                self._insert(entry)
+                f.write(json.dumps(entry) + "\n")
+        os.replace(tmp_path, self.index_path)
+        print(f"Info: Indeks capture dibangun ({len(self._entries)} gambar).")
+
+    def _insert(self, entry):
+        key = (entry["ts"], entry["id"])
+        if not self._keys or key >= self._keys[-1]:
+            self._keys.append(key)
+            self._entries.append(entry)
+        else:
+            pos = bisect.bisect(self._keys, key)
+            self._keys.insert(pos, key)
+            self._entries.insert(pos, entry)
+
+    def add(self, rel_path, ts, size):
+        """Mencatat file baru yang sudah tersimpan di disk."""
+        with self._lock:
+            entry = {"id": self._next_id, "path": rel_path, "ts": ts, "size": size}
+            self._next_id += 1
+            self._insert(entry)
+            with open(self.index_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+            return entry
+
+    def latest(self, limit):
+        with self._lock:
+            return self._entries[-limit:][::-1] if limit > 0 else []
+
+    def page(self, cursor=None, limit=20):
+        """
+        Halaman gambar dari yang terbaru ke terlama. `cursor` adalah nilai
+        `next_cursor` dari halaman sebelumnya ("<ts>:<id>").
+        """
+        with self._lock:
+            end = len(self._keys)
+            if cursor:
+                ts, entry_id = cursor.split(":")
+                end = bisect.bisect_left(self._keys, (float(ts), int(entry_id)))
+            start = max(0, end - limit)
+            items = self._entries[start:end][::-1]
+            next_cursor = f"{self._keys[start][0]}:{self._keys[start][1]}" if start > 0 and items else None
+            return items, next_cursor
+
+    def time_range(self, start_ts, end_ts, limit=100):
+        """Gambar dengan start_ts <= ts < end_ts, terlama lebih dulu."""
+        with self._lock:
+            lo = bisect.bisect_left(self._keys, (start_ts,))
+            hi = bisect.bisect_left(self._keys, (end_ts,))
+            return self._entries[lo:min(hi, lo + limit)]
@@ -0,0 +1,181 @@
+import os
+import queue
+from collections import OrderedDict
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class CaptureUploader:
+    """
+    Pengunggah foto capture dari kapal ke backend.
+
+    Setiap gambar ditulis dulu ke folder spool di disk, lalu dikirim oleh
+    beberapa worker memakai satu `requests.Session` (koneksi dipakai ulang).
+    Jika link ke darat putus, file tetap di spool dan dikirim ulang dengan
+    backoff eksponensial; sisa spool juga dikirim saat program dijalankan lagi.
+
+    Isi spool dicatat di memori (folder hanya di-scan saat start), sehingga
+    menjaga batas `max_spool_files` tetap O(1) per capture walau link lama putus.
+    Setiap uploader harus punya `spool_dir` sendiri.
+    """
+
+    def __init__(self, upload_url, spool_dir, workers=2, timeout=5.0,
+                 min_backoff=1.0, max_backoff=30.0, max_spool_files=2000):
+        self.upload_url = upload_url
+        self.spool_dir = spool_dir
+        self.workers = workers
+        self.timeout = timeout
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.max_spool_files = max_spool_files
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._queue = queue.Queue()
+        self._stop_event = threading.Event()
+        self._threads = []
+        self._lock = threading.Lock()
+        self._backoff = 0.0
+        self._backoff_until = 0.0
+        self._spooled = OrderedDict()  # path -> None, terlama lebih dulu (dijaga oleh _lock)
+        self.counters = {"queued": 0, "sent": 0, "failed": 0, "dropped": 0}
+
+    def start(self):
+        os.makedirs(self.spool_dir, exist_ok=True)
+        # Kirim ulang sisa spool dari sesi sebelumnya, terlama lebih dulu
+        leftovers = sorted(f for f in os.listdir(self.spool_dir) if f.endswith(".jpg"))
+        for name in leftovers:
+            path = os.path.join(self.spool_dir, name)
+            with self._lock:
+                self._spooled[path] = None
+            self._enqueue(path)
+        if leftovers:
+            print(f"Info: {len(leftovers)} gambar tersisa di spool akan dikirim ulang.")
+        self._stop_event.clear()
+        self._threads = [
+            threading.Thread(target=self._worker, name=f"uploader-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+        for t in self._threads:
+            t.start()
+
+    def stop(self, timeout=2.0):
+        """Menghentikan worker; gambar yang belum terkirim tetap aman di spool."""
+        self._stop_event.set()
+        for t in self._threads:
+            t.join(timeout)
+        self._threads = []
+        self.session.close()
+
+    def submit_jpeg(self, jpeg):
+        """Menyimpan JPEG ke spool dan menjadwalkan pengirimannya (tidak menunggu jaringan)."""
+        name = f"capture_{time.time_ns()}.jpg"
+        path = os.path.join(self.spool_dir, name)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(jpeg)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._spooled[path] = None
+        self._enqueue(path)
+        self._enforce_spool_limit()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+        stats["pending"] = self._queue.qsize()
+        stats["spooled"] = len(self._spooled)
+        stats["backoff_s"] = round(max(0.0, self._backoff_until - time.monotonic()), 1)
+        return stats
+
+    def _enqueue(self, path):
+        self._queue.put(path)
+        with self._lock:
+            self.counters["queued"] += 1
+
+    def _enforce_spool_limit(self):
+        """Membuang file spool terlama jika jumlahnya melebihi max_spool_files."""
+        evicted = []
+        with self._lock:
+            while len(self._spooled) > self.max_spool_files:
+                evicted.append(self._spooled.popitem(last=False)[0])
+            self.counters["dropped"] += len(evicted)
+        for path in evicted:
+            _remove(path)
+
+    def _discard(self, path):
+        with self._lock:
+            self._spooled.pop(path, None)
+        _remove(path)
+
+    def _worker(self):
+        while not self._stop_event.is_set():
+            try:
+                path = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            # Semua worker ikut menunggu saat backend sedang tidak bisa dihubungi
+            wait = self._backoff_until - time.monotonic()
+            if wait > 0 and self._stop_event.wait(wait):
+                break
+            if not os.path.exists(path):
+                continue  # Sudah dibuang karena batas spool
+            self._upload(path)
+
+    def _upload(self, path):
+        try:
+            with open(path, "rb") as f:
+                files = {'file': (os.path.basename(path), f, 'image/jpeg')}
+                response = self.session.post(self.upload_url, files=files, timeout=self.timeout)
+        except (requests.RequestException, OSError) as e:
+            self._on_failure(path, f"Gagal terhubung ke server: {e}")
+            return
+
+        if response.ok and _server_status(response) == "ok":
+            self._discard(path)
+            with self._lock:
+                self.counters["sent"] += 1
+                self._backoff = 0.0
+            print("Gambar berhasil diunggah.")
+        elif response.ok or response.status_code >= 500:
+            # 200 tanpa status "ok" berarti server gagal menyimpan; file tetap di spool untuk dicoba lagi
+            self._on_failure(path, f"Server error: {response.status_code} - {response.text[:200]}")
+        else:
+            # Error 4xx tidak akan berhasil jika dicoba ulang (misal file terlalu besar)
+            self._discard(path)
+            with self._lock:
+                self.counters["dropped"] += 1
+            print(f"Gambar ditolak server: {response.status_code} - {response.text}")
+
+    def _on_failure(self, path, reason):
+        with self._lock:
+            self.counters["failed"] += 1
+            self._backoff = min(self.max_backoff, max(self.min_backoff, self._backoff * 2))
+            delay = self._backoff * random.uniform(0.8, 1.2)
+            self._backoff_until = max(self._backoff_until, time.monotonic() + delay)
+        print(f"{reason}. Dicoba lagi dalam {delay:.1f} detik.")
+        self._queue.put(path)
+
+
+def _server_status(response):
+    """Nilai "status" di body JSON balasan upload, atau None jika body bukan JSON."""
+    try:
+        body = response.json()
+    except ValueError:
+        return None
+    return body.get("status") if isinstance(body, dict) else None
+
+
+def _remove(path):
+    # File bisa sudah dihapus _enforce_spool_limit di thread lain
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,120 @@
+import asyncio
+import time
+from collections import deque
+
+# --- Kebijakan saat antrian klien penuh ---
+DROP_OLDEST = "drop_oldest"          # Buang pesan tertua (cocok untuk video)
+COALESCE_LATEST = "coalesce_latest"  # Simpan hanya pesan terbaru (cocok untuk telemetri)
+
+# topic -> (kebijakan, kapasitas antrian)
+DEFAULT_TOPIC_POLICIES = {
+    "telemetry": (COALESCE_LATEST, 1),
+    "video": (DROP_OLDEST, 2),
+}
+
+
+class ClientSender:
+    """
+    Antrian kirim milik satu klien frontend beserta task penulisnya.
+
+    Producer cukup memanggil `enqueue()` yang tidak pernah menunggu jaringan,
+    sehingga satu browser yang lambat tidak memperlambat klien lain. Setiap topic
+    punya antrian terbatas dengan kebijakan overflow sendiri.
+    """
+
+    def __init__(self, websocket, policies=None, on_error=None):
+        self.websocket = websocket
+        self.policies = dict(policies or DEFAULT_TOPIC_POLICIES)
+        self.on_error = on_error
+        self._queues = {topic: deque(maxlen=capacity) for topic, (_, capacity) in self.policies.items()}
+        self._topics = list(self._queues)
+        self._next_topic = 0
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self.closed = False
+        self.counters = {
+            topic: {"enqueued": 0, "sent": 0, "dropped": 0, "coalesced": 0}
+            for topic in self._queues
+        }
+        self.last_send_ms = None
+        self.max_send_ms = 0.0
+        self.last_queue_delay_ms = None
+        self.max_queue_delay_ms = 0.0
+
+    def start(self):
+        self._task = asyncio.create_task(self._writer())
+
+    def stop(self):
+        self.closed = True
+        if self._task and self._task is not asyncio.current_task():
+            self._task.cancel()
+        self._task = None
+
+    def enqueue(self, topic, message):
+        """Menaruh pesan di antrian topic tanpa blocking. Topic tak dikenal diperlakukan sebagai DROP_OLDEST."""
+        if self.closed:
+            return
+        if topic not in self._queues:
+            self.policies[topic] = (DROP_OLDEST, 8)
+            self._queues[topic] = deque(maxlen=8)
+            self._topics.append(topic)
+            self.counters[topic] = {"enqueued": 0, "sent": 0, "dropped": 0, "coalesced": 0}
+        q = self._queues[topic]
+        counter = self.counters[topic]
+        if len(q) == q.maxlen:
+            policy = self.policies[topic][0]
+            counter["coalesced" if policy == COALESCE_LATEST else "dropped"] += 1
+        q.append((message, time.monotonic()))
+        counter["enqueued"] += 1
+        self._wakeup.set()
+
+    def queue_depth(self):
+        return sum(len(q) for q in self._queues.values())
+
+    def stats(self):
+        client = getattr(self.websocket, "client", None)
+        return {
+            "client": f"{client.host}:{client.port}" if client else None,
+            "queue_depth": self.queue_depth(),
+            "last_send_ms": self.last_send_ms,
+            "max_send_ms": round(self.max_send_ms, 2),
+            "last_queue_delay_ms": self.last_queue_delay_ms,
+            "max_queue_delay_ms": round(self.max_queue_delay_ms, 2),
+            "topics": {topic: dict(c, depth=len(self._queues[topic])) for topic, c in self.counters.items()},
+        }
+
+    def _pop_next(self):
+        """Round-robin antar topic agar video tidak menahan telemetri (dan sebaliknya)."""
+        for _ in range(len(self._topics)):
+            topic = self._topics[self._next_topic]
+            self._next_topic = (self._next_topic + 1) % len(self._topics)
+            q = self._queues[topic]
+            if q:
+                message, enqueued_at = q.popleft()
+                return topic, message, enqueued_at
+        return None
+
+    async def _writer(self):
+        try:
+            while not self.closed:
+                await self._wakeup.wait()
+                self._wakeup.clear()
+                while (item := self._pop_next()) is not None:
+                    topic, message, enqueued_at = item
+                    start = time.monotonic()
+                    if isinstance(message, (bytes, bytearray)):
+                        await self.websocket.send_bytes(message)
+                    else:
+                        await self.websocket.send_text(message)
+                    end = time.monotonic()
+                    self.counters[topic]["sent"] += 1
+                    self.last_send_ms = round((end - start) * 1000, 2)
+                    self.max_send_ms = max(self.max_send_ms, self.last_send_ms)
+                    self.last_queue_delay_ms = round((start - enqueued_at) * 1000, 2)
+                    self.max_queue_delay_ms = max(self.max_queue_delay_ms, self.last_queue_delay_ms)
+        except asyncio.CancelledError:
+            pass
+        except Exception:
+            self.closed = True
+            if self.on_error:
+                self.on_error(self.websocket)
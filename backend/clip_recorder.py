@@ -0,0 +1,177 @@
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+
+class ClipRecorder:
+    """
+    Menyimpan klip pre-/post-roll di sekitar sebuah event (misal kotak terdeteksi).
+
+    Frame JPEG yang sudah di-encode untuk stream disimpan di ring memori
+    (dibatasi `pre_roll_s` detik dan `max_ring_bytes`). Saat trigger(), isi
+    ring menjadi pre-roll, frame berikutnya dikumpulkan sampai `post_roll_s`
+    setelah event terakhir, lalu klip ditulis ke disk sebagai burst JPEG oleh
+    thread writer. Tidak ada encode ulang dan pemanggil tidak pernah menunggu disk.
+
+    Memori dibatasi konfigurasi: ring <= `max_ring_bytes`, klip yang sedang
+    dikumpulkan diakhiri lebih awal saat melewati `max_clip_bytes`, dan klip
+    yang menunggu writer dibuang jika totalnya melewati `max_pending_bytes`.
+
+    Struktur keluaran: {output_dir}/YYYYMMDD/clip_YYYYMMDD_HHMMSS_{label}/
+        frame_0000.jpg, frame_0001.jpg, ..., clip.json (seq & waktu tiap frame)
+    """
+
+    def __init__(self, output_dir, pre_roll_s=3.0, post_roll_s=2.0, max_ring_bytes=24 * 1024 * 1024,
+                 max_clip_s=20.0, max_clip_bytes=64 * 1024 * 1024, max_pending_clips=2,
+                 max_pending_bytes=96 * 1024 * 1024):
+        self.output_dir = output_dir
+        self.pre_roll_s = pre_roll_s
+        self.post_roll_s = post_roll_s
+        self.max_ring_bytes = max_ring_bytes
+        self.max_clip_s = max_clip_s
+        self.max_clip_bytes = max_clip_bytes
+        self.max_pending_bytes = max_pending_bytes
+        self._pending_bytes = 0  # Total byte klip di antrian writer (dijaga oleh _lock)
+        self._ring = deque()  # (capture_time, seq, jpeg)
+        self._ring_bytes = 0
+        self._active = None
+        self._queue = queue.Queue(maxsize=max_pending_clips)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stats = {"clips_written": 0, "clips_dropped": 0, "clips_truncated": 0, "frames_written": 0,
+                       "last_write_ms": None}
+
+    def start(self):
+        self._thread = threading.Thread(target=self._writer, name="clip-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5.0):
+        """Menulis klip yang sedang dikumpulkan (post-roll terpotong) lalu menghentikan writer."""
+        with self._lock:
+            clip, self._active = self._active, None
+        if clip:
+            self._submit(clip)
+        if self._thread:
+            self._queue.put(None)
+            self._thread.join(timeout)
+
+    def add_frame(self, jpeg, capture_time, seq):
+        """Dipanggil untuk setiap frame yang sudah di-encode (buffer tidak disalin)."""
+        entry = (capture_time, seq, jpeg)
+        finished = None
+        with self._lock:
+            self._ring.append(entry)
+            self._ring_bytes += len(jpeg)
+            # Buang frame yang lebih tua dari pre-roll atau melebihi batas memori
+            while self._ring and (capture_time - self._ring[0][0] > self.pre_roll_s
+                                  or self._ring_bytes > self.max_ring_bytes):
+                self._ring_bytes -= len(self._ring.popleft()[2])
+            if self._active:
+                self._active['frames'].append(entry)
+                self._active['bytes'] += len(jpeg)
+                if self._active['bytes'] >= self.max_clip_bytes:
+                    self._stats["clips_truncated"] += 1
+                    finished, self._active = self._active, None
+                elif capture_time >= self._active['until'] or capture_time - self._active['start'] >= self.max_clip_s:
+                    finished, self._active = self._active, None
+        if finished:
+            self._submit(finished)
+
+    def trigger(self, label, event_time):
+        """
+        Memulai klip (pre-roll = isi ring saat ini). Trigger selama klip masih
+        dikumpulkan hanya memperpanjang post-roll. Mengembalikan True jika klip baru dimulai.
+        """
+        with self._lock:
+            if self._active:
+                self._active['until'] = max(self._active['until'], event_time + self.post_roll_s)
+                self._active['events'] += 1
+                return False
+            frames = list(self._ring)
+            self._active = {
+                'label': label,
+                'event_time': event_time,
+                'start': frames[0][0] if frames else event_time,
+                'until': event_time + self.post_roll_s,
+                'events': 1,
+                'frames': frames,
+                'bytes': sum(len(f[2]) for f in frames),
+            }
+            return True
+
+    def _submit(self, clip):
+        with self._lock:
+            accepted = self._pending_bytes + clip['bytes'] <= self.max_pending_bytes and not self._queue.full()
+            if accepted:
+                self._pending_bytes += clip['bytes']
+                self._queue.put_nowait(clip)
+            else:
+                self._stats["clips_dropped"] += 1
+        if not accepted:
+            print(f"Peringatan: Klip '{clip['label']}' dibuang, penulisan ke disk tertinggal.")
+
+    def _writer(self):
+        while True:
+            clip = self._queue.get()
+            if clip is None:
+                return
+            start = time.perf_counter()
+            try:
+                path = self._write_clip(clip)
+            except OSError as e:
+                self._release(clip)
+                self._stats["clips_dropped"] += 1
+                print(f"Error Klip: Gagal menulis klip '{clip['label']}': {e}")
+                continue
+            self._release(clip)
+            self._stats["clips_written"] += 1
+            self._stats["frames_written"] += len(clip['frames'])
+            self._stats["last_write_ms"] = round((time.perf_counter() - start) * 1000, 1)
+            print(f"Klip disimpan: {path} ({len(clip['frames'])} frame)")
+
+    def _release(self, clip):
+        with self._lock:
+            self._pending_bytes -= clip['bytes']
+
+    def _write_clip(self, clip):
+        event = datetime.fromtimestamp(clip['event_time'])
+        day_dir = os.path.join(self.output_dir, event.strftime("%Y%m%d"))
+        final_dir = os.path.join(day_dir, f"clip_{event.strftime('%Y%m%d_%H%M%S_%f')}_{clip['label']}")
+        # Ditulis ke folder .part lalu di-rename, jadi klip yang terlihat selalu lengkap
+        part_dir = final_dir + ".part"
+        os.makedirs(part_dir, exist_ok=True)
+        frames = []
+        for index, (capture_time, seq, jpeg) in enumerate(clip['frames']):
+            name = f"frame_{index:04d}.jpg"
+            with open(os.path.join(part_dir, name), "wb") as f:
+                f.write(jpeg)
+            frames.append({"file": name, "seq": seq, "capture_time": round(capture_time, 3)})
+        with open(os.path.join(part_dir, "clip.json"), "w") as f:
+            json.dump({
+                "label": clip['label'],
+                "event_time": round(clip['event_time'], 3),
+                "events": clip['events'],
+                "pre_roll_s": self.pre_roll_s,
+                "post_roll_s": self.post_roll_s,
+                "frames": frames,
+            }, f, indent=2)
+        os.replace(part_dir, final_dir)
+        return final_dir
+
+    def stats(self):
+        with self._lock:
+            ring_frames, ring_bytes = len(self._ring), self._ring_bytes
+            collecting = self._active is not None
+            pending_bytes = self._pending_bytes
+        return {
+            **self._stats,
+            "ring_frames": ring_frames,
+            "ring_mb": round(ring_bytes / (1024 * 1024), 2),
+            "collecting": collecting,
+            "pending_clips": self._queue.qsize(),
+            "pending_mb": round(pending_bytes / (1024 * 1024), 2),
+        }
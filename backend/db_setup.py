@@ -1,3 +1,4 @@
+import os
 import psycopg2
 
 # --- Pengaturan Koneksi ---
@@ -8,70 +9,83 @@ DB_PASS = "postgres"
 DB_HOST = "localhost"
 DB_PORT = "5432"
 
-try:
-    # 1. Koneksi ke database default 'postgres' untuk membuat database baru
-    conn = psycopg2.connect(
-        dbname="postgres",
-        user=DB_USER,
-        password=DB_PASS,
-        host=DB_HOST,
-        port=DB_PORT
-    )
+# File migrasi: migrations/NNN_nama.sql, dijalankan berurutan sekali saja.
+# Skrip ini aman dijalankan berulang; data yang ada tidak pernah dihapus.
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+
+
+def connect(dbname):
+    return psycopg2.connect(dbname=dbname, user=DB_USER, password=DB_PASS, host=DB_HOST, port=DB_PORT)
+
+
+def ensure_database():
+    """Membuat database jika belum ada (tanpa DROP seperti versi sebelumnya)."""
+    conn = connect("postgres")
     conn.autocommit = True
-    cursor = conn.cursor()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_database WHERE datname = %s", (DB_NAME,))
+            if cursor.fetchone():
+                print(f"Database '{DB_NAME}' sudah ada.")
+            else:
+                print(f"Membuat database '{DB_NAME}'...")
+                cursor.execute(f"CREATE DATABASE {DB_NAME};")
+    finally:
+        conn.close()
 
-    # 2. Hapus database lama (jika ada) dan buat yang baru
-    print(f"Menghapus database '{DB_NAME}' jika ada...")
-    cursor.execute(f"DROP DATABASE IF EXISTS {DB_NAME};")
-    print(f"Membuat database '{DB_NAME}'...")
-    cursor.execute(f"CREATE DATABASE {DB_NAME};")
-    print(f"Database '{DB_NAME}' berhasil dibuat!")
 
-    cursor.close()
-    conn.close()
+def list_migrations():
+    """[(versi, nama, path)] urut versi."""
+    migrations = []
+    for filename in sorted(os.listdir(MIGRATIONS_DIR)):
+        if filename.endswith(".sql"):
+            version, _, name = filename[:-4].partition("_")
+            migrations.append((int(version), name, os.path.join(MIGRATIONS_DIR, filename)))
+    return migrations
 
-    # 3. Koneksi ke database baru yang sudah dibuat
-    print(f"Menghubungkan ke database '{DB_NAME}'...")
-    conn = psycopg2.connect(
-        dbname=DB_NAME,
-        user=DB_USER,
-        password=DB_PASS,
-        host=DB_HOST,
-        port=DB_PORT
-    )
-    cursor = conn.cursor()
 
-    # 4. Buat tabel 'telemetry' dengan skema yang sudah diperbarui
-    print("Membuat tabel 'telemetry' dengan kolom baru...")
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS telemetry (
-        id SERIAL PRIMARY KEY,
-        timestamp TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
-        
-        -- Data Attitude
-        roll FLOAT,
-        pitch FLOAT,
-        yaw FLOAT,
-        
-        -- Data GPS
-        lat DOUBLE PRECISION,
-        lon DOUBLE PRECISION,
-        
-        -- Data Performa
-        groundspeed FLOAT,
-        heading INTEGER,
-        voltage FLOAT,
-        current FLOAT
-    );
-    """)
-    conn.commit()
-    print("Tabel 'telemetry' dengan skema baru berhasil dibuat!")
+def apply_migrations(conn):
+    """Menjalankan migrasi yang belum tercatat di schema_migrations, masing-masing dalam satu transaksi."""
+    with conn.cursor() as cursor:
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+        );
+        """)
+        conn.commit()
+        cursor.execute("SELECT version FROM schema_migrations")
+        applied = {row[0] for row in cursor.fetchall()}
 
-except Exception as e:
-    print(f"Terjadi error: {e}")
-finally:
-    if 'cursor' in locals() and cursor:
-        cursor.close()
-    if 'conn' in locals() and conn:
-        conn.close()
-    print("Proses setup selesai.")
\ No newline at end of file
+    pending = [m for m in list_migrations() if m[0] not in applied]
+    for version, name, path in pending:
+        print(f"Menjalankan migrasi {version:03d} ({name})...")
+        with open(path, encoding="utf-8") as f:
+            statements = f.read()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(statements)
+                cursor.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)", (version, name))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    if not pending:
+        print("Skema sudah versi terbaru.")
+    return len(pending)
+
+
+if __name__ == "__main__":
+    conn = None
+    try:
+        ensure_database()
+        print(f"Menghubungkan ke database '{DB_NAME}'...")
+        conn = connect(DB_NAME)
+        apply_migrations(conn)
+    except Exception as e:
+        print(f"Terjadi error: {e}")
+    finally:
+        if conn:
+            conn.close()
+        print("Proses setup selesai.")
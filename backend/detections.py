@@ -0,0 +1,145 @@
+# =================================================================
+# Utilitas hasil deteksi YOLO yang dipakai bersama oleh
+# mission_controller.py dan ROI_CORRECTION.py
+# =================================================================
+import numpy as np
+
+
+def detection_arrays(results, offset=(0, 0)):
+    """
+    Mengubah hasil inferensi menjadi array NumPy kontigu sekali jalan:
+    {'cls', 'conf', 'xyxy', 'center', 'area'}. Tidak ada pengindeksan tensor per box.
+    `offset` (x, y) ditambahkan ke koordinat jika inferensi dilakukan pada crop.
+    """
+    if not results or results[0].boxes is None or len(results[0].boxes) == 0:
+        data = np.empty((0, 6), dtype=np.float32)
+    else:
+        data = results[0].boxes.data
+        data = data.cpu().numpy() if hasattr(data, 'cpu') else np.asarray(data)
+    xyxy = data[:, :4].astype(np.int32)  # Dibulatkan ke bawah seperti int() per box sebelumnya
+    if offset != (0, 0):
+        xyxy += np.array(offset * 2, dtype=np.int32)
+    return {
+        'cls': data[:, 5].astype(np.int32),
+        'conf': data[:, 4].astype(np.float32),
+        'xyxy': xyxy,
+        'center': (xyxy[:, :2] + xyxy[:, 2:]) // 2,
+        'area': (xyxy[:, 2] - xyxy[:, 0]) * (xyxy[:, 3] - xyxy[:, 1]),
+    }
+
+
+def _objects_from_arrays(arrays, labels, mask):
+    """Menyusun dict objek (format tracker/JSON) hanya untuk box yang lolos `mask`."""
+    rows = zip(labels, arrays['conf'][mask].astype(np.float64).round(3).tolist(), arrays['xyxy'][mask].tolist(),
+               arrays['center'][mask].tolist(), arrays['area'][mask].tolist())
+    return [
+        {'label': label, 'conf': conf, 'box': tuple(box), 'cx': cx, 'cy': cy, 'area': area}
+        for label, conf, box, (cx, cy), area in rows
+    ]
+
+
+def extract_objects(results, class_labels, offset=(0, 0)):
+    """
+    Mengambil semua box yang kelasnya ada di `class_labels` ({class_id: label}),
+    misal {0: 'green', 1: 'red'}. Format objek sama dengan keluaran tracker.
+    `offset` (x, y) ditambahkan ke koordinat jika inferensi dilakukan pada crop.
+    """
+    arrays = detection_arrays(results, offset)
+    mask = np.isin(arrays['cls'], list(class_labels))
+    labels = [class_labels[c] for c in arrays['cls'][mask].tolist()]
+    return _objects_from_arrays(arrays, labels, mask)
+
+
+def split_balls(objects):
+    """Mengelompokkan objek berlabel 'red'/'green' menjadi {'red': [...], 'green': [...]}."""
+    detections = {'red': [], 'green': []}
+    for obj in objects:
+        if obj['label'] in detections:
+            detections[obj['label']].append(obj)
+    return detections
+
+
+def extract_boxes(results, label):
+    """Mengambil semua box dari hasil inferensi dengan satu label (misal model kotak)."""
+    arrays = detection_arrays(results)
+    return [
+        {'label': label, 'conf': conf, 'box': tuple(box)}
+        for conf, box in zip(arrays['conf'].astype(np.float64).round(3).tolist(), arrays['xyxy'].tolist())
+    ]
+
+
+def best_gate_indices(red_centers, red_areas, green_centers, green_areas, max_dy=100):
+    """
+    Inti pemilihan gerbang dalam bentuk array: semua pasangan merah x hijau
+    dievaluasi sekaligus. Pasangan sah jika selisih cy < `max_dy`; dipilih
+    rata-rata area terbesar (pasangan pertama jika seri, urutan merah lalu hijau).
+    Mengembalikan (indeks merah, indeks hijau) atau None.
+    """
+    if len(red_areas) == 0 or len(green_areas) == 0:
+        return None
+    aligned = np.abs(red_centers[:, 1, None] - green_centers[None, :, 1]) < max_dy
+    if not aligned.any():
+        return None
+    avg_area = np.where(aligned, (red_areas[:, None] + green_areas[None, :]) / 2.0, -1.0)
+    return np.unravel_index(np.argmax(avg_area), avg_area.shape)
+
+
+# Di bawah jumlah pasangan ini overhead NumPy lebih besar dari loop biasa
+# (lihat bench_postprocess.py); kasus umum 1-4 bola per warna tetap memakai loop
+GATE_VECTORIZE_MIN_PAIRS = 64
+
+
+def _best_gate_loop(red_balls, green_balls, max_dy=100):
+    best_gate = None
+    max_avg_area = -1
+    for r_ball in red_balls:
+        for g_ball in green_balls:
+            # Pastikan kedua bola berada pada ketinggian vertikal yang mirip
+            if abs(r_ball['cy'] - g_ball['cy']) < max_dy:
+                avg_area = (r_ball['area'] + g_ball['area']) / 2
+                if avg_area > max_avg_area:
+                    max_avg_area = avg_area
+                    best_gate = (r_ball, g_ball)
+    return best_gate
+
+
+def find_best_gate(red_balls, green_balls):
+    """Mencari pasangan bola merah dan hijau terbaik yang membentuk gerbang."""
+    if not red_balls or not green_balls:
+        return None
+    if len(red_balls) * len(green_balls) < GATE_VECTORIZE_MIN_PAIRS:
+        return _best_gate_loop(red_balls, green_balls)
+    indices = best_gate_indices(
+        np.array([(b['cx'], b['cy']) for b in red_balls]), np.array([b['area'] for b in red_balls]),
+        np.array([(b['cx'], b['cy']) for b in green_balls]), np.array([b['area'] for b in green_balls]))
+    if indices is None:
+        return None
+    return red_balls[indices[0]], green_balls[indices[1]]
+
+
+def gate_midpoint(best_gate):
+    """Titik tengah (x, y) antara dua bola gerbang."""
+    r_ball, g_ball = best_gate
+    return (r_ball['cx'] + g_ball['cx']) / 2.0, (r_ball['cy'] + g_ball['cy']) / 2.0
+
+
+def build_detection_message(mode, frame_seq, capture_time, frame_shape, objects, best_gate=None):
+    """
+    Menyusun pesan deteksi ringkas untuk frontend.
+    Setiap objek dikirim sebagai [label, conf, x1, y1, x2, y2] ditambah ID track
+    sebagai elemen ke-7 jika objek berasal dari tracker.
+    """
+    height, width = frame_shape[:2]
+    message = {
+        'type': 'detections',
+        'mode': mode,
+        'frame_seq': frame_seq,
+        'capture_time': round(capture_time, 3),
+        'size': [width, height],
+        'objects': [[obj['label'], obj['conf'], *obj['box']] + ([obj['id']] if 'id' in obj else []) for obj in objects],
+        'gate': None,
+    }
+    if best_gate:
+        mid_x, mid_y = gate_midpoint(best_gate)
+        message['gate'] = {'mid': [round(mid_x, 1), round(mid_y, 1)]}
+    return message
@@ -0,0 +1,161 @@
+import threading
+import time
+
+import cv2
+
+
+class LatestSlot:
+    """
+    Slot penghubung antar stage yang hanya menyimpan nilai terakhir.
+
+    Producer tidak pernah menunggu consumer: nilai lama langsung ditimpa, sehingga
+    stage yang lambat selalu mengambil data terbaru alih-alih menumpuk antrian.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._value = None
+        self._seq = 0
+        self._closed = False
+
+    @property
+    def seq(self):
+        return self._seq
+
+    def put(self, value):
+        with self._cond:
+            self._value = value
+            self._seq += 1
+            self._cond.notify_all()
+
+    def get_newer(self, last_seq, timeout=None):
+        """
+        Menunggu nilai dengan nomor urut lebih baru dari `last_seq`.
+        Mengembalikan (seq, value), atau (last_seq, None) jika timeout/slot ditutup.
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._seq != last_seq or self._closed, timeout):
+                return last_seq, None
+            if self._closed:
+                return last_seq, None
+            return self._seq, self._value
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+class PipelineStage(threading.Thread):
+    """Thread dasar untuk satu stage pipeline beserta statistik durasinya."""
+
+    def __init__(self, name):
+        super().__init__(name=name, daemon=True)
+        self._stop_event = threading.Event()
+        self.last_ms = None
+        self.processed = 0
+
+    def stop(self):
+        self._stop_event.set()
+
+    def _record(self, start):
+        self.last_ms = round((time.perf_counter() - start) * 1000, 2)
+        self.processed += 1
+
+
+class CaptureStage(PipelineStage):
+    """Membaca kamera terus-menerus dan hanya menyimpan frame terbaru di slot output."""
+
+    def __init__(self, cap, output_slot, name="capture"):
+        super().__init__(name)
+        self.cap = cap
+        self.output_slot = output_slot
+        self._frame_seq = 0
+
+    def run(self):
+        while not self._stop_event.is_set():
+            start = time.perf_counter()
+            ret, frame = self.cap.read()
+            if not ret:
+                time.sleep(0.1)
+                continue
+            self._frame_seq += 1
+            self.output_slot.put({'seq': self._frame_seq, 'capture_time': time.time(),
+                                  'capture_monotonic': time.monotonic(), 'frame': frame})
+            self._record(start)
+
+
+class RingCaptureStage(CaptureStage):
+    """
+    Seperti CaptureStage, tetapi kamera menulis langsung ke slot FrameRing yang
+    sudah dialokasikan, sehingga tidak ada alokasi array per frame. Item di slot
+    output membawa view frame dan `frame_ref` untuk memeriksa apakah slot
+    sudah ditimpa (frame_ref.valid()).
+    """
+
+    def __init__(self, cap, ring, output_slot, name="capture"):
+        super().__init__(cap, output_slot, name)
+        self.ring = ring
+
+    def run(self):
+        height, width = self.ring.shape[:2]
+        while not self._stop_event.is_set():
+            start = time.perf_counter()
+            buffer = self.ring.begin_write()
+            ret, frame = self.cap.read(buffer)
+            if not ret:
+                self.ring.abort()
+                time.sleep(0.1)
+                continue
+            if frame.ctypes.data != buffer.ctypes.data:
+                # Kamera tidak memberi ukuran yang diminta: satu salinan/resize ke slot
+                cv2.resize(frame, (width, height), dst=buffer, interpolation=cv2.INTER_AREA)
+            ref = self.ring.commit(time.time(), time.monotonic())
+            self.output_slot.put({'seq': ref.seq, 'capture_time': ref.capture_time,
+                                  'capture_monotonic': ref.capture_monotonic, 'frame': ref.frame, 'frame_ref': ref})
+            self._record(start)
+
+
+class ServiceCaptureStage(CaptureStage):
+    """
+    Seperti CaptureStage, tetapi sumbernya VisionClient: item di slot output
+    juga membawa hasil deteksi dari vision service untuk frame tersebut.
+    """
+
+    def run(self):
+        while not self._stop_event.is_set():
+            start = time.perf_counter()
+            packet = self.cap.read_packet()
+            if packet is None or packet['frame'] is None:
+                continue  # Client sudah menunggu sendiri saat koneksi ke service terputus
+            self.output_slot.put(packet)
+            self._record(start)
+
+
+class WorkerStage(PipelineStage):
+    """
+    Mengambil item terbaru dari slot input, memprosesnya dengan `fn`, lalu
+    menaruh hasilnya di slot output. Item yang terlewat saat `fn` sibuk dibuang.
+    """
+
+    def __init__(self, name, input_slot, output_slot, fn):
+        super().__init__(name)
+        self.input_slot = input_slot
+        self.output_slot = output_slot
+        self.fn = fn
+
+    def run(self):
+        last_seq = 0
+        while not self._stop_event.is_set():
+            last_seq, item = self.input_slot.get_newer(last_seq, timeout=0.5)
+            if item is None:
+                continue
+            start = time.perf_counter()
+            try:
+                result = self.fn(item)
+            except Exception as e:
+                print(f"Error pada stage '{self.name}': {e}")
+                continue
+            if result is not None:
+                self.output_slot.put(result)
+            self._record(start)
@@ -0,0 +1,154 @@
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# =================================================================
+# Ring buffer frame di shared memory (tanpa salinan, tanpa pickle)
+# =================================================================
+# Layout segmen:
+#   header slot x N : seq_lock uint64, capture_time float64, capture_monotonic float64
+#   frame slot x N  : array (H, W, 3) uint8 yang dialokasikan sekali
+#
+# seq_lock per slot berfungsi sebagai seqlock: writer membuatnya ganjil
+# (2*seq - 1) selama menulis dan genap (2*seq) setelah selesai. Reader
+# memakai frame langsung dari slot, lalu memeriksa valid() untuk tahu
+# apakah slot sudah ditimpa frame baru selama dipakai.
+#
+# Hanya ada satu writer (stage capture); reader boleh berada di thread
+# atau proses lain yang membuka ring dengan nama yang sama.
+# =================================================================
+
+SLOT_HEADER = np.dtype([('seq_lock', '<u8'), ('capture_time', '<f8'), ('capture_monotonic', '<f8')])
+
+
+def _attach_segment(name):
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        shm = shared_memory.SharedMemory(name=name)
+        try:
+            # Tanpa ini resource_tracker proses reader ikut menghapus segmen saat keluar
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(shm._name, "shared_memory")
+        except (ImportError, AttributeError, KeyError):
+            pass
+        return shm
+
+
+class FrameRef:
+    """Referensi ke satu frame di ring; `frame` adalah view langsung ke shared memory."""
+
+    __slots__ = ('ring', 'seq', 'index', 'frame', 'capture_time', 'capture_monotonic')
+
+    def __init__(self, ring, seq, index):
+        self.ring = ring
+        self.seq = seq
+        self.index = index
+        self.frame = ring.frames[index]
+        header = ring.headers[index]
+        self.capture_time = float(header['capture_time'])
+        self.capture_monotonic = float(header['capture_monotonic'])
+
+    def valid(self):
+        """False jika slot sudah (sedang) ditimpa frame lain sejak referensi dibuat."""
+        return int(self.ring.headers['seq_lock'][self.index]) == 2 * self.seq
+
+    def copy_to(self, out):
+        """Menyalin frame ke `out` (dialokasikan pemanggil). Mengembalikan False jika tertimpa saat disalin."""
+        np.copyto(out, self.frame)
+        return self.valid()
+
+
+class FrameRing:
+    def __init__(self, shm, shape, slots, owner):
+        self.shm = shm
+        self.shape = tuple(shape)
+        self.slots = slots
+        self.owner = owner
+        self.headers = np.ndarray((slots,), dtype=SLOT_HEADER, buffer=shm.buf)
+        self.frames = np.ndarray((slots, *self.shape), dtype=np.uint8, buffer=shm.buf,
+                                 offset=SLOT_HEADER.itemsize * slots)
+        if not owner:
+            self.frames.flags.writeable = False  # Reader tidak boleh mengubah frame milik bersama
+        self._next_seq = 1
+        self._writing = None
+
+    @staticmethod
+    def segment_size(shape, slots):
+        return (SLOT_HEADER.itemsize + int(np.prod(shape))) * slots
+
+    @classmethod
+    def create(cls, name, shape, slots=8):
+        """Membuat ring baru (dipanggil sekali oleh pemilik kamera)."""
+        size = cls.segment_size(shape, slots)
+        try:
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            # Sisa proses sebelumnya yang berhenti tidak bersih
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        ring = cls(shm, shape, slots, owner=True)
+        ring.headers[:] = 0
+        return ring
+
+    @classmethod
+    def attach(cls, name, shape, slots):
+        """Membuka ring yang sudah dibuat proses lain (read-only)."""
+        return cls(_attach_segment(name), shape, slots, owner=False)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    # --- Writer ---
+
+    def begin_write(self):
+        """Menandai slot berikutnya sedang ditulis; mengembalikan array slot untuk diisi langsung."""
+        index = self._next_seq % self.slots
+        self._writing = (index, int(self.headers['seq_lock'][index]))
+        self.headers['seq_lock'][index] = 2 * self._next_seq - 1
+        return self.frames[index]
+
+    def commit(self, capture_time, capture_monotonic):
+        """Menyelesaikan penulisan slot; mengembalikan FrameRef frame tersebut."""
+        index, _ = self._writing
+        seq = self._next_seq
+        header = self.headers[index]
+        header['capture_time'] = capture_time
+        header['capture_monotonic'] = capture_monotonic
+        self.headers['seq_lock'][index] = 2 * seq
+        self._next_seq += 1
+        self._writing = None
+        return FrameRef(self, seq, index)
+
+    def abort(self):
+        """Membatalkan penulisan (misal kamera gagal membaca); slot kembali ke isi sebelumnya."""
+        index, previous = self._writing
+        self.headers['seq_lock'][index] = previous
+        self._writing = None
+
+    def write(self, frame, capture_time=None, capture_monotonic=None):
+        """Menyalin frame yang sudah ada ke slot berikutnya (untuk sumber yang tidak bisa menulis langsung)."""
+        np.copyto(self.begin_write(), frame)
+        return self.commit(capture_time or time.time(), capture_monotonic or time.monotonic())
+
+    # --- Reader ---
+
+    def get(self, seq):
+        """FrameRef untuk frame `seq`, atau None jika slotnya sudah berisi frame lain."""
+        index = seq % self.slots
+        if int(self.headers['seq_lock'][index]) != 2 * seq:
+            return None
+        return FrameRef(self, seq, index)
+
+    def close(self):
+        self.headers = self.frames = None
+        try:
+            self.shm.close()
+        except BufferError:
+            pass  # Masih ada view frame yang dipegang; segmen dilepas saat proses keluar
+        if self.owner:
+            self.shm.unlink()
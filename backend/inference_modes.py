@@ -0,0 +1,96 @@
+import time
+
+from detections import extract_objects
+
+# =================================================================
+# Mode inferensi:
+#   full       - frame penuh dengan imgsz normal
+#   downscaled - frame penuh dengan imgsz kecil (lebih cepat, objek kecil bisa hilang)
+#   roi_crop   - setelah gerbang ditemukan, hanya jendela di sekitar gerbang
+#                terakhir yang diinferensi; frame penuh dijalankan ulang secara
+#                berkala (re-akuisisi) atau saat jendela tidak berisi objek
+# =================================================================
+
+INFERENCE_FULL = "full"
+INFERENCE_DOWNSCALED = "downscaled"
+INFERENCE_ROI_CROP = "roi_crop"
+INFERENCE_MODES = (INFERENCE_FULL, INFERENCE_DOWNSCALED, INFERENCE_ROI_CROP)
+
+
+def _round_up_32(value):
+    return max(32, (int(value) + 31) // 32 * 32)
+
+
+class RegionInference:
+    """
+    Pembungkus pemanggilan model sesuai mode inferensi. Koordinat hasil selalu
+    dalam sistem koordinat frame penuh, sehingga tracker dan logika gerbang
+    tidak perlu tahu mode yang dipakai.
+    """
+
+    def __init__(self, model, class_labels, mode=INFERENCE_FULL, imgsz=640, downscaled_imgsz=320,
+                 crop_padding=0.5, min_crop_size=160, reacquire_every=15, **model_kwargs):
+        if mode not in INFERENCE_MODES:
+            raise ValueError(f"Mode inferensi tidak dikenal: {mode}")
+        self.model = model
+        self.class_labels = class_labels
+        self.mode = mode
+        self.imgsz = imgsz
+        self.downscaled_imgsz = downscaled_imgsz
+        self.crop_padding = crop_padding
+        self.min_crop_size = min_crop_size
+        self.reacquire_every = reacquire_every
+        self.model_kwargs = model_kwargs
+        self._focus = None  # (x1, y1, x2, y2) area gerbang terakhir
+        self._crop_calls = 0
+        self.last_ms = {}
+        self.last_region = None
+
+    def set_focus(self, box):
+        """Dipanggil setelah gerbang ditemukan (box gabungan kedua bola), atau None jika hilang."""
+        self._focus = box
+
+    def detect(self, frame):
+        start = time.perf_counter()
+        region = self._crop_region(frame.shape) if self.mode == INFERENCE_ROI_CROP else None
+        if region is None:
+            imgsz = self.downscaled_imgsz if self.mode == INFERENCE_DOWNSCALED else self.imgsz
+            objects = extract_objects(self.model(frame, imgsz=imgsz, verbose=False, **self.model_kwargs), self.class_labels)
+            kind = "full" if self.mode != INFERENCE_DOWNSCALED else "downscaled"
+        else:
+            x1, y1, x2, y2 = region
+            crop = frame[y1:y2, x1:x2]  # View numpy, tanpa salinan
+            imgsz = min(self.imgsz, _round_up_32(max(x2 - x1, y2 - y1)))
+            results = self.model(crop, imgsz=imgsz, verbose=False, **self.model_kwargs)
+            objects = extract_objects(results, self.class_labels, offset=(x1, y1))
+            kind = "crop"
+            if not objects:
+                self._focus = None  # Kehilangan gerbang: frame berikutnya kembali penuh
+        self.last_region = region
+        self.last_ms[kind] = round((time.perf_counter() - start) * 1000, 2)
+        return objects
+
+    def _crop_region(self, frame_shape):
+        if self._focus is None:
+            self._crop_calls = 0
+            return None
+        self._crop_calls += 1
+        if self._crop_calls % self.reacquire_every == 0:
+            return None  # Re-akuisisi frame penuh secara berkala
+        height, width = frame_shape[:2]
+        x1, y1, x2, y2 = self._focus
+        pad_x = max((x2 - x1) * self.crop_padding, (self.min_crop_size - (x2 - x1)) / 2, 0)
+        pad_y = max((y2 - y1) * self.crop_padding, (self.min_crop_size - (y2 - y1)) / 2, 0)
+        x1, y1 = max(0, int(x1 - pad_x)), max(0, int(y1 - pad_y))
+        x2, y2 = min(width, int(x2 + pad_x)), min(height, int(y2 + pad_y))
+        if x2 - x1 < 32 or y2 - y1 < 32:
+            return None
+        return x1, y1, x2, y2
+
+
+def gate_region(best_gate):
+    """Box gabungan kedua bola gerbang, dipakai sebagai fokus mode roi_crop."""
+    if not best_gate:
+        return None
+    (ax1, ay1, ax2, ay2), (bx1, by1, bx2, by2) = best_gate[0]['box'], best_gate[1]['box']
+    return min(ax1, bx1), min(ay1, by1), max(ax2, bx2), max(ay2, by2)
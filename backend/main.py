@@ -1,125 +1,489 @@
 import psycopg2
-import psycopg2.extras
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, UploadFile, File
+import psycopg2.pool
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, UploadFile, File, Query, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse # <-- IMPORT BARU
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse # <-- IMPORT BARU
+from starlette.background import BackgroundTask
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List
+from typing import Dict, List
 import datetime
 import os
-import shutil
 import json
+import struct
+from telemetry_writer import TelemetryWriter, DEFAULT_VEHICLE_ID
+from telemetry_maintenance import TelemetryMaintenance
+from telemetry_history import TelemetryHistory, ExportBusy, EXPORT_FORMATS
+from client_sender import ClientSender, COALESCE_LATEST, DROP_OLDEST
+from vision_protocol import message_topic
+from telemetry_protocol import TelemetryState, is_telemetry_frame, unpack_telemetry
+from capture_index import CaptureIndex
+from thumbnails import ThumbnailGenerator
 
 app = FastAPI()
 UPLOADS_DIR = "uploads"
 os.makedirs(UPLOADS_DIR, exist_ok=True)
+THUMBNAILS_DIR = "thumbnails"
+MAX_UPLOAD_BYTES = 10 * 1024 * 1024
+MAX_UPLOAD_FILES = 50
+UPLOAD_CHUNK_SIZE = 256 * 1024
+MULTIPART_OVERHEAD_BYTES = 64 * 1024  # Header multipart per request (boundary, nama file, dsb.)
+# Batas ukuran body request upload, diperiksa dari Content-Length sebelum body diterima
+UPLOAD_BODY_LIMITS = {
+    "/upload/image": MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES,
+    "/upload/images": MAX_UPLOAD_FILES * MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES,
+}
+capture_index = CaptureIndex(UPLOADS_DIR)
+thumbnailer = ThumbnailGenerator(UPLOADS_DIR, THUMBNAILS_DIR)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"], allow_methods=["*"], allow_headers=["*"],
 )
 app.mount("/uploads", StaticFiles(directory=UPLOADS_DIR), name="uploads")
 
-def get_db():
-    return psycopg2.connect(
-        dbname="autopilot_db", user="postgres", password="postgres", 
-        host="localhost", port="5432"
-    )
+DB_CONFIG = dict(
+    dbname="autopilot_db", user="postgres", password="postgres",
+    host="localhost", port="5432"
+)
+DB_POOL_MAX_CONN = 6
+
+# minconn=0 agar server tetap bisa start walaupun database belum siap
+db_pool = psycopg2.pool.ThreadedConnectionPool(0, DB_POOL_MAX_CONN, **DB_CONFIG)
+telemetry_writer = TelemetryWriter(db_pool, batch_size=200, flush_interval=0.5)
+# Export memakai koneksi sendiri (maks. 2 bersamaan) agar unduhan lambat tidak menghabiskan pool
+telemetry_history = TelemetryHistory(db_pool, DB_CONFIG, max_exports=2)
+# Rollup dan partisi telemetri (lihat migrations/); retensi dimatikan secara default.
+# Writer diberikan agar baris yang terlambat di-commit (retry/backlog) tetap masuk rollup
+telemetry_maintenance = TelemetryMaintenance(db_pool, writer=telemetry_writer, retention_days=None)
+DEFAULT_HISTORY_WINDOW = datetime.timedelta(hours=1)
+
+@app.on_event("startup")
+async def start_background_workers():
+    capture_index.load()
+    telemetry_writer.start()
+    telemetry_maintenance.start()
+
+@app.on_event("shutdown")
+async def stop_background_workers():
+    telemetry_writer.stop()
+    telemetry_maintenance.stop()
+    thumbnailer.shutdown()
+    db_pool.closeall()
+
+# Kebijakan antrian kirim per frontend: (kebijakan overflow, kapasitas)
+FRONTEND_TOPIC_POLICIES = {
+    "telemetry": (COALESCE_LATEST, 1),
+    # Frame biner keyframe/delta (telemetry_protocol.py) tidak boleh di-coalesce
+    # karena tiap delta hanya berisi sebagian field
+    "telemetry_bin": (DROP_OLDEST, 32),
+    "video": (DROP_OLDEST, 2),
+    "detections": (COALESCE_LATEST, 1),
+    "status": (DROP_OLDEST, 16),
+}
+
+# Topic yang bisa dilanggan frontend -> antrian ClientSender yang dipakainya
+SUBSCRIPTION_TOPICS = {
+    "telemetry": ("telemetry", "telemetry_bin"),
+    "vision": ("video", "detections"),
+    "status": ("status",),
+}
+QUEUE_TOPIC_SUBSCRIPTION = {queue: topic for topic, queues in SUBSCRIPTION_TOPICS.items() for queue in queues}
 
 class ConnectionManager:
+    """
+    Routing per kendaraan. Controller dan logger terdaftar dengan vehicle_id;
+    setiap koneksi frontend melanggan satu kendaraan dan sebagian topic, dan
+    perintahnya diteruskan ke controller kendaraan tersebut. Pesan hanya
+    di-enqueue ke pelanggan (vehicle_id, topic) yang bersangkutan.
+    """
     def __init__(self):
-        self.frontend_connections: List[WebSocket] = []
-        self.mission_controller: WebSocket | None = None
-    async def connect(self, websocket: WebSocket, client_type: str):
+        self.frontend_connections: Dict[WebSocket, ClientSender] = {}
+        self.frontend_subscriptions: Dict[WebSocket, tuple[str, frozenset]] = {}
+        self.subscribers: Dict[tuple[str, str], Dict[WebSocket, ClientSender]] = {}
+        self.binary_telemetry_frontends: set[WebSocket] = set()
+        self.controllers: Dict[str, WebSocket] = {}
+        self.loggers: Dict[str, int] = {}  # vehicle_id -> jumlah logger terhubung
+    async def connect(self, websocket: WebSocket, client_type: str, vehicle_id: str = DEFAULT_VEHICLE_ID,
+                      topics=tuple(SUBSCRIPTION_TOPICS), telemetry_encoding: str = "json"):
         await websocket.accept()
         if client_type == "frontend":
-            self.frontend_connections.append(websocket)
-            print(f"Info: Frontend client terhubung. Total: {len(self.frontend_connections)}")
+            sender = ClientSender(websocket, FRONTEND_TOPIC_POLICIES, on_error=lambda ws: self.disconnect(ws, "frontend"))
+            sender.start()
+            self.frontend_connections[websocket] = sender
+            self.frontend_subscriptions[websocket] = (vehicle_id, frozenset(topics))
+            for topic in topics:
+                self.subscribers.setdefault((vehicle_id, topic), {})[websocket] = sender
+            if telemetry_encoding == "binary":
+                self.binary_telemetry_frontends.add(websocket)
+            print(f"Info: Frontend client terhubung ({vehicle_id}: {', '.join(sorted(topics))}). Total: {len(self.frontend_connections)}")
         elif client_type == "controller":
-            self.mission_controller = websocket
-            print("Info: Mission Controller terhubung.")
-    def disconnect(self, websocket: WebSocket, client_type: str):
+            previous = self.controllers.get(vehicle_id)
+            self.controllers[vehicle_id] = websocket
+            if previous is not None:
+                # Biasanya controller yang reconnect sebelum koneksi lamanya terdeteksi putus
+                print(f"Peringatan: Mission Controller '{vehicle_id}' baru menggantikan koneksi lama.")
+                try:
+                    await previous.close(code=1012)
+                except Exception:
+                    pass
+            print(f"Info: Mission Controller '{vehicle_id}' terhubung. Total: {len(self.controllers)}")
+    def disconnect(self, websocket: WebSocket, client_type: str, vehicle_id: str = DEFAULT_VEHICLE_ID):
         if client_type == "frontend" and websocket in self.frontend_connections:
-            self.frontend_connections.remove(websocket)
+            self.frontend_connections.pop(websocket).stop()
+            self.binary_telemetry_frontends.discard(websocket)
+            subscribed_vehicle, topics = self.frontend_subscriptions.pop(websocket)
+            for topic in topics:
+                key = (subscribed_vehicle, topic)
+                self.subscribers[key].pop(websocket, None)
+                if not self.subscribers[key]:
+                    del self.subscribers[key]
             print(f"Info: Frontend client terputus. Sisa: {len(self.frontend_connections)}")
-        elif client_type == "controller":
-            self.mission_controller = None
-            print("Info: Mission Controller terputus.")
-    async def broadcast_to_frontends(self, message: str):
-        for connection in list(self.frontend_connections):
-            try:
-                await connection.send_text(message)
-            except Exception:
-                self.disconnect(connection, "frontend")
-    async def send_to_controller(self, message: str):
-        if self.mission_controller:
-            try:
-                await self.mission_controller.send_text(message)
-            except Exception:
-                self.disconnect(self.mission_controller, "controller")
+        elif client_type == "controller" and self.controllers.get(vehicle_id) is websocket:
+            # Koneksi lama yang sudah digantikan tidak menghapus controller penggantinya
+            del self.controllers[vehicle_id]
+            print(f"Info: Mission Controller '{vehicle_id}' terputus.")
+    def register_logger(self, vehicle_id: str):
+        self.loggers[vehicle_id] = self.loggers.get(vehicle_id, 0) + 1
+    def unregister_logger(self, vehicle_id: str):
+        remaining = self.loggers.get(vehicle_id, 0) - 1
+        if remaining > 0:
+            self.loggers[vehicle_id] = remaining
+        else:
+            self.loggers.pop(vehicle_id, None)
+    def broadcast_to_frontends(self, vehicle_id: str, message: str | bytes, topic: str):
+        """Menaruh pesan di antrian frontend yang melanggan kendaraan dan topic ini; pengiriman dilakukan task milik masing-masing klien."""
+        for sender in self.subscribers.get((vehicle_id, QUEUE_TOPIC_SUBSCRIPTION.get(topic, topic)), {}).values():
+            sender.enqueue(topic, message)
+    def broadcast_telemetry(self, vehicle_id: str, state: dict, frame: bytes | None = None):
+        """
+        Frontend biner menerima frame logger apa adanya (tanpa encode ulang);
+        frontend JSON menerima state penuh, di-serialize sekali untuk semua klien.
+        """
+        json_message = None
+        for websocket, sender in self.subscribers.get((vehicle_id, "telemetry"), {}).items():
+            if frame is not None and websocket in self.binary_telemetry_frontends:
+                sender.enqueue("telemetry_bin", frame)
+                continue
+            if json_message is None:
+                json_message = json.dumps({"type": "telemetry", "vehicle_id": vehicle_id, "data": state})
+            sender.enqueue("telemetry", json_message)
+    def frontend_stats(self):
+        return [
+            dict(sender.stats(), vehicle_id=self.frontend_subscriptions[ws][0], subscriptions=sorted(self.frontend_subscriptions[ws][1]))
+            for ws, sender in self.frontend_connections.items()
+        ]
+    def vehicles(self):
+        """Kendaraan yang dikenal (controller atau logger terhubung) beserta jumlah pelanggan per topic."""
+        vehicle_ids = set(self.controllers) | set(self.loggers) | {vehicle for vehicle, _ in self.subscribers}
+        return [
+            {
+                "vehicle_id": vehicle_id,
+                "controller": vehicle_id in self.controllers,
+                "loggers": self.loggers.get(vehicle_id, 0),
+                "subscribers": {topic: len(self.subscribers.get((vehicle_id, topic), {})) for topic in SUBSCRIPTION_TOPICS},
+            }
+            for vehicle_id in sorted(vehicle_ids)
+        ]
+    async def send_to_controller(self, vehicle_id: str, message: str):
+        """Meneruskan perintah ke controller kendaraan. Mengembalikan False jika controller tidak terhubung."""
+        controller = self.controllers.get(vehicle_id)
+        if controller is None:
+            return False
+        try:
+            await controller.send_text(message)
+            return True
+        except Exception:
+            self.disconnect(controller, "controller", vehicle_id)
+            return False
 
 manager = ConnectionManager()
 
+class UploadTooLarge(Exception):
+    pass
+
+def _open_part_file(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return open(path, "wb")
+
+def _discard_part_file(buffer, path):
+    buffer.close()
+    if os.path.exists(path):
+        os.remove(path)
+
+@app.middleware("http")
+async def limit_upload_body(request: Request, call_next):
+    """
+    UploadFile baru tersedia setelah Starlette mem-parse (dan men-spool) seluruh
+    body multipart, jadi batas ukuran di save_capture() terlambat untuk
+    melindungi memori/disk server. Di sini request upload ditolak dari
+    Content-Length sebelum body-nya dibaca; upload tanpa Content-Length
+    (chunked) ditolak karena ukurannya tidak bisa dibatasi sejak awal.
+    """
+    limit = UPLOAD_BODY_LIMITS.get(request.url.path)
+    if limit is not None and request.method == "POST":
+        length = request.headers.get("content-length")
+        if length is None or not length.isdigit():
+            return JSONResponse({"detail": "Upload wajib menyertakan Content-Length"}, status_code=411)
+        if int(length) > limit:
+            return JSONResponse({"detail": f"Body upload melebihi batas {limit} byte"}, status_code=413)
+    return await call_next(request)
+
+async def save_capture(file: UploadFile, suffix: str = ""):
+    """
+    Menyimpan satu upload secara streaming per-chunk. Operasi disk dijalankan
+    di threadpool agar event loop (relay websocket) tidak ikut tertahan, dan
+    file baru terlihat (rename atomik) setelah seluruh isinya tertulis.
+    Batas MAX_UPLOAD_BYTES di sini berlaku per file; batas body request
+    ditegakkan lebih awal oleh limit_upload_body().
+    """
+    now = datetime.datetime.now()
+    # Disimpan per tanggal agar satu folder tidak berisi ribuan file
+    rel_path = f"{now:%Y%m%d}/capture_{now:%Y%m%d_%H%M%S_%f}{suffix}.jpg"
+    file_path = os.path.join(UPLOADS_DIR, rel_path)
+    part_path = file_path + ".part"
+    size = 0
+    buffer = await run_in_threadpool(_open_part_file, part_path)
+    try:
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            size += len(chunk)
+            if size > MAX_UPLOAD_BYTES:
+                raise UploadTooLarge(f"Ukuran file melebihi batas {MAX_UPLOAD_BYTES} byte")
+            await run_in_threadpool(buffer.write, chunk)
+        await run_in_threadpool(buffer.close)
+        await run_in_threadpool(os.replace, part_path, file_path)
+    except BaseException:
+        await run_in_threadpool(_discard_part_file, buffer, part_path)
+        raise
+    await run_in_threadpool(capture_index.add, rel_path, now.timestamp(), size)
+    thumbnailer.submit(rel_path)  # Thumbnail dibuat di background, upload langsung selesai
+    return rel_path
+
 @app.post("/upload/image")
 async def upload_image(file: UploadFile = File(...)):
-    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S_%f")
-    file_path = os.path.join(UPLOADS_DIR, f"capture_{timestamp}.jpg")
     try:
-        with open(file_path, "wb") as buffer: shutil.copyfileobj(file.file, buffer)
-        return {"status": "ok"}
+        rel_path = await save_capture(file)
+        return {"status": "ok", "path": rel_path}
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
-        return {"status": "error", "message": str(e)}
+        # File .part sudah dihapus save_capture; status 5xx agar pengirim (CaptureUploader) mencoba lagi
+        raise HTTPException(status_code=500, detail=f"Gagal menyimpan gambar: {e}")
+
+@app.post("/upload/images")
+async def upload_images(files: List[UploadFile] = File(...)):
+    """Upload beberapa snapshot sekaligus dalam satu request (misal saat burst)."""
+    if len(files) > MAX_UPLOAD_FILES:
+        raise HTTPException(status_code=413, detail=f"Maksimal {MAX_UPLOAD_FILES} file per request")
+    saved, errors = [], []
+    for i, file in enumerate(files):
+        try:
+            saved.append(await save_capture(file, suffix=f"_{i:02d}"))
+        except Exception as e:
+            errors.append({"index": i, "filename": file.filename, "message": str(e)})
+    return {"status": "ok" if not errors else "partial", "saved": saved, "errors": errors}
 
 @app.get("/images/latest")
-async def get_latest_images():
+async def get_latest_images(limit: int = Query(4, ge=1, le=100)):
+    return {"images": [entry["path"] for entry in capture_index.latest(limit)]}
+
+@app.get("/images")
+async def list_images(cursor: str | None = None, limit: int = Query(20, ge=1, le=200)):
+    """Daftar gambar terbaru ke terlama, berhalaman dengan cursor."""
+    try:
+        images, next_cursor = capture_index.page(cursor, limit)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Cursor tidak valid")
+    return {"images": images, "next_cursor": next_cursor}
+
+@app.get("/images/range")
+async def list_images_in_range(start: datetime.datetime, end: datetime.datetime, limit: int = Query(100, ge=1, le=1000)):
+    """Daftar gambar dalam rentang waktu [start, end), terlama lebih dulu."""
+    return {"images": capture_index.time_range(start.timestamp(), end.timestamp(), limit)}
+
+@app.get("/images/{variant}/{image_path:path}")
+async def get_image_variant(variant: str, image_path: str, request: Request):
+    """Menyajikan thumbnail/preview. File capture tidak pernah berubah sehingga boleh di-cache permanen."""
+    rel_path = os.path.normpath(image_path).replace(os.sep, "/")
+    if variant not in thumbnailer.variants or rel_path.startswith(("..", "/")):
+        raise HTTPException(status_code=404)
+    source_path = os.path.join(UPLOADS_DIR, rel_path)
+    if not os.path.isfile(source_path):
+        raise HTTPException(status_code=404)
+    st = os.stat(source_path)
+    etag = f'"{variant}-{st.st_size:x}-{st.st_mtime_ns:x}"'
+    cache_headers = {"ETag": etag, "Cache-Control": "public, max-age=31536000, immutable"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=cache_headers)
+    path = await run_in_threadpool(thumbnailer.ensure, variant, rel_path)
+    if path is None:
+        raise HTTPException(status_code=404)
+    return FileResponse(path, media_type="image/jpeg", headers=cache_headers)
+
+@app.get("/stats/thumbnails")
+async def get_thumbnail_stats():
+    return thumbnailer.stats()
+
+@app.get("/stats/telemetry")
+async def get_telemetry_writer_stats():
+    """Statistik penulisan telemetri: kedalaman antrian, latensi flush, baris terbuang, rollup."""
+    return {**telemetry_writer.stats(), "maintenance": telemetry_maintenance.stats()}
+
+def _history_request(start, end, fields):
+    """Rentang default satu jam terakhir; waktu tanpa zona dianggap waktu lokal (sama seperti /images/range)."""
+    end = (end or datetime.datetime.now()).astimezone()
+    start = (start or end - DEFAULT_HISTORY_WINDOW).astimezone()
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start harus sebelum end")
     try:
-        files = [f for f in os.listdir(UPLOADS_DIR) if f.endswith(('.jpg', '.jpeg', '.png'))]
-        sorted_files = sorted(files, key=lambda f: os.path.getmtime(os.path.join(UPLOADS_DIR, f)), reverse=True)
-        return {"images": sorted_files[:4]}
-    except Exception: return {"images": []}
+        columns = telemetry_history.validate_fields([f.strip() for f in fields.split(",") if f.strip()] if fields else None)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return start, end, columns
+
+@app.get("/telemetry/history")
+async def get_telemetry_history(
+    start: datetime.datetime | None = None,
+    end: datetime.datetime | None = None,
+    fields: str | None = None,
+    points: int = Query(500, ge=10, le=5000),
+    extremes: bool = True,
+    vehicle_id: str | None = None,
+    mission_id: str | None = None,
+):
+    """
+    Telemetri dalam rentang waktu, di-downsample di database menjadi paling
+    banyak `points` bucket (avg, dan min/max jika `extremes`) per field.
+    """
+    start, end, columns = _history_request(start, end, fields)
+    try:
+        return await run_in_threadpool(telemetry_history.buckets, start, end, columns, points, extremes, vehicle_id, mission_id)
+    except psycopg2.Error as e:
+        raise HTTPException(status_code=503, detail=f"Database tidak tersedia: {e}")
+
+@app.get("/telemetry/export")
+async def export_telemetry(
+    start: datetime.datetime | None = None,
+    end: datetime.datetime | None = None,
+    fields: str | None = None,
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    vehicle_id: str | None = None,
+    mission_id: str | None = None,
+):
+    """Unduhan baris telemetri mentah (NDJSON/CSV) yang dialirkan langsung dari server-side cursor."""
+    start, end, columns = _history_request(start, end, fields)
+    filename = f"telemetry_{start:%Y%m%d_%H%M%S}_{end:%Y%m%d_%H%M%S}.{format}"
+    # Koneksi dan query disiapkan sebelum header 200 dikirim, jadi kegagalan di sini masih bisa dijawab 503
+    try:
+        stream = await run_in_threadpool(
+            telemetry_history.open_export, start, end, columns, format, vehicle_id, mission_id)
+    except ExportBusy as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "10"})
+    except psycopg2.Error as e:
+        raise HTTPException(status_code=503, detail=f"Database tidak tersedia: {e}")
+    # Iterator sinkron dijalankan Starlette di threadpool, chunk demi chunk; close() juga
+    # dipanggil sebagai background task agar koneksi lepas walau klien putus sebelum streaming mulai
+    return StreamingResponse(
+        stream,
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+        background=BackgroundTask(stream.close),
+    )
+
+@app.get("/vehicles")
+async def list_vehicles():
+    """Kendaraan yang controller/logger-nya terhubung, beserta jumlah pelanggan per topic."""
+    return {"vehicles": manager.vehicles()}
+
+@app.get("/stats/frontends")
+async def get_frontend_stats():
+    """Statistik antrian kirim setiap frontend (pesan terkirim/terbuang, lag)."""
+    return {"clients": manager.frontend_stats()}
 
 @app.websocket("/ws/telemetry")
-async def websocket_telemetry_endpoint(websocket: WebSocket):
+async def websocket_telemetry_endpoint(websocket: WebSocket, vehicle_id: str = DEFAULT_VEHICLE_ID, mission_id: str = ""):
     await websocket.accept()
-    print("Info: Logger telemetri terhubung.")
+    manager.register_logger(vehicle_id)
+    print(f"Info: Logger telemetri '{vehicle_id}' terhubung.")
+    # Logger mengirim keyframe lengkap lalu delta (hanya field yang berubah), sebagai
+    # JSON atau frame biner (telemetry_protocol.py); state digabung di sini agar
+    # baris database dan frontend JSON selalu lengkap
+    state = TelemetryState()
     try:
         while True:
-            message = await websocket.receive_text()
-            payload = json.loads(message)
-            if payload.get("type") == "telemetry":
-                data = payload.get("data", {})
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            frame = message.get("bytes")
+            if frame is not None:
+                if not is_telemetry_frame(frame):
+                    continue
+                try:
+                    kind, key_seq, data = unpack_telemetry(frame)
+                except (ValueError, struct.error) as e:
+                    # Satu frame rusak/versi lain tidak boleh memutus koneksi logger
+                    print(f"Peringatan: Frame telemetri '{vehicle_id}' dilewati: {e}")
+                    continue
+                if not state.apply(kind, data, key_seq):
+                    continue
+            elif message.get("text") is not None:
                 try:
-                    conn = get_db()
-                    cur = conn.cursor()
-                    cur.execute("INSERT INTO telemetry (roll, pitch, yaw, lat, lon, groundspeed, heading, voltage, current) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)",
-                                (data.get('roll'), data.get('pitch'), data.get('yaw'), data.get('lat'), data.get('lon'), data.get('groundspeed'), data.get('heading'), data.get('voltage'), data.get('current')))
-                    conn.commit()
-                    cur.close()
-                    conn.close()
-                except Exception as e:
-                    print(f"Error Database: {e}")
-                await manager.broadcast_to_frontends(message)
+                    payload = json.loads(message["text"])
+                except ValueError as e:
+                    print(f"Peringatan: Pesan telemetri '{vehicle_id}' bukan JSON valid: {e}")
+                    continue
+                if not isinstance(payload, dict) or payload.get("type") != "telemetry":
+                    continue
+                kind, data = payload.get("kind", "key"), payload.get("data")
+                if kind not in ("key", "delta") or not isinstance(data, dict):
+                    print(f"Peringatan: Pesan telemetri '{vehicle_id}' dilewati: 'kind'/'data' tidak valid")
+                    continue
+                state.apply(kind, data)
+            else:
+                continue
+            # Penulisan ke database dilakukan per-batch oleh TelemetryWriter (thread terpisah)
+            telemetry_writer.submit(state.data, vehicle_id, mission_id)
+            manager.broadcast_telemetry(vehicle_id, state.data, frame)
     except WebSocketDisconnect:
-        print("Info: Logger telemetri terputus.")
+        print(f"Info: Logger telemetri '{vehicle_id}' terputus.")
+    finally:
+        manager.unregister_logger(vehicle_id)
 
 @app.websocket("/ws/frontend")
-async def websocket_frontend_endpoint(websocket: WebSocket):
-    await manager.connect(websocket, "frontend")
+async def websocket_frontend_endpoint(websocket: WebSocket, vehicle_id: str = DEFAULT_VEHICLE_ID,
+                                      topics: str | None = None, telemetry: str = "json"):
+    # ?vehicle_id=...&topics=telemetry,vision,status (default semua topic)
+    # ?telemetry=binary: telemetri dikirim sebagai frame biner keyframe/delta
+    requested = [t.strip() for t in topics.split(",") if t.strip()] if topics else list(SUBSCRIPTION_TOPICS)
+    unknown = [t for t in requested if t not in SUBSCRIPTION_TOPICS]
+    if unknown:
+        await websocket.close(code=1008, reason=f"Topic tidak dikenal: {', '.join(unknown)}")
+        return
+    await manager.connect(websocket, "frontend", vehicle_id=vehicle_id, topics=requested, telemetry_encoding=telemetry)
     try:
         while True:
             command_str = await websocket.receive_text()
-            await manager.send_to_controller(command_str)
+            # Perintah dari frontend hanya diteruskan ke controller kendaraan yang dilanggannya
+            if not await manager.send_to_controller(vehicle_id, command_str) and websocket in manager.frontend_connections:
+                manager.frontend_connections[websocket].enqueue(
+                    "status", json.dumps({"type": "error", "vehicle_id": vehicle_id, "message": "Mission Controller tidak terhubung"}))
     except WebSocketDisconnect:
         manager.disconnect(websocket, "frontend")
 
 @app.websocket("/ws/mission_control")
-async def websocket_mission_control_endpoint(websocket: WebSocket):
-    await manager.connect(websocket, "controller")
+async def websocket_mission_control_endpoint(websocket: WebSocket, vehicle_id: str = DEFAULT_VEHICLE_ID):
+    await manager.connect(websocket, "controller", vehicle_id=vehicle_id)
     try:
         while True:
-            message = await websocket.receive_text()
-            await manager.broadcast_to_frontends(message)
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            # Pesan biner (lihat vision_protocol.py) diteruskan apa adanya tanpa di-parse ulang
+            if message.get("bytes") is not None:
+                manager.broadcast_to_frontends(vehicle_id, message["bytes"], message_topic(message["bytes"]))
+            elif message.get("text") is not None:
+                manager.broadcast_to_frontends(vehicle_id, message["text"], "status")
     except WebSocketDisconnect:
-        manager.disconnect(websocket, "controller")
+        manager.disconnect(websocket, "controller", vehicle_id)
 
 # --- PERUBAHAN DI SINI: Endpoint untuk menyajikan index.html ---
 @app.get("/")
@@ -0,0 +1,99 @@
+-- Tabel telemetri time-series: dipartisi per bulan pada kolom timestamp,
+-- dengan identitas kendaraan dan misi. Tabel 'telemetry' lama (heap tunggal
+-- buatan db_setup.py versi awal) dipindahkan ke sini jika ada.
+
+CREATE OR REPLACE FUNCTION ensure_telemetry_partitions(from_month TIMESTAMPTZ, months INTEGER)
+RETURNS VOID AS $$
+DECLARE
+    month_start TIMESTAMPTZ := date_trunc('month', from_month);
+BEGIN
+    FOR i IN 0 .. months - 1 LOOP
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS %I PARTITION OF telemetry FOR VALUES FROM (%L) TO (%L)',
+            'telemetry_' || to_char(month_start, 'YYYYMM'), month_start, month_start + INTERVAL '1 month'
+        );
+        month_start := month_start + INTERVAL '1 month';
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Partisi lama dilepas dengan DROP TABLE (instan), bukan DELETE per baris
+CREATE OR REPLACE FUNCTION drop_telemetry_partitions_before(cutoff TIMESTAMPTZ)
+RETURNS INTEGER AS $$
+DECLARE
+    part RECORD;
+    dropped INTEGER := 0;
+BEGIN
+    FOR part IN
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'telemetry'::regclass AND c.relname ~ '^telemetry_[0-9]{6}$'
+    LOOP
+        IF to_timestamp(substr(part.relname, 11), 'YYYYMM') + INTERVAL '1 month' <= cutoff THEN
+            EXECUTE format('DROP TABLE %I', part.relname);
+            dropped := dropped + 1;
+        END IF;
+    END LOOP;
+    RETURN dropped;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_class WHERE relname = 'telemetry' AND relkind = 'r') THEN
+        ALTER TABLE telemetry RENAME TO telemetry_legacy;
+    END IF;
+END;
+$$;
+
+CREATE TABLE IF NOT EXISTS telemetry (
+    id BIGSERIAL,
+    timestamp TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    vehicle_id TEXT NOT NULL DEFAULT 'default',
+    mission_id TEXT NOT NULL DEFAULT '',
+
+    -- Data Attitude
+    roll FLOAT,
+    pitch FLOAT,
+    yaw FLOAT,
+
+    -- Data GPS
+    lat DOUBLE PRECISION,
+    lon DOUBLE PRECISION,
+
+    -- Data Performa
+    groundspeed FLOAT,
+    heading INTEGER,
+    voltage FLOAT,
+    current FLOAT
+) PARTITION BY RANGE (timestamp);
+
+-- Penampung baris di luar partisi bulanan yang sudah dibuat
+CREATE TABLE IF NOT EXISTS telemetry_default PARTITION OF telemetry DEFAULT;
+
+-- BRIN: sangat kecil dan cocok karena baris masuk berurutan waktu
+CREATE INDEX IF NOT EXISTS telemetry_timestamp_brin ON telemetry USING BRIN (timestamp);
+CREATE INDEX IF NOT EXISTS telemetry_vehicle_mission_ts ON telemetry (vehicle_id, mission_id, timestamp);
+
+DO $$
+DECLARE
+    first_ts TIMESTAMPTZ;
+BEGIN
+    IF to_regclass('telemetry_legacy') IS NOT NULL THEN
+        SELECT min(timestamp) INTO first_ts FROM telemetry_legacy;
+        IF first_ts IS NOT NULL THEN
+            PERFORM ensure_telemetry_partitions(
+                first_ts,
+                (extract(year FROM age(date_trunc('month', now()), date_trunc('month', first_ts))) * 12
+                 + extract(month FROM age(date_trunc('month', now()), date_trunc('month', first_ts))))::INTEGER + 1
+            );
+        END IF;
+        INSERT INTO telemetry (timestamp, roll, pitch, yaw, lat, lon, groundspeed, heading, voltage, current)
+        SELECT coalesce(timestamp, CURRENT_TIMESTAMP), roll, pitch, yaw, lat, lon, groundspeed, heading, voltage, current FROM telemetry_legacy;
+        DROP TABLE telemetry_legacy;
+    END IF;
+END;
+$$;
+
+SELECT ensure_telemetry_partitions(now(), 3);
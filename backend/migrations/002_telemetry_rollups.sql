@@ -0,0 +1,174 @@
+-- Rollup 1 detik dan 1 menit (avg/min/max per field) untuk query histori
+-- rentang panjang. Diperbarui terus oleh TelemetryMaintenance
+-- (telemetry_maintenance.py) yang memanggil refresh_telemetry_rollups().
+
+-- Rollup per detik
+CREATE TABLE IF NOT EXISTS telemetry_1s (
+    bucket TIMESTAMPTZ NOT NULL,
+    vehicle_id TEXT NOT NULL,
+    mission_id TEXT NOT NULL,
+    samples INTEGER NOT NULL,
+    roll_avg DOUBLE PRECISION,
+    roll_min DOUBLE PRECISION,
+    roll_max DOUBLE PRECISION,
+    pitch_avg DOUBLE PRECISION,
+    pitch_min DOUBLE PRECISION,
+    pitch_max DOUBLE PRECISION,
+    yaw_avg DOUBLE PRECISION,
+    yaw_min DOUBLE PRECISION,
+    yaw_max DOUBLE PRECISION,
+    lat_avg DOUBLE PRECISION,
+    lat_min DOUBLE PRECISION,
+    lat_max DOUBLE PRECISION,
+    lon_avg DOUBLE PRECISION,
+    lon_min DOUBLE PRECISION,
+    lon_max DOUBLE PRECISION,
+    groundspeed_avg DOUBLE PRECISION,
+    groundspeed_min DOUBLE PRECISION,
+    groundspeed_max DOUBLE PRECISION,
+    heading_avg DOUBLE PRECISION,
+    heading_min DOUBLE PRECISION,
+    heading_max DOUBLE PRECISION,
+    voltage_avg DOUBLE PRECISION,
+    voltage_min DOUBLE PRECISION,
+    voltage_max DOUBLE PRECISION,
+    current_avg DOUBLE PRECISION,
+    current_min DOUBLE PRECISION,
+    current_max DOUBLE PRECISION,
+    PRIMARY KEY (vehicle_id, mission_id, bucket)
+);
+CREATE INDEX IF NOT EXISTS telemetry_1s_bucket_brin ON telemetry_1s USING BRIN (bucket);
+
+-- Rollup per menit
+CREATE TABLE IF NOT EXISTS telemetry_1m (
+    bucket TIMESTAMPTZ NOT NULL,
+    vehicle_id TEXT NOT NULL,
+    mission_id TEXT NOT NULL,
+    samples INTEGER NOT NULL,
+    roll_avg DOUBLE PRECISION,
+    roll_min DOUBLE PRECISION,
+    roll_max DOUBLE PRECISION,
+    pitch_avg DOUBLE PRECISION,
+    pitch_min DOUBLE PRECISION,
+    pitch_max DOUBLE PRECISION,
+    yaw_avg DOUBLE PRECISION,
+    yaw_min DOUBLE PRECISION,
+    yaw_max DOUBLE PRECISION,
+    lat_avg DOUBLE PRECISION,
+    lat_min DOUBLE PRECISION,
+    lat_max DOUBLE PRECISION,
+    lon_avg DOUBLE PRECISION,
+    lon_min DOUBLE PRECISION,
+    lon_max DOUBLE PRECISION,
+    groundspeed_avg DOUBLE PRECISION,
+    groundspeed_min DOUBLE PRECISION,
+    groundspeed_max DOUBLE PRECISION,
+    heading_avg DOUBLE PRECISION,
+    heading_min DOUBLE PRECISION,
+    heading_max DOUBLE PRECISION,
+    voltage_avg DOUBLE PRECISION,
+    voltage_min DOUBLE PRECISION,
+    voltage_max DOUBLE PRECISION,
+    current_avg DOUBLE PRECISION,
+    current_min DOUBLE PRECISION,
+    current_max DOUBLE PRECISION,
+    PRIMARY KEY (vehicle_id, mission_id, bucket)
+);
+CREATE INDEX IF NOT EXISTS telemetry_1m_bucket_brin ON telemetry_1m USING BRIN (bucket);
+
+-- Menghitung ulang semua bucket sejak `since` (bucket yang sudah ada ditimpa,
+-- sehingga aman dipanggil berulang dengan jendela yang tumpang tindih)
+CREATE OR REPLACE FUNCTION refresh_telemetry_rollups(since TIMESTAMPTZ)
+RETURNS VOID AS $$
+BEGIN
+    INSERT INTO telemetry_1s (bucket, vehicle_id, mission_id, samples, roll_avg, roll_min, roll_max, pitch_avg, pitch_min, pitch_max, yaw_avg, yaw_min, yaw_max, lat_avg, lat_min, lat_max, lon_avg, lon_min, lon_max, groundspeed_avg, groundspeed_min, groundspeed_max, heading_avg, heading_min, heading_max, voltage_avg, voltage_min, voltage_max, current_avg, current_min, current_max)
+    SELECT date_trunc('second', timestamp), vehicle_id, mission_id, count(*),
+           avg(roll), min(roll), max(roll),
+           avg(pitch), min(pitch), max(pitch),
+           avg(yaw), min(yaw), max(yaw),
+           avg(lat), min(lat), max(lat),
+           avg(lon), min(lon), max(lon),
+           avg(groundspeed), min(groundspeed), max(groundspeed),
+           avg(heading), min(heading), max(heading),
+           avg(voltage), min(voltage), max(voltage),
+           avg(current), min(current), max(current)
+    FROM telemetry
+    WHERE timestamp >= date_trunc('second', since)
+    GROUP BY 1, 2, 3
+    ON CONFLICT (vehicle_id, mission_id, bucket) DO UPDATE SET
+        samples = EXCLUDED.samples,
+        roll_avg = EXCLUDED.roll_avg,
+        roll_min = EXCLUDED.roll_min,
+        roll_max = EXCLUDED.roll_max,
+        pitch_avg = EXCLUDED.pitch_avg,
+        pitch_min = EXCLUDED.pitch_min,
+        pitch_max = EXCLUDED.pitch_max,
+        yaw_avg = EXCLUDED.yaw_avg,
+        yaw_min = EXCLUDED.yaw_min,
+        yaw_max = EXCLUDED.yaw_max,
+        lat_avg = EXCLUDED.lat_avg,
+        lat_min = EXCLUDED.lat_min,
+        lat_max = EXCLUDED.lat_max,
+        lon_avg = EXCLUDED.lon_avg,
+        lon_min = EXCLUDED.lon_min,
+        lon_max = EXCLUDED.lon_max,
+        groundspeed_avg = EXCLUDED.groundspeed_avg,
+        groundspeed_min = EXCLUDED.groundspeed_min,
+        groundspeed_max = EXCLUDED.groundspeed_max,
+        heading_avg = EXCLUDED.heading_avg,
+        heading_min = EXCLUDED.heading_min,
+        heading_max = EXCLUDED.heading_max,
+        voltage_avg = EXCLUDED.voltage_avg,
+        voltage_min = EXCLUDED.voltage_min,
+        voltage_max = EXCLUDED.voltage_max,
+        current_avg = EXCLUDED.current_avg,
+        current_min = EXCLUDED.current_min,
+        current_max = EXCLUDED.current_max;
+
+    INSERT INTO telemetry_1m (bucket, vehicle_id, mission_id, samples, roll_avg, roll_min, roll_max, pitch_avg, pitch_min, pitch_max, yaw_avg, yaw_min, yaw_max, lat_avg, lat_min, lat_max, lon_avg, lon_min, lon_max, groundspeed_avg, groundspeed_min, groundspeed_max, heading_avg, heading_min, heading_max, voltage_avg, voltage_min, voltage_max, current_avg, current_min, current_max)
+    SELECT date_trunc('minute', timestamp), vehicle_id, mission_id, count(*),
+           avg(roll), min(roll), max(roll),
+           avg(pitch), min(pitch), max(pitch),
+           avg(yaw), min(yaw), max(yaw),
+           avg(lat), min(lat), max(lat),
+           avg(lon), min(lon), max(lon),
+           avg(groundspeed), min(groundspeed), max(groundspeed),
+           avg(heading), min(heading), max(heading),
+           avg(voltage), min(voltage), max(voltage),
+           avg(current), min(current), max(current)
+    FROM telemetry
+    WHERE timestamp >= date_trunc('minute', since)
+    GROUP BY 1, 2, 3
+    ON CONFLICT (vehicle_id, mission_id, bucket) DO UPDATE SET
+        samples = EXCLUDED.samples,
+        roll_avg = EXCLUDED.roll_avg,
+        roll_min = EXCLUDED.roll_min,
+        roll_max = EXCLUDED.roll_max,
+        pitch_avg = EXCLUDED.pitch_avg,
+        pitch_min = EXCLUDED.pitch_min,
+        pitch_max = EXCLUDED.pitch_max,
+        yaw_avg = EXCLUDED.yaw_avg,
+        yaw_min = EXCLUDED.yaw_min,
+        yaw_max = EXCLUDED.yaw_max,
+        lat_avg = EXCLUDED.lat_avg,
+        lat_min = EXCLUDED.lat_min,
+        lat_max = EXCLUDED.lat_max,
+        lon_avg = EXCLUDED.lon_avg,
+        lon_min = EXCLUDED.lon_min,
+        lon_max = EXCLUDED.lon_max,
+        groundspeed_avg = EXCLUDED.groundspeed_avg,
+        groundspeed_min = EXCLUDED.groundspeed_min,
+        groundspeed_max = EXCLUDED.groundspeed_max,
+        heading_avg = EXCLUDED.heading_avg,
+        heading_min = EXCLUDED.heading_min,
+        heading_max = EXCLUDED.heading_max,
+        voltage_avg = EXCLUDED.voltage_avg,
+        voltage_min = EXCLUDED.voltage_min,
+        voltage_max = EXCLUDED.voltage_max,
+        current_avg = EXCLUDED.current_avg,
+        current_min = EXCLUDED.current_min,
+        current_max = EXCLUDED.current_max;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT refresh_telemetry_rollups('-infinity');
@@ -0,0 +1,49 @@
+-- ensure_telemetry_partitions versi 001 gagal (setiap housekeeping) begitu
+-- telemetry_default sudah berisi baris di rentang bulan yang akan dibuat,
+-- sehingga data tertahan di partisi default dan tidak pernah terkena retensi.
+-- Versi ini membuat partisi bulanan sebagai tabel terpisah, memindahkan baris
+-- bulan itu dari telemetry_default ke sana, lalu meng-ATTACH-nya (satu transaksi).
+
+CREATE OR REPLACE FUNCTION ensure_telemetry_partitions(from_month TIMESTAMPTZ, months INTEGER)
+RETURNS VOID AS $$
+DECLARE
+    month_start TIMESTAMPTZ := date_trunc('month', from_month);
+    month_end TIMESTAMPTZ;
+    part_name TEXT;
+BEGIN
+    FOR i IN 0 .. months - 1 LOOP
+        month_end := month_start + INTERVAL '1 month';
+        part_name := 'telemetry_' || to_char(month_start, 'YYYYMM');
+        IF to_regclass(part_name) IS NULL THEN
+            EXECUTE format('CREATE TABLE %I (LIKE telemetry INCLUDING DEFAULTS)', part_name);
+            EXECUTE format(
+                'WITH moved AS (DELETE FROM telemetry_default WHERE timestamp >= %L AND timestamp < %L RETURNING *) '
+                'INSERT INTO %I SELECT * FROM moved',
+                month_start, month_end, part_name
+            );
+            EXECUTE format(
+                'ALTER TABLE telemetry ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                part_name, month_start, month_end
+            );
+        END IF;
+        month_start := month_end;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Pindahkan baris yang sudah terlanjur menumpuk di partisi default
+DO $$
+DECLARE
+    first_ts TIMESTAMPTZ;
+    last_ts TIMESTAMPTZ;
+BEGIN
+    SELECT min(timestamp), max(timestamp) INTO first_ts, last_ts FROM telemetry_default;
+    IF first_ts IS NOT NULL THEN
+        PERFORM ensure_telemetry_partitions(
+            first_ts,
+            (extract(year FROM age(date_trunc('month', last_ts), date_trunc('month', first_ts))) * 12
+             + extract(month FROM age(date_trunc('month', last_ts), date_trunc('month', first_ts))))::INTEGER + 1
+        );
+    END IF;
+END;
+$$;
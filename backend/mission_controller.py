@@ -5,132 +5,209 @@ import cv2
 import time
 import asyncio
 import websockets
-import requests
 import json
-from ultralytics import YOLOv10
+from vision_protocol import pack_vision_frame, pack_detections
+from detections import split_balls, find_best_gate, build_detection_message
+from frame_pipeline import LatestSlot, ServiceCaptureStage, WorkerStage
+from rate_controller import AdaptiveRateController
+from capture_uploader import CaptureUploader
+from clip_recorder import ClipRecorder
+from vision_client import VisionClient
 
 class Config:
-    CAMERA_INDEX = 1
-    FRAME_WIDTH = 640
-    FRAME_HEIGHT = 480
-    GATE_MODEL_PATH = 'backend/best5.pt'
-    BOX_MODEL_PATH = 'backend/best_kotak5.pt'
-    UPLOAD_URL = "http://127.0.0.1:8000/uploads"
+    # Kamera dan model dimiliki vision_service.py; controller ini hanya client-nya
+    VISION_SERVICE_HOST = "127.0.0.1"
+    VISION_SERVICE_PORT = 8765
+    # Cara frame dikirim vision service (argumen `frames` VisionClient), salah satu dari:
+    #   "shm"  - dibaca langsung dari ring shared memory (hanya di mesin yang sama, tanpa decode)
+    #   True   - JPEG lewat socket (bisa lintas mesin, perlu decode)
+    #   False  - tanpa frame, hanya hasil deteksi
+    VISION_FRAME_TRANSPORT = "shm"
+    UPLOAD_URL = "http://127.0.0.1:8000/upload/image"
+    UPLOAD_SPOOL_DIR = 'backend/upload_spool/mission_controller'  # Gambar menunggu dikirim; folder khusus per uploader
+    UPLOAD_WORKERS = 2
     DETECTION_COOLDOWN = 0.01
-    WEBSOCKET_URI = "ws://127.0.0.1:8000/ws/mission_control"
-    TARGET_FPS = 20
-    
-    # --- ID Kelas untuk Model Buoy (Sesuaikan jika perlu) ---
-    GREEN_BALL_CLASS_ID = 0
-    RED_BALL_CLASS_ID = 1
+    BOX_MIN_CONFIDENCE = 0.6
+    CLIP_DIR = 'backend/clips'     # Klip pre/post-roll saat kotak terdeteksi (burst JPEG)
+    CLIP_PRE_ROLL_S = 3.0
+    CLIP_POST_ROLL_S = 2.0
+    CLIP_MAX_RING_MB = 24          # Batas memori ring frame ter-encode
+    CLIP_MAX_SECONDS = 20.0        # Klip dipotong jika event terus diperpanjang
+    CLIP_MAX_CLIP_MB = 64          # Klip yang sedang dikumpulkan diakhiri lebih awal di atas batas ini
+    CLIP_MAX_PENDING_MB = 96       # Total klip yang menunggu ditulis ke disk
+    VEHICLE_ID = "default"  # Harus sama dengan VEHICLE_ID di logger/logger.py untuk kapal ini
+    WEBSOCKET_URI = f"ws://127.0.0.1:8000/ws/mission_control?vehicle_id={VEHICLE_ID}"
+    TARGET_FPS = 20  # FPS maksimum stream video
+    MIN_FPS = 2
+    TARGET_BITRATE_KBPS = 1500  # Bitrate video yang dituju oleh rate controller
+    JPEG_QUALITY_RANGE = (35, 85)
+    RESOLUTION_SCALES = (1.0, 0.75, 0.5)
+
+    # --- Detektor vision service yang dilanggan per mode ---
+    MODE_DETECTORS = {"IDLE": [], "ROI_NAV": ["buoy"], "BOX_SNAPSHOT": ["box"]}
 
 class MissionController:
     def __init__(self, config):
         self.config = config
         self.current_mode = "IDLE"
         self.last_capture_time = 0
-        self.gate_model, self.box_model = self._load_models()
-        self.cap = self._init_camera()
+        self.cap = VisionClient(self.config.VISION_SERVICE_HOST, self.config.VISION_SERVICE_PORT,
+                                detectors=self.config.MODE_DETECTORS[self.current_mode],
+                                frames=self.config.VISION_FRAME_TRANSPORT)
+        self.uploader = CaptureUploader(self.config.UPLOAD_URL, self.config.UPLOAD_SPOOL_DIR, workers=self.config.UPLOAD_WORKERS)
+        self.recorder = ClipRecorder(
+            self.config.CLIP_DIR, pre_roll_s=self.config.CLIP_PRE_ROLL_S, post_roll_s=self.config.CLIP_POST_ROLL_S,
+            max_ring_bytes=self.config.CLIP_MAX_RING_MB * 1024 * 1024, max_clip_s=self.config.CLIP_MAX_SECONDS,
+            max_clip_bytes=self.config.CLIP_MAX_CLIP_MB * 1024 * 1024,
+            max_pending_bytes=self.config.CLIP_MAX_PENDING_MB * 1024 * 1024)
+        # Slot nilai-terakhir penghubung stage: vision service -> logika mode -> encoder -> websocket
+        self.raw_slot = LatestSlot()
+        self.processed_slot = LatestSlot()
+        self.encoded_slot = LatestSlot()
+        self.detections_slot = LatestSlot()
+        self.rate = AdaptiveRateController(
+            target_bitrate_kbps=self.config.TARGET_BITRATE_KBPS,
+            max_fps=self.config.TARGET_FPS, min_fps=self.config.MIN_FPS,
+            quality_range=self.config.JPEG_QUALITY_RANGE, scales=self.config.RESOLUTION_SCALES)
+        self._last_encode_time = 0
+        self.stages = []
         print("Controller siap.")
 
-    def _load_models(self):
-        print("Memuat model (YOLOv10)...")
-        # Pastikan kedua model adalah YOLOv10
-        gate_model = YOLOv10(self.config.GATE_MODEL_PATH)
-        box_model = YOLOv10(self.config.BOX_MODEL_PATH)
-        return gate_model, box_model
-
-    def _init_camera(self):
-        print(f"Membuka kamera di indeks: {self.config.CAMERA_INDEX}")
-        cap = cv2.VideoCapture(self.config.CAMERA_INDEX, cv2.CAP_DSHOW)
-        cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.config.FRAME_WIDTH)
-        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.config.FRAME_HEIGHT)
-        if not cap.isOpened():
-            raise IOError("FATAL: Tidak bisa membuka kamera.")
-        return cap
+    def _start_pipeline(self):
+        """Menjalankan penerimaan frame, logika mode, dan encoding di thread terpisah dari event loop."""
+        self.stages = [
+            ServiceCaptureStage(self.cap, self.raw_slot),
+            WorkerStage("mode", self.raw_slot, self.processed_slot, self._mode_stage),
+            WorkerStage("encoder", self.processed_slot, self.encoded_slot, self._encode_stage),
+        ]
+        for stage in self.stages:
+            stage.start()
+
+    def _stop_pipeline(self):
+        for stage in self.stages:
+            stage.stop()
+        for slot in (self.raw_slot, self.processed_slot, self.encoded_slot, self.detections_slot):
+            slot.close()
+        for stage in self.stages:
+            stage.join(timeout=2)
+        self.stages = []
 
     async def run(self):
+        self.uploader.start()
+        self.recorder.start()
+        self._start_pipeline()
         while True:
             try:
                 async with websockets.connect(self.config.WEBSOCKET_URI) as websocket:
                     print("Mission Controller terhubung ke server backend.")
                     listen_task = asyncio.create_task(self._listen_for_commands(websocket))
-                    await self._main_loop(websocket)
-                    listen_task.cancel()
+                    detections_task = asyncio.create_task(self._detections_loop(websocket))
+                    try:
+                        await self._main_loop(websocket)
+                    finally:
+                        listen_task.cancel()
+                        detections_task.cancel()
             except (websockets.exceptions.ConnectionClosed, ConnectionRefusedError):
                 print("Koneksi terputus. Mencoba lagi dalam 5 detik...")
                 await asyncio.sleep(5)
 
     async def _main_loop(self, websocket):
+        loop = asyncio.get_running_loop()
+        last_seq = self.encoded_slot.seq
+        next_deadline = loop.time()
         while True:
-            ret, frame = self.cap.read()
-            if not ret:
-                await asyncio.sleep(0.1)
+            # Menunggu hasil encoder di thread lain agar event loop tetap bisa memproses perintah
+            last_seq, update = await asyncio.to_thread(self.encoded_slot.get_newer, last_seq, 1.0)
+            if update is None:
                 continue
+            await self._send_update(websocket, update)
+
+            # Jadwal berbasis deadline: waktu kirim ikut dihitung dalam interval frame
+            next_deadline += self.rate.interval
+            now = loop.time()
+            if next_deadline < now:
+                next_deadline = now  # Terlambat: jangan mengejar frame yang sudah lewat
+            await asyncio.sleep(next_deadline - now)
+
+    async def _detections_loop(self, websocket):
+        """Mengirim hasil deteksi secepat laju inferensi, tidak terikat laju video."""
+        last_seq = self.detections_slot.seq
+        while True:
+            last_seq, message = await asyncio.to_thread(self.detections_slot.get_newer, last_seq, 1.0)
+            if message is not None:
+                await websocket.send(pack_detections(message))
+
+    def _mode_stage(self, item):
+        frame = item['frame']
+        status_message, objects, best_gate = self._process_frame_based_on_mode(
+            frame, item['frame_ref'], item['detections'], item['capture_time'])
+        # Hasil deteksi dikirim terpisah dari video; overlay digambar di frontend
+        self.detections_slot.put(build_detection_message(
+            self.current_mode, item['seq'], item['capture_time'], frame.shape, objects, best_gate))
+        return {'seq': item['seq'], 'capture_time': item['capture_time'], 'frame': frame,
+                'frame_ref': item['frame_ref'], 'status': status_message}
 
-            annotated_frame, status_message = self._process_frame_based_on_mode(frame)
-            await self._send_update(websocket, status_message, annotated_frame)
-            await asyncio.sleep(1 / self.config.TARGET_FPS)
+    def _encode_stage(self, item):
+        # Tidak perlu meng-encode lebih cepat dari laju kirim yang dipilih rate controller
+        now = time.monotonic()
+        if now - self._last_encode_time < 0.9 * self.rate.interval:
+            return None
+        self._last_encode_time = now
 
-    def _process_frame_based_on_mode(self, frame):
+        quality, scale = self.rate.encode_params()
+        frame = item['frame']
+        if scale < 1.0:
+            frame = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        ok, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        if not ok or (item['frame_ref'] and not item['frame_ref'].valid()):
+            return None  # Slot ring ditimpa saat di-encode: gambar bisa campuran, lewati
+        self.recorder.add_frame(buffer, item['capture_time'], item['seq'])
+        return {'seq': item['seq'], 'capture_time': item['capture_time'], 'jpeg': buffer, 'status': item['status']}
+
+    def pipeline_stats(self):
+        return {stage.name: stage.last_ms for stage in self.stages}
+
+    def _process_frame_based_on_mode(self, frame, frame_ref, detections, capture_time):
+        """Mengembalikan (status, daftar objek terdeteksi, gerbang terbaik) dari hasil vision service."""
+        if self.current_mode == "IDLE":
+            return f"Mode: {self.current_mode}", [], None
+        # Setelah ganti mode, beberapa frame pertama masih membawa hasil detektor mode lama
+        result = detections.get(self.config.MODE_DETECTORS[self.current_mode][0])
+        if result is None:
+            return f"Mode: {self.current_mode} (menunggu vision service...)", [], None
+        if result['source'] == 'loading':
+            return f"Mode: {self.current_mode} (memuat model...)", [], None
         if self.current_mode == "ROI_NAV":
-            return self._detect_buoys(frame)
-        elif self.current_mode == "BOX_SNAPSHOT":
-            return self._detect_box_and_snapshot(frame)
-        else: # IDLE Mode
-            return frame.copy(), f"Mode: {self.current_mode}"
+            return self._detect_buoys(result)
+        else:
+            return self._detect_box_and_snapshot(frame, frame_ref, result, capture_time)
 
-    def _detect_buoys(self, frame):
+    def _detect_buoys(self, result):
         """
-        Logika operasional untuk mendeteksi, memilah, dan menggambar buoy.
+        Memilah buoy dari hasil vision service. Service hanya menjalankan model
+        sesuai jadwal tracker; di frame lain posisi buoy berasal dari prediksi.
         """
-        # Jalankan inferensi dengan confidence threshold rendah untuk debugging
-        results = self.gate_model(frame, conf=0.25, verbose=False)
-        
-        detections = {'red': [], 'green': []}
-        if results and results[0].boxes:
-            for box in results[0].boxes:
-                try:
-                    cls_id = int(box.cls[0])
-                    x1, y1, x2, y2 = map(int, box.xyxy[0])
-                    ball_data = {'cx': (x1 + x2) // 2, 'cy': (y1 + y2) // 2, 'box': (x1, y1, x2, y2)}
-                    
-                    if cls_id == self.config.GREEN_BALL_CLASS_ID:
-                        detections['green'].append(ball_data)
-                    elif cls_id == self.config.RED_BALL_CLASS_ID:
-                        detections['red'].append(ball_data)
-                except (IndexError, TypeError):
-                    continue
-
-        # Visualisasi manual berdasarkan hasil pemilahan
-        annotated_frame = frame.copy()
-        for ball in detections['green']:
-            x1, y1, x2, y2 = ball['box']
-            cv2.rectangle(annotated_frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-            cv2.putText(annotated_frame, 'Green', (x1, y1 - 10), cv2.FONT_HERSHEY_PLAIN, 1, (0, 255, 0), 2)
-        for ball in detections['red']:
-            x1, y1, x2, y2 = ball['box']
-            cv2.rectangle(annotated_frame, (x1, y1), (x2, y2), (0, 0, 255), 2)
-            cv2.putText(annotated_frame, 'Red', (x1, y1 - 10), cv2.FONT_HERSHEY_PLAIN, 1, (0, 0, 255), 2)
-        
-        status_message = f"Ditemukan: Merah({len(detections['red'])}), Hijau({len(detections['green'])})"
-        return annotated_frame, status_message
-
-    def _detect_box_and_snapshot(self, frame):
-        results = self.box_model(frame, conf=0.6, verbose=False)
-        if results and results[0].boxes:
-            annotated_frame = results[0].plot()
-            status_message = "Mencari kotak..."
+        objects = result['objects']
+        detections = split_balls(objects)
+        best_gate = find_best_gate(detections['red'], detections['green'])
+        source = {"track": " [track]", "crop": " [crop]"}.get(result['source'], "")
+        status_message = f"Ditemukan: Merah({len(detections['red'])}), Hijau({len(detections['green'])}){source}"
+        return status_message, objects, best_gate
+
+    def _detect_box_and_snapshot(self, frame, frame_ref, result, capture_time):
+        objects = [obj for obj in result['objects'] if obj['conf'] >= self.config.BOX_MIN_CONFIDENCE]
+        status_message = "Mencari kotak..."
+        if objects:
+            # Klip ditulis di background dari frame stream yang sudah di-encode
+            self.recorder.trigger("box", capture_time)
             if time.time() - self.last_capture_time > self.config.DETECTION_COOLDOWN:
-                self.last_capture_time = time.time()
-                status_message = "Kotak terdeteksi! Mengambil gambar..."
-                asyncio.to_thread(self.upload_frame, frame)
+                # Frame yang tertimpa saat di-encode tidak memakai cooldown; dicoba lagi di frame berikutnya
+                if self.upload_frame(frame, frame_ref):
+                    self.last_capture_time = time.time()
+                    status_message = "Kotak terdeteksi! Mengambil gambar..."
             # else:
             #     status_message = "Kotak terdeteksi (cooldown)..."
-        else:
-            annotated_frame = frame.copy()
-            status_message = "Mencari kotak..."
-        return annotated_frame, status_message
+        return status_message, objects, None
 
     async def _listen_for_commands(self, websocket):
         async for message in websocket:
@@ -139,31 +216,52 @@ class MissionController:
                 if data.get("command") == "set_mode":
                     new_mode = data.get("mode")
                     if new_mode in ["IDLE", "ROI_NAV", "BOX_SNAPSHOT"]:
+                        # Service memuat model mode baru di background jika belum ada
+                        self.cap.set_detectors(self.config.MODE_DETECTORS[new_mode])
                         self.current_mode = new_mode
                         print(f"Mode diubah menjadi: {self.current_mode}")
             except json.JSONDecodeError: pass
 
-    async def _send_update(self, websocket, status, frame):
+    async def _send_update(self, websocket, update):
         try:
-            _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 80])
-            jpg_as_text = buffer.tobytes()
-            update_data = {"type": "vision_update", "status": status, "frame": jpg_as_text.hex()}
-            await websocket.send(json.dumps(update_data))
+            update_meta = {
+                "type": "vision_update",
+                "status": update['status'],
+                "frame_seq": update['seq'],
+                "latency_ms": round((time.time() - update['capture_time']) * 1000, 1),
+                "stage_ms": self.pipeline_stats(),
+                "stream": self.rate.settings(),
+            }
+            # Dikirim sebagai frame biner: header + metadata JSON + JPEG mentah
+            payload = pack_vision_frame(update_meta, update['jpeg'])
+            start = time.monotonic()
+            await websocket.send(payload)
+            self.rate.record_send(len(payload), time.monotonic() - start)
+        except websockets.exceptions.ConnectionClosed:
+            raise
         except Exception: pass
 
-    def upload_frame(self, frame):
+    def upload_frame(self, frame, frame_ref=None):
+        """Menyimpan frame ke spool uploader; pengiriman dilakukan worker di background."""
         is_success, buffer = cv2.imencode(".jpg", frame)
+        if frame_ref and not frame_ref.valid():
+            return False  # Slot ring ditimpa saat di-encode: gambar bisa campuran, lewati
         if is_success:
-            files = {'file': ('capture.jpg', buffer.tobytes(), 'image/jpeg')}
-            try:
-                requests.post(self.config.UPLOAD_URL, files=files, timeout=3)
-                print("Gambar berhasil diunggah.")
-            except requests.RequestException: pass
+            self.uploader.submit_jpeg(buffer)
+        return is_success
 
     def cleanup(self):
-        if hasattr(self, 'cap') and self.cap.isOpened():
+        if hasattr(self, 'stages'):
+            self._stop_pipeline()
+        if hasattr(self, 'recorder'):
+            self.recorder.stop()
+            print(f"Statistik klip: {self.recorder.stats()}")
+        if hasattr(self, 'uploader'):
+            self.uploader.stop()
+            print(f"Statistik upload: {self.uploader.stats()}")
+        if hasattr(self, 'cap'):
             self.cap.release()
-            print("Kamera dilepaskan.")
+            print("Koneksi vision service ditutup.")
 
 if __name__ == "__main__":
     controller = None
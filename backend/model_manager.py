@@ -0,0 +1,226 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from tracking import iou
+
+# =================================================================
+# Manajemen model: ekspor bobot .pt ke format yang dioptimasi untuk CPU,
+# disimpan di cache berdasarkan hash bobot, lalu dimuat sesuai runtime.
+#   pytorch  - bobot .pt asli (tanpa ekspor)
+#   onnx     - ONNX Runtime (butuh: pip install onnxruntime)
+#   openvino - OpenVINO, opsional INT8 (butuh: pip install openvino)
+# =================================================================
+
+RUNTIME_PYTORCH = "pytorch"
+RUNTIME_ONNX = "onnx"
+RUNTIME_OPENVINO = "openvino"
+RUNTIMES = (RUNTIME_PYTORCH, RUNTIME_ONNX, RUNTIME_OPENVINO)
+
+
+def weights_hash(path, length=12):
+    """Hash SHA-256 (dipotong) dari isi file bobot, dipakai sebagai kunci cache."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:length]
+
+
+def artifact_dir(weights_path, runtime, imgsz, int8, cache_dir):
+    stem = os.path.splitext(os.path.basename(weights_path))[0].replace(" ", "_")
+    key = f"{stem}-{weights_hash(weights_path)}-{runtime}-{imgsz}{'-int8' if int8 else ''}"
+    return os.path.join(cache_dir, key)
+
+
+def export_model(model_class, weights_path, runtime, imgsz=640, int8=False, dynamic=True,
+                 cache_dir="backend/model_cache"):
+    """
+    Mengekspor bobot ke format runtime dan menyimpannya di cache. Jika artefak
+    dengan hash bobot yang sama sudah ada, ekspor dilewati.
+    Mengembalikan (path artefak, True jika baru diekspor).
+    """
+    if runtime == RUNTIME_ONNX and int8:
+        raise ValueError("Kuantisasi INT8 hanya didukung untuk runtime 'openvino'")
+    target_dir = artifact_dir(weights_path, runtime, imgsz, int8, cache_dir)
+    # Ultralytics mengenali model OpenVINO hanya dari nama folder berakhiran '_openvino_model'
+    target = os.path.join(target_dir, "model.onnx" if runtime == RUNTIME_ONNX else "model_openvino_model")
+    if os.path.exists(target):
+        return target, False
+
+    print(f"Mengekspor {weights_path} ke {runtime}{' INT8' if int8 else ''} (sekali saja)...")
+    exported = model_class(weights_path).export(format=runtime, imgsz=imgsz, int8=int8, dynamic=dynamic)
+    os.makedirs(target_dir, exist_ok=True)
+    shutil.move(str(exported), target)
+    try:
+        _smoke_test(model_class, target, imgsz)
+    except Exception as e:
+        # Artefak yang tidak bisa dimuat jangan sampai tersimpan di cache dan dipakai lagi
+        shutil.rmtree(target_dir, ignore_errors=True)
+        raise RuntimeError(f"Artefak {runtime} hasil ekspor tidak bisa dimuat ({target}): {e}") from e
+    print(f"Artefak model disimpan di: {target}")
+    return target, True
+
+
+def _smoke_test(model_class, artifact, imgsz):
+    """Memuat artefak dari cache dan menjalankan satu inferensi pada frame kosong."""
+    model_class(artifact, task="detect")(np.zeros((imgsz, imgsz, 3), dtype=np.uint8), verbose=False)
+
+
+def _timed_boxes(model, frame, conf, runs=5):
+    """Box hasil inferensi [(cls, conf, xyxy)] dan rata-rata latensi (ms) setelah warmup."""
+    model(frame, conf=conf, verbose=False)
+    start = time.perf_counter()
+    for _ in range(runs):
+        results = model(frame, conf=conf, verbose=False)
+    elapsed_ms = (time.perf_counter() - start) * 1000 / runs
+    boxes = [(int(b.cls[0]), float(b.conf[0]), tuple(float(v) for v in b.xyxy[0])) for b in results[0].boxes]
+    return boxes, elapsed_ms
+
+
+def parity_check(reference, candidate, frame, conf=0.25, iou_threshold=0.5, conf_tolerance=0.1):
+    """
+    Membandingkan hasil model hasil ekspor dengan model PyTorch pada satu frame:
+    setiap box referensi harus punya pasangan kelas sama dengan IoU >= ambang
+    dan selisih confidence <= toleransi.
+    """
+    ref_boxes, ref_ms = _timed_boxes(reference, frame, conf)
+    cand_boxes, cand_ms = _timed_boxes(candidate, frame, conf)
+    matched, max_conf_diff = 0, 0.0
+    for cls, score, box in ref_boxes:
+        best = max(((iou(box, c_box), c_score) for c_cls, c_score, c_box in cand_boxes if c_cls == cls), default=None)
+        if best and best[0] >= iou_threshold:
+            matched += 1
+            max_conf_diff = max(max_conf_diff, abs(score - best[1]))
+    return {
+        "reference_boxes": len(ref_boxes),
+        "candidate_boxes": len(cand_boxes),
+        "matched": matched,
+        "max_conf_diff": round(max_conf_diff, 4),
+        "reference_ms": round(ref_ms, 2),
+        "candidate_ms": round(cand_ms, 2),
+        "ok": matched == len(ref_boxes) == len(cand_boxes) and max_conf_diff <= conf_tolerance,
+    }
+
+
+def load_model(model_class, weights_path, runtime=RUNTIME_PYTORCH, imgsz=640, int8=False,
+               cache_dir="backend/model_cache", parity_image=None):
+    """
+    Memuat model sesuai runtime. Saat artefak baru diekspor dan `parity_image`
+    tersedia, hasilnya dibandingkan dengan model PyTorch dan laporannya
+    disimpan di samping artefak (parity.json).
+    """
+    if runtime not in RUNTIMES:
+        raise ValueError(f"Runtime tidak dikenal: {runtime}")
+    if runtime == RUNTIME_PYTORCH:
+        return model_class(weights_path)
+
+    artifact, is_new = export_model(model_class, weights_path, runtime, imgsz=imgsz, int8=int8, cache_dir=cache_dir)
+    model = model_class(artifact, task="detect")
+    if is_new:
+        if parity_image:
+            import cv2
+            frame = cv2.imread(parity_image)
+            report = parity_check(model_class(weights_path), model, frame)
+            with open(os.path.join(os.path.dirname(artifact), "parity.json"), "w") as f:
+                json.dump(report, f, indent=2)
+            status = "OK" if report["ok"] else "PERINGATAN: hasil berbeda"
+            print(f"Parity check {runtime}: {status} {report}")
+        else:
+            print("Info: Parity check dilewati (PARITY_IMAGE belum diatur).")
+    return model
+
+
+def _path_bytes(path):
+    """Ukuran file bobot/artefak (atau total isi folder), dipakai sebagai perkiraan memori model."""
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(root, name)) for root, _, files in os.walk(path) for name in files)
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+
+class ModelCache:
+    """
+    Cache LRU model yang dimuat sesuai permintaan. Pemuatan dan warmup (satu
+    inferensi pada frame kosong) berjalan di thread background, sehingga
+    pemanggil tidak pernah menunggu. Jika total perkiraan memori melebihi
+    `memory_budget_mb`, model yang paling lama tidak dipakai dibuang.
+
+    `load_fn(path)` memuat satu model; `warmup_kwargs` diteruskan ke pemanggilan
+    warmup (misal imgsz).
+    """
+
+    def __init__(self, load_fn, memory_budget_mb=1024, warmup_shape=(480, 640, 3), warmup_kwargs=None):
+        self.load_fn = load_fn
+        self.memory_budget = memory_budget_mb * 1024 * 1024
+        self.warmup_shape = warmup_shape
+        self.warmup_kwargs = warmup_kwargs or {}
+        self._models = OrderedDict()  # path -> (model, perkiraan byte)
+        self._loading = set()
+        self._errors = {}
+        self._lock = threading.Lock()
+        self._stats = {"loads": 0, "evictions": 0, "last_load_ms": None}
+
+    def request(self, path):
+        """Mulai memuat model di background jika belum ada (juga mengulang pemuatan yang gagal)."""
+        with self._lock:
+            if path in self._models or path in self._loading:
+                return
+            self._errors.pop(path, None)
+            self._loading.add(path)
+        threading.Thread(target=self._load, args=(path,), name=f"model-load:{os.path.basename(path)}", daemon=True).start()
+
+    def get(self, path):
+        """Model yang siap pakai, atau None jika masih dimuat (pemuatan dimulai otomatis)."""
+        with self._lock:
+            entry = self._models.get(path)
+            if entry is not None:
+                self._models.move_to_end(path)
+                return entry[0]
+            if path in self._errors:
+                return None  # Tidak diulang otomatis tiap frame; tunggu request() berikutnya
+        self.request(path)
+        return None
+
+    def is_loading(self, path):
+        with self._lock:
+            return path in self._loading
+
+    def _load(self, path):
+        start = time.perf_counter()
+        try:
+            model = self.load_fn(path)
+            model(np.zeros(self.warmup_shape, dtype=np.uint8), verbose=False, **self.warmup_kwargs)
+        except Exception as e:
+            print(f"Error Model: Gagal memuat {path}: {e}")
+            with self._lock:
+                self._loading.discard(path)
+                self._errors[path] = str(e)
+            return
+        elapsed_ms = round((time.perf_counter() - start) * 1000, 1)
+        with self._lock:
+            self._loading.discard(path)
+            self._models[path] = (model, _path_bytes(path))
+            self._stats["loads"] += 1
+            self._stats["last_load_ms"] = elapsed_ms
+            # Model yang baru dimuat tidak pernah dibuang, walau sendirian melebihi budget
+            while len(self._models) > 1 and sum(size for _, size in self._models.values()) > self.memory_budget:
+                evicted, _ = self._models.popitem(last=False)
+                self._stats["evictions"] += 1
+                print(f"Info: Model {evicted} dibuang dari cache (budget memori).")
+        print(f"Model {path} siap ({elapsed_ms} ms termasuk warmup).")
+
+    def stats(self):
+        with self._lock:
+            return {
+                **self._stats,
+                "loaded": list(self._models),
+                "loading": sorted(self._loading),
+                "errors": dict(self._errors),
+                "memory_mb": round(sum(size for _, size in self._models.values()) / (1024 * 1024), 1),
+            }
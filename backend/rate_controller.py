@@ -0,0 +1,100 @@
+import threading
+import time
+
+
+class AdaptiveRateController:
+    """
+    Mengatur kualitas JPEG, skala resolusi, dan interval frame video agar
+    mendekati bitrate target, berdasarkan ukuran frame dan lama `websocket.send`
+    (send yang lama berarti buffer TCP penuh / link sedang padat).
+
+    Urutan penurunan saat link padat: kualitas -> resolusi -> FPS.
+    Urutan kenaikan saat link longgar adalah kebalikannya.
+    """
+
+    def __init__(self, target_bitrate_kbps=1500, max_fps=20, min_fps=2,
+                 quality_range=(35, 85), quality_step=10, scales=(1.0, 0.75, 0.5),
+                 adjust_interval=1.0):
+        self.target_bytes_per_sec = target_bitrate_kbps * 1000 / 8
+        self.max_fps = max_fps
+        self.min_fps = min_fps
+        self.min_quality, self.max_quality = quality_range
+        self.quality_step = quality_step
+        self.scales = scales
+        self.adjust_interval = adjust_interval
+
+        self.quality = self.max_quality
+        self.scale_index = 0
+        self.fps = float(max_fps)
+
+        self._lock = threading.Lock()
+        self._avg_frame_bytes = None
+        self._avg_send_s = None
+        self._window_bytes = 0
+        self._window_start = time.monotonic()
+        self._last_adjust = time.monotonic()
+        self.measured_kbps = 0.0
+
+    @property
+    def interval(self):
+        return 1.0 / self.fps
+
+    @property
+    def scale(self):
+        return self.scales[self.scale_index]
+
+    def encode_params(self):
+        """Dibaca oleh stage encoder: (kualitas JPEG, skala resolusi)."""
+        with self._lock:
+            return self.quality, self.scale
+
+    def settings(self):
+        """Pengaturan aktif untuk ditampilkan di pesan status."""
+        with self._lock:
+            return {
+                "quality": self.quality,
+                "scale": self.scale,
+                "fps": round(self.fps, 1),
+                "target_kbps": round(self.target_bytes_per_sec * 8 / 1000),
+                "measured_kbps": round(self.measured_kbps),
+                "send_ms": round(self._avg_send_s * 1000, 1) if self._avg_send_s is not None else None,
+            }
+
+    def record_send(self, nbytes, send_seconds):
+        """Dicatat setiap kali satu frame selesai dikirim."""
+        with self._lock:
+            self._avg_frame_bytes = nbytes if self._avg_frame_bytes is None else 0.8 * self._avg_frame_bytes + 0.2 * nbytes
+            self._avg_send_s = send_seconds if self._avg_send_s is None else 0.8 * self._avg_send_s + 0.2 * send_seconds
+            self._window_bytes += nbytes
+            now = time.monotonic()
+            if now - self._last_adjust >= self.adjust_interval:
+                self.measured_kbps = self._window_bytes * 8 / 1000 / (now - self._window_start)
+                self._window_bytes = 0
+                self._window_start = now
+                self._last_adjust = now
+                self._adjust()
+
+    def _adjust(self):
+        expected_rate = self._avg_frame_bytes * self.fps
+        # Send memakan sebagian besar jatah waktu satu frame -> ada backpressure
+        congested = self._avg_send_s > 0.5 * self.interval
+        if congested or expected_rate > 1.1 * self.target_bytes_per_sec:
+            self._step_down()
+        elif expected_rate < 0.7 * self.target_bytes_per_sec and self._avg_send_s < 0.2 * self.interval:
+            self._step_up()
+
+    def _step_down(self):
+        if self.quality - self.quality_step >= self.min_quality:
+            self.quality -= self.quality_step
+        elif self.scale_index < len(self.scales) - 1:
+            self.scale_index += 1
+        elif self.fps > self.min_fps:
+            self.fps = max(self.min_fps, self.fps * 0.75)
+
+    def _step_up(self):
+        if self.fps < self.max_fps:
+            self.fps = min(self.max_fps, self.fps / 0.75)
+        elif self.scale_index > 0:
+            self.scale_index -= 1
+        elif self.quality + self.quality_step <= self.max_quality:
+            self.quality += self.quality_step
@@ -0,0 +1,218 @@
+import csv
+import io
+import json
+import threading
+
+import psycopg2
+from psycopg2 import sql
+
+from telemetry_writer import TELEMETRY_COLUMNS
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+class TelemetryHistory:
+    """
+    Membaca kembali tabel 'telemetry'.
+
+    `buckets()` melakukan downsampling di SQL (min/max/avg per bucket waktu)
+    sehingga misi berjam-jam cukup dikirim sebagai beberapa ratus titik. Bucket
+    selebar >= 1 detik / 1 menit dihitung dari rollup telemetry_1s / telemetry_1m
+    (tertinggal paling lama satu interval TelemetryMaintenance dari data mentah).
+    `open_export()` mengalirkan baris mentah memakai server-side cursor, jadi
+    tidak pernah seluruh hasil query dimuat ke memori. Unduhan bisa berjalan
+    lama (klien lambat), sehingga setiap export memakai koneksi sendiri di luar
+    pool bersama dan jumlahnya dibatasi `max_exports`; pool tetap tersedia
+    untuk TelemetryWriter dan query histori.
+    Semua method bersifat blocking; panggil dari threadpool.
+    """
+
+    def __init__(self, db_pool, db_config, export_batch_rows=2000, max_exports=2):
+        self.db_pool = db_pool
+        self.db_config = db_config
+        self.export_batch_rows = export_batch_rows
+        self._export_slots = threading.BoundedSemaphore(max_exports)
+
+    @staticmethod
+    def validate_fields(fields):
+        """Mengembalikan daftar kolom yang diminta (default semua). ValueError untuk kolom tak dikenal."""
+        if not fields:
+            return list(TELEMETRY_COLUMNS)
+        unknown = [f for f in fields if f not in TELEMETRY_COLUMNS]
+        if unknown:
+            raise ValueError(f"Field tidak dikenal: {', '.join(unknown)}")
+        return list(dict.fromkeys(fields))
+
+    def buckets(self, start, end, fields, points, with_extremes=True, vehicle_id=None, mission_id=None):
+        """
+        Membagi [start, end) menjadi `points` bucket sama lebar. Hasil berbentuk
+        kolom: {"t": [...], "count": [...], field: {"avg": [...], "min": [...], "max": [...]}}
+        dengan "t" awal bucket (epoch detik); bucket tanpa data tidak disertakan.
+        """
+        start_s, end_s = start.timestamp(), end.timestamp()
+        width = (end_s - start_s) / points
+        aggregates = ["avg", "min", "max"] if with_extremes else ["avg"]
+        if width >= 60:
+            source, time_column = "telemetry_1m", "bucket"
+        elif width >= 1:
+            source, time_column = "telemetry_1s", "bucket"
+        else:
+            source, time_column = "telemetry", "timestamp"
+        filters, params = self._filters(time_column, start, end, vehicle_id, mission_id)
+        params.update(start=start_s, end=end_s, points=points)
+        query = sql.SQL("""
+            SELECT width_bucket(extract(epoch FROM {time})::double precision,
+                                %(start)s::double precision, %(end)s::double precision, %(points)s) AS b,
+                   {count}, {aggregates}
+            FROM {source}
+            WHERE {filters}
+            GROUP BY b
+            ORDER BY b
+        """).format(
+            time=sql.Identifier(time_column),
+            count=sql.SQL("count(*)" if source == "telemetry" else "sum(samples)"),
+            aggregates=sql.SQL(", ").join(
+                _aggregate(source, field, agg) for field in fields for agg in aggregates
+            ),
+            source=sql.Identifier(source),
+            filters=filters,
+        )
+        rows = self._fetchall(query, params)
+
+        result = {
+            "start": start_s,
+            "end": end_s,
+            "bucket_seconds": width,
+            "source": source,
+            "t": [start_s + (row[0] - 1) * width for row in rows],
+            "count": [row[1] for row in rows],
+        }
+        for i, field in enumerate(fields):
+            offset = 2 + i * len(aggregates)
+            result[field] = {
+                agg: [row[offset + j] for row in rows] for j, agg in enumerate(aggregates)
+            }
+        return result
+
+    def open_export(self, start, end, fields, fmt="ndjson", vehicle_id=None, mission_id=None):
+        """
+        Membuka koneksi khusus dan menjalankan query export. Mengembalikan
+        ExportStream yang siap dialirkan. ExportBusy jika slot export habis;
+        psycopg2.Error jika database tidak bisa dihubungi.
+        """
+        if not self._export_slots.acquire(blocking=False):
+            raise ExportBusy("Terlalu banyak export telemetri berjalan bersamaan")
+        conn = None
+        try:
+            conn = psycopg2.connect(**self.db_config)
+            filters, params = self._filters("timestamp", start, end, vehicle_id, mission_id)
+            query = sql.SQL(
+                "SELECT timestamp, {columns} FROM telemetry WHERE {filters} ORDER BY timestamp"
+            ).format(columns=sql.SQL(", ").join(map(sql.Identifier, fields)), filters=filters)
+            # Cursor bernama = server-side cursor; baris diambil per export_batch_rows
+            cur = conn.cursor(name="telemetry_export")
+            cur.itersize = self.export_batch_rows
+            cur.execute(query, params)
+        except BaseException:
+            if conn is not None:
+                conn.close()
+            self._export_slots.release()
+            raise
+        return ExportStream(conn, cur, fields, fmt, self.export_batch_rows, self._export_slots.release)
+
+    @staticmethod
+    def _filters(time_column, start, end, vehicle_id, mission_id):
+        conditions = [sql.SQL("{} >= %(start_ts)s AND {} < %(end_ts)s").format(
+            sql.Identifier(time_column), sql.Identifier(time_column))]
+        params = {"start_ts": start, "end_ts": end}
+        if vehicle_id is not None:
+            conditions.append(sql.SQL("vehicle_id = %(vehicle_id)s"))
+            params["vehicle_id"] = vehicle_id
+        if mission_id is not None:
+            conditions.append(sql.SQL("mission_id = %(mission_id)s"))
+            params["mission_id"] = mission_id
+        return sql.SQL(" AND ").join(conditions), params
+
+    def _fetchall(self, query, params):
+        conn = self.db_pool.getconn()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(query, params)
+                rows = cur.fetchall()
+        except Exception:
+            self._release(conn, broken=True)
+            raise
+        self._release(conn)
+        return rows
+
+    def _release(self, conn, broken=False):
+        try:
+            conn.rollback()
+        except Exception:
+            broken = True
+        self.db_pool.putconn(conn, close=broken)
+
+
+class ExportBusy(Exception):
+    pass
+
+
+class ExportStream:
+    """
+    Iterator chunk teks (NDJSON atau CSV) dari cursor export, terlama lebih dulu.
+    `close()` menutup koneksi dan melepas slot export; aman dipanggil berulang,
+    dipanggil otomatis saat iterasi selesai atau gagal.
+    """
+
+    def __init__(self, conn, cursor, fields, fmt, batch_rows, on_close):
+        self._conn = conn
+        self._cursor = cursor
+        self._fields = fields
+        self._fmt = fmt
+        self._batch_rows = batch_rows
+        self._on_close = on_close
+        self._lock = threading.Lock()
+
+    def __iter__(self):
+        try:
+            if self._fmt == "csv":
+                yield _csv_line(["timestamp", *self._fields])
+            while rows := self._cursor.fetchmany(self._batch_rows):
+                if self._fmt == "csv":
+                    yield "".join(_csv_line([row[0].isoformat(), *row[1:]]) for row in rows)
+                else:
+                    yield "".join(
+                        json.dumps({"timestamp": row[0].isoformat(), **dict(zip(self._fields, row[1:]))}) + "\n"
+                        for row in rows
+                    )
+        finally:
+            self.close()
+
+    def close(self):
+        with self._lock:
+            conn, self._conn = self._conn, None
+        if conn is None:
+            return
+        try:
+            conn.close()  # Transaksi baca ikut berakhir
+        finally:
+            self._on_close()
+
+
+def _aggregate(source, field, agg):
+    """Agregat satu field; dari rollup, rata-rata digabung berbobot jumlah sampel."""
+    if source == "telemetry":
+        return sql.SQL("{}({})").format(sql.SQL(agg), sql.Identifier(field))
+    column = sql.Identifier(f"{field}_{agg}")
+    if agg == "avg":
+        return sql.SQL("sum({c} * samples) / nullif(sum(samples) FILTER (WHERE {c} IS NOT NULL), 0)").format(c=column)
+    return sql.SQL("{}({})").format(sql.SQL(agg), column)
+
+
+def _csv_line(values):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(["" if v is None else v for v in values])
+    return buffer.getvalue()
@@ -0,0 +1,132 @@
+import datetime
+import threading
+import time
+
+
+class TelemetryMaintenance:
+    """
+    Thread perawatan tabel telemetri (lihat migrations/).
+
+    - Setiap `rollup_interval` detik memperbarui rollup 1s/1m untuk data baru,
+      dengan jendela mundur `rollup_lag` detik agar baris yang ditulis
+      belakangan oleh TelemetryWriter tetap terhitung. Jika `writer` diberikan,
+      jendela juga dimundurkan sampai baris tertua yang di-commit writer sejak
+      run sebelumnya (batch retry saat database sempat gagal, backlog antrian).
+    - Setiap `housekeeping_interval` detik memastikan partisi bulanan ke depan
+      sudah ada dan, jika `retention_days` diisi, men-drop partisi yang lebih
+      tua beserta rollup-nya.
+    """
+
+    def __init__(self, db_pool, writer=None, rollup_interval=5.0, rollup_lag=10.0,
+                 housekeeping_interval=3600.0, months_ahead=2, retention_days=None):
+        self.db_pool = db_pool
+        self.writer = writer
+        self.rollup_interval = rollup_interval
+        self.rollup_lag = rollup_lag
+        self.housekeeping_interval = housekeeping_interval
+        self.months_ahead = months_ahead
+        self.retention_days = retention_days
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._rollup_since = None  # None = ambil watermark dari telemetry_1s saat run pertama
+        self._next_housekeeping = 0.0
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "rollup_runs": 0,
+            "last_rollup_ms": None,
+            "last_rollup_at": None,
+            "partitions_dropped": 0,
+            "last_housekeeping_at": None,
+            "last_error": None,
+        }
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="telemetry-maintenance", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5.0):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def stats(self):
+        with self._stats_lock:
+            return dict(self._stats)
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                if time.monotonic() >= self._next_housekeeping:
+                    self._housekeeping()
+                    self._next_housekeeping = time.monotonic() + self.housekeeping_interval
+                self._refresh_rollups()
+            except Exception as e:
+                print(f"Error Database (maintenance): {e}")
+                with self._stats_lock:
+                    self._stats["last_error"] = str(e)
+            self._stop_event.wait(self.rollup_interval)
+
+    def _refresh_rollups(self):
+        started = datetime.datetime.now(datetime.timezone.utc)
+        if self._rollup_since is None:
+            self._rollup_since = self._persisted_watermark()
+        if self.writer is not None:
+            # Disimpan ke _rollup_since dulu agar tidak hilang jika refresh kali ini gagal
+            committed = self.writer.take_committed_since()
+            if committed is not None and committed < self._rollup_since:
+                self._rollup_since = committed
+        since = self._rollup_since
+        start = time.perf_counter()
+        self._execute("SELECT refresh_telemetry_rollups(%s)", (since,))
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        # Jendela berikutnya dimulai sedikit sebelum run ini agar baris yang terlambat tetap masuk
+        self._rollup_since = started - datetime.timedelta(seconds=self.rollup_lag)
+        with self._stats_lock:
+            self._stats["rollup_runs"] += 1
+            self._stats["last_rollup_ms"] = round(elapsed_ms, 2)
+            self._stats["last_rollup_at"] = started.isoformat()
+
+    def _persisted_watermark(self):
+        """
+        Bucket rollup terbaru di database dikurangi `rollup_lag`, agar restart
+        backend tidak mengagregasi ulang seluruh tabel telemetri. Hanya jika
+        rollup masih kosong, perhitungan dimulai dari awal.
+        """
+        latest = self._execute("SELECT max(bucket) FROM telemetry_1s", ())[0]
+        if latest is None:
+            return datetime.datetime.min.replace(tzinfo=datetime.timezone.utc)
+        return latest - datetime.timedelta(seconds=self.rollup_lag)
+
+    def _housekeeping(self):
+        now = datetime.datetime.now(datetime.timezone.utc)
+        self._execute("SELECT ensure_telemetry_partitions(%s, %s)", (now, self.months_ahead + 1))
+        dropped = 0
+        if self.retention_days:
+            cutoff = now - datetime.timedelta(days=self.retention_days)
+            dropped = self._execute("SELECT drop_telemetry_partitions_before(%s)", (cutoff,))[0]
+            self._execute("DELETE FROM telemetry_1s WHERE bucket < %s", (cutoff,))
+            self._execute("DELETE FROM telemetry_1m WHERE bucket < %s", (cutoff,))
+        with self._stats_lock:
+            self._stats["partitions_dropped"] += dropped
+            self._stats["last_housekeeping_at"] = now.isoformat()
+
+    def _execute(self, query, params):
+        conn = self.db_pool.getconn()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(query, params)
+                row = cur.fetchone() if cur.description else None
+            conn.commit()
+        except Exception:
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+            self.db_pool.putconn(conn, close=True)
+            raise
+        self.db_pool.putconn(conn)
+        return row
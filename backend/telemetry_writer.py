@@ -0,0 +1,175 @@
+import datetime
+import queue
+import threading
+import time
+
+import psycopg2.extras
+
+# Kolom tabel 'telemetry' yang diisi dari payload logger (lihat db_setup.py)
+TELEMETRY_COLUMNS = ('roll', 'pitch', 'yaw', 'lat', 'lon', 'groundspeed', 'heading', 'voltage', 'current')
+DEFAULT_VEHICLE_ID = "default"
+
+
+class TelemetryWriter:
+    """
+    Penulis telemetri ke PostgreSQL yang berjalan di thread terpisah.
+
+    Handler websocket cukup memanggil `submit()` (non-blocking); baris ditampung
+    di antrian memori lalu ditulis per-batch (multi-row INSERT) menggunakan
+    koneksi dari pool, saat batch penuh atau interval flush terlewati.
+    """
+
+    def __init__(self, db_pool, batch_size=200, flush_interval=0.5, max_queue=10000):
+        self.db_pool = db_pool
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._pending = []  # Baris yang gagal ditulis dan akan dicoba lagi
+        self._stop_event = threading.Event()
+        self._drain_deadline = None
+        self._thread = None
+        self._committed_since = None  # Timestamp baris tertua yang di-commit sejak take_committed_since()
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "rows_written": 0,
+            "rows_dropped": 0,
+            "flushes": 0,
+            "failed_flushes": 0,
+            "last_batch_size": 0,
+            "last_flush_ms": None,
+            "avg_flush_ms": None,
+            "max_flush_ms": None,
+            "last_error": None,
+        }
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="telemetry-writer", daemon=True)
+        self._thread.start()
+        print("Info: Telemetry writer berjalan.")
+
+    def stop(self, timeout=5.0):
+        """Menghentikan thread writer setelah mencoba mem-flush sisa antrian (paling lama `timeout` detik)."""
+        self._drain_deadline = time.monotonic() + timeout
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        print("Info: Telemetry writer berhenti.")
+
+    def submit(self, data, vehicle_id=DEFAULT_VEHICLE_ID, mission_id=""):
+        """
+        Memasukkan satu sampel telemetri ke antrian tanpa menunggu database.
+        Mengembalikan False jika antrian penuh (sampel dibuang).
+        """
+        row = (datetime.datetime.now(datetime.timezone.utc), vehicle_id, mission_id) + tuple(data.get(col) for col in TELEMETRY_COLUMNS)
+        try:
+            self._queue.put_nowait(row)
+            return True
+        except queue.Full:
+            with self._stats_lock:
+                self._stats["rows_dropped"] += 1
+            return False
+
+    def take_committed_since(self):
+        """
+        Mengembalikan timestamp baris tertua yang berhasil ditulis sejak panggilan
+        sebelumnya (None jika belum ada), lalu mengosongkannya. Dipakai
+        TelemetryMaintenance agar baris yang tertunda lama (retry/backlog) tetap
+        masuk rollup walaupun timestamp-nya sudah lewat jendela `rollup_lag`.
+        """
+        with self._stats_lock:
+            since, self._committed_since = self._committed_since, None
+        return since
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["queue_depth"] = self._queue.qsize()
+        stats["pending_retry"] = len(self._pending)
+        stats["batch_size"] = self.batch_size
+        stats["flush_interval"] = self.flush_interval
+        return stats
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            batch = self._collect_batch()
+            if batch and not self._flush(batch):
+                # Beri jeda agar tidak membanjiri database yang sedang bermasalah
+                self._stop_event.wait(min(self.flush_interval * 4, 5.0))
+        # Saat shutdown, flush sisa antrian per-batch sampai kosong atau batas waktu stop() habis
+        while self._drain_deadline is None or time.monotonic() < self._drain_deadline:
+            batch = self._collect_batch(block=False)
+            if not batch or not self._flush(batch):
+                break
+
+    def _collect_batch(self, block=True):
+        """Mengumpulkan baris sampai batch penuh atau interval flush habis."""
+        batch, self._pending = self._pending, []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            try:
+                if block:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _flush(self, batch):
+        start = time.perf_counter()
+        conn = None
+        try:
+            conn = self.db_pool.getconn()
+            with conn.cursor() as cur:
+                psycopg2.extras.execute_values(
+                    cur,
+                    f"INSERT INTO telemetry (timestamp, vehicle_id, mission_id, {', '.join(TELEMETRY_COLUMNS)}) VALUES %s",
+                    batch,
+                    page_size=len(batch),
+                )
+            conn.commit()
+            self.db_pool.putconn(conn)
+        except Exception as e:
+            print(f"Error Database: {e}")
+            if conn is not None:
+                try:
+                    conn.rollback()
+                except Exception:
+                    pass
+                self.db_pool.putconn(conn, close=True)
+            self._keep_for_retry(batch)
+            with self._stats_lock:
+                self._stats["failed_flushes"] += 1
+                self._stats["last_error"] = str(e)
+            return False
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        oldest = min(row[0] for row in batch)
+        with self._stats_lock:
+            if self._committed_since is None or oldest < self._committed_since:
+                self._committed_since = oldest
+            s = self._stats
+            s["rows_written"] += len(batch)
+            s["flushes"] += 1
+            s["last_batch_size"] = len(batch)
+            s["last_flush_ms"] = round(elapsed_ms, 2)
+            s["avg_flush_ms"] = round(elapsed_ms if s["avg_flush_ms"] is None else 0.9 * s["avg_flush_ms"] + 0.1 * elapsed_ms, 2)
+            s["max_flush_ms"] = round(max(elapsed_ms, s["max_flush_ms"] or 0), 2)
+        return True
+
+    def _keep_for_retry(self, batch):
+        """Menyimpan batch gagal untuk dicoba lagi, membuang baris tertua jika melebihi kapasitas."""
+        overflow = len(batch) - self.max_queue
+        if overflow > 0:
+            batch = batch[overflow:]
+            with self._stats_lock:
+                self._stats["rows_dropped"] += overflow
+        self._pending = batch
@@ -0,0 +1,89 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+# varian -> lebar maksimum (piksel); tinggi mengikuti rasio aspek
+THUMBNAIL_VARIANTS = {
+    "thumb": 320,
+    "preview": 640,
+}
+
+
+class ThumbnailGenerator:
+    """
+    Membuat thumbnail dan preview dari foto capture di worker pool, terpisah
+    dari request upload. Hasil disimpan di `cache_dir/<varian>/<path asli>`.
+    """
+
+    def __init__(self, uploads_dir, cache_dir, variants=None, max_workers=2, jpeg_quality=75):
+        self.uploads_dir = uploads_dir
+        self.cache_dir = cache_dir
+        self.variants = dict(variants or THUMBNAIL_VARIANTS)
+        self.jpeg_quality = jpeg_quality
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="thumbnail")
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.generated = 0
+        self.failed = 0
+
+    def path_for(self, variant, rel_path):
+        return os.path.join(self.cache_dir, variant, rel_path)
+
+    def submit(self, rel_path):
+        """Menjadwalkan pembuatan semua varian untuk satu file (tidak menunggu)."""
+        with self._lock:
+            self.pending += 1
+        future = self._executor.submit(self._generate_all, rel_path)
+        future.add_done_callback(self._on_done)
+        return future
+
+    def ensure(self, variant, rel_path):
+        """Path varian yang siap disajikan; dibuat saat itu juga jika belum ada (misal file lama)."""
+        path = self.path_for(variant, rel_path)
+        if not os.path.exists(path):
+            image = cv2.imread(os.path.join(self.uploads_dir, rel_path))
+            if image is None:
+                return None
+            self._write_variant(image, variant, rel_path)
+        return path
+
+    def stats(self):
+        with self._lock:
+            return {"pending": self.pending, "generated": self.generated, "failed": self.failed}
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _on_done(self, future):
+        with self._lock:
+            self.pending -= 1
+            if future.cancelled() or future.exception() is not None:
+                self.failed += 1
+            else:
+                self.generated += 1
+
+    def _generate_all(self, rel_path):
+        image = cv2.imread(os.path.join(self.uploads_dir, rel_path))
+        if image is None:
+            raise IOError(f"Gagal membaca gambar: {rel_path}")
+        for variant in self.variants:
+            self._write_variant(image, variant, rel_path)
+
+    def _write_variant(self, image, variant, rel_path):
+        max_width = self.variants[variant]
+        height, width = image.shape[:2]
+        if width > max_width:
+            scale = max_width / width
+            image = cv2.resize(image, (max_width, int(height * scale)), interpolation=cv2.INTER_AREA)
+        out_path = self.path_for(variant, rel_path)
+        os.makedirs(os.path.dirname(out_path), exist_ok=True)
+        ok, buffer = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+        if not ok:
+            raise IOError(f"Gagal meng-encode {variant}: {rel_path}")
+        # Tulis ke file sementara lalu rename agar tidak pernah tersaji setengah jadi
+        tmp_path = f"{out_path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(buffer.tobytes())
+        os.replace(tmp_path, out_path)
@@ -0,0 +1,171 @@
+# =================================================================
+# Tracker ringan untuk mengurangi jumlah inferensi YOLO penuh.
+# Buoy bergerak halus antar frame, sehingga posisi box dapat diprediksi
+# dengan Kalman filter kecepatan-konstan di antara dua inferensi.
+# =================================================================
+
+
+class _KalmanCV1D:
+    """Kalman filter kecepatan-konstan satu dimensi (posisi, kecepatan) per langkah frame."""
+
+    def __init__(self, x, process_noise=1.0, measurement_noise=4.0):
+        self.x = float(x)
+        self.v = 0.0
+        self.p = [[measurement_noise, 0.0], [0.0, 10.0]]
+        self.q = process_noise
+        self.r = measurement_noise
+
+    def predict(self):
+        self.x += self.v
+        (p00, p01), (p10, p11) = self.p
+        # P = F P F^T + Q, dengan F = [[1, 1], [0, 1]]
+        self.p = [[p00 + p01 + p10 + p11 + self.q, p01 + p11], [p10 + p11, p11 + self.q]]
+
+    def update(self, z):
+        (p00, p01), (p10, p11) = self.p
+        s = p00 + self.r
+        k0, k1 = p00 / s, p10 / s
+        y = z - self.x
+        self.x += k0 * y
+        self.v += k1 * y
+        self.p = [[(1 - k0) * p00, (1 - k0) * p01], [p10 - k1 * p00, p11 - k1 * p01]]
+
+
+class Track:
+    """Satu objek yang dilacak: box (cx, cy, w, h) dengan ID tetap."""
+
+    def __init__(self, track_id, detection):
+        x1, y1, x2, y2 = detection['box']
+        self.id = track_id
+        self.label = detection['label']
+        self.conf = detection['conf']
+        self.detect_conf = self.conf  # Confidence dari deteksi terakhir (sebelum meluruh)
+        self.filters = [_KalmanCV1D(v) for v in ((x1 + x2) / 2, (y1 + y2) / 2, x2 - x1, y2 - y1)]
+        self.hits = 1
+        self.misses = 0
+
+    @property
+    def box(self):
+        cx, cy, w, h = (f.x for f in self.filters)
+        return (int(cx - w / 2), int(cy - h / 2), int(cx + w / 2), int(cy + h / 2))
+
+    def predict(self):
+        for f in self.filters:
+            f.predict()
+
+    def update(self, detection):
+        x1, y1, x2, y2 = detection['box']
+        for f, z in zip(self.filters, ((x1 + x2) / 2, (y1 + y2) / 2, x2 - x1, y2 - y1)):
+            f.update(z)
+        self.conf = detection['conf']
+        self.detect_conf = self.conf
+        self.hits += 1
+        self.misses = 0
+
+    def as_object(self):
+        x1, y1, x2, y2 = self.box
+        return {
+            'id': self.id, 'label': self.label, 'conf': round(self.conf, 3), 'box': (x1, y1, x2, y2),
+            'cx': (x1 + x2) // 2, 'cy': (y1 + y2) // 2, 'area': (x2 - x1) * (y2 - y1),
+        }
+
+
+def iou(a, b):
+    ix1, iy1 = max(a[0], b[0]), max(a[1], b[1])
+    ix2, iy2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0, ix2 - ix1) * max(0, iy2 - iy1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+class BoxTracker:
+    """Mengasosiasikan deteksi ke track (greedy berdasarkan IoU, label harus sama)."""
+
+    def __init__(self, iou_threshold=0.2, max_misses=5, conf_decay=0.9):
+        self.iou_threshold = iou_threshold
+        self.max_misses = max_misses
+        self.conf_decay = conf_decay
+        self.tracks = []
+        self._next_id = 1
+
+    def reset(self):
+        self.tracks = []
+
+    def predict(self):
+        """Memajukan semua track satu frame tanpa deteksi baru; confidence meluruh."""
+        for track in self.tracks:
+            track.predict()
+            track.conf *= self.conf_decay
+
+    def update(self, detections):
+        """Memajukan track satu frame lalu mengoreksinya dengan hasil inferensi."""
+        for track in self.tracks:
+            track.predict()
+        pairs = sorted(
+            ((iou(t.box, d['box']), ti, di)
+             for ti, t in enumerate(self.tracks)
+             for di, d in enumerate(detections) if t.label == d['label']),
+            reverse=True)
+        used_tracks, used_dets = set(), set()
+        for score, ti, di in pairs:
+            if score < self.iou_threshold:
+                break
+            if ti in used_tracks or di in used_dets:
+                continue
+            self.tracks[ti].update(detections[di])
+            used_tracks.add(ti)
+            used_dets.add(di)
+        for ti, track in enumerate(self.tracks):
+            if ti not in used_tracks:
+                track.misses += 1
+        self.tracks = [t for t in self.tracks if t.misses <= self.max_misses]
+        for di, detection in enumerate(detections):
+            if di not in used_dets:
+                self.tracks.append(Track(self._next_id, detection))
+                self._next_id += 1
+
+    def objects(self):
+        """Track yang sedang terlihat (tidak sedang hilang dari deteksi terakhir)."""
+        return [t.as_object() for t in self.tracks if t.misses == 0]
+
+
+class DetectionScheduler:
+    """
+    Menjalankan model hanya setiap `interval` frame, atau lebih cepat jika
+    confidence prediksi salah satu track meluruh di bawah `min_confidence_ratio`
+    kali confidence-nya saat terakhir dideteksi. Pembandingnya relatif, sehingga
+    buoy jauh/samar yang memang ber-confidence rendah tetap ikut jadwal N frame.
+    Di antara inferensi, posisi objek diprediksi oleh BoxTracker.
+
+    `detect_fn(frame)` harus mengembalikan daftar dict {'label', 'conf', 'box'}.
+    """
+
+    def __init__(self, detect_fn, interval=3, min_confidence_ratio=0.7, tracker=None):
+        self.detect_fn = detect_fn
+        self.interval = max(1, interval)
+        self.min_confidence_ratio = min_confidence_ratio
+        self.tracker = tracker or BoxTracker()
+        self._frames_since_detect = None
+
+    def reset(self):
+        self.tracker.reset()
+        self._frames_since_detect = None
+
+    def _needs_detection(self):
+        if self._frames_since_detect is None or self._frames_since_detect + 1 >= self.interval:
+            return True
+        tracks = [t for t in self.tracker.tracks if t.misses == 0]
+        if not tracks:
+            return False  # Tidak ada yang perlu diprediksi; tunggu jadwal inferensi berikutnya
+        decay = self.tracker.conf_decay
+        return any(t.conf * decay < t.detect_conf * self.min_confidence_ratio for t in tracks)
+
+    def process(self, frame):
+        """Mengembalikan (daftar objek terlacak, apakah model dijalankan pada frame ini)."""
+        if self._needs_detection():
+            self.tracker.update(self.detect_fn(frame))
+            self._frames_since_detect = 0
+            return self.tracker.objects(), True
+        self.tracker.predict()
+        self._frames_since_detect += 1
+        return self.tracker.objects(), False
@@ -0,0 +1,150 @@
+import json
+import socket
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from vision_protocol import STREAM_LENGTH, unpack_vision_frame
+from frame_ring import FrameRing
+
+
+class VisionClient:
+    """
+    Client untuk vision_service.py. Dapat dipakai seperti cv2.VideoCapture
+    (read() -> (ret, frame)); read_packet() juga mengembalikan hasil deteksi
+    dari detektor yang dilanggan, dihitung service pada frame yang sama.
+
+    `frames`: True (JPEG lewat socket), False (deteksi saja), atau "shm"
+    (frame dibaca langsung dari ring shared memory service, tanpa decode;
+    hanya untuk client di mesin yang sama).
+
+    Jika koneksi ke service putus, read_packet() mengembalikan None lalu
+    menyambung ulang pada pemanggilan berikutnya (langganan dikirim ulang).
+    """
+
+    def __init__(self, host="127.0.0.1", port=8765, detectors=(), frames=True, timeout=5.0, reconnect_delay=1.0):
+        self.host = host
+        self.port = port
+        self.detectors = tuple(detectors)
+        self.frames = frames
+        self.timeout = timeout
+        self.reconnect_delay = reconnect_delay
+        self._sock = None
+        self._send_lock = threading.Lock()
+        self._header = bytearray(STREAM_LENGTH.size)
+        self._ring = None
+        self._frame_buffer = None  # Salinan frame yang boleh diubah (read_packet(writable=True))
+
+    def open(self):
+        try:
+            self._sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+            self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self._send_subscription()
+            print(f"Terhubung ke vision service {self.host}:{self.port} (detektor: {list(self.detectors)})")
+            return True
+        except OSError as e:
+            print(f"Vision service belum tersedia ({e}). Mencoba lagi...")
+            self._close_socket()
+            return False
+
+    def isOpened(self):
+        return self._sock is not None
+
+    def set_detectors(self, detectors):
+        """Mengganti detektor yang dilanggan; service memuat model yang dibutuhkan di background."""
+        self.detectors = tuple(detectors)
+        if self._sock is not None:
+            try:
+                self._send_subscription()
+            except OSError:
+                self._close_socket()  # Dikirim ulang saat tersambung kembali
+
+    def _send_subscription(self):
+        line = json.dumps({"detectors": list(self.detectors), "frames": self.frames}) + "\n"
+        with self._send_lock:
+            self._sock.sendall(line.encode("utf-8"))
+
+    def _recv_exact(self, buffer):
+        view = memoryview(buffer)
+        while view:
+            received = self._sock.recv_into(view)
+            if not received:
+                raise ConnectionError("Vision service menutup koneksi")
+            view = view[received:]
+        return buffer
+
+    def read_packet(self, writable=False):
+        """
+        Pesan berikutnya dari service sebagai dict {seq, capture_time,
+        capture_monotonic, frame, frame_ref, detections}, atau None jika
+        koneksi terputus.
+
+        Dengan frames="shm", `frame` adalah view read-only ke ring (periksa
+        frame_ref.valid() setelah dipakai) kecuali `writable=True`: frame
+        disalin ke buffer milik client yang dipakai ulang tiap pemanggilan.
+        `frame` None jika slot ring sudah ditimpa sebelum sempat dibaca.
+        """
+        if self._sock is None and not self.open():
+            time.sleep(self.reconnect_delay)
+            return None
+        try:
+            (length,) = STREAM_LENGTH.unpack(self._recv_exact(self._header))
+            payload = self._recv_exact(bytearray(length))
+        except OSError as e:
+            print(f"Koneksi ke vision service terputus: {e}")
+            self._close_socket()
+            return None
+        meta, jpeg = unpack_vision_frame(payload)
+        frame_ref = None
+        if self.frames == "shm":
+            frame_ref, frame = self._ring_frame(meta['ring'], writable)
+        else:
+            frame = cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_COLOR) if len(jpeg) else None
+        for result in meta['detections'].values():
+            for obj in result['objects']:
+                obj['box'] = tuple(obj['box'])
+        return {
+            'seq': meta['seq'],
+            'capture_time': meta['capture_time'],
+            'capture_monotonic': meta['capture_monotonic'],
+            'frame': frame,
+            'frame_ref': frame_ref,
+            'detections': meta['detections'],
+        }
+
+    def _ring_frame(self, info, writable):
+        if self._ring is None:
+            self._ring = FrameRing.attach(info['name'], info['shape'], info['slots'])
+        frame_ref = self._ring.get(info['seq'])
+        if frame_ref is None:
+            return None, None
+        if not writable:
+            return frame_ref, frame_ref.frame
+        if self._frame_buffer is None or self._frame_buffer.shape != frame_ref.frame.shape:
+            self._frame_buffer = np.empty_like(frame_ref.frame)
+        if not frame_ref.copy_to(self._frame_buffer):
+            return None, None
+        return frame_ref, self._frame_buffer
+
+    def read(self):
+        """Seperti cv2.VideoCapture.read(): frame boleh diubah pemanggil."""
+        packet = self.read_packet(writable=True)
+        if packet is None or packet['frame'] is None:
+            return False, None
+        return True, packet['frame']
+
+    def _close_socket(self):
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+        self._sock = None
+        if self._ring is not None:
+            self._ring.close()  # Service bisa saja dijalankan ulang dengan segmen baru
+            self._ring = None
+
+    def release(self):
+        self._close_socket()
@@ -1,76 +1,65 @@
 import cv2
-import requests
 import time
-from ultralytics import YOLOv10  # kalau pakai YOLOv10 fork, ganti ke YOLOv10
+from capture_uploader import CaptureUploader
+from vision_client import VisionClient
 
 # --- PENGATURAN ---
-WEBCAM_INDEX = 1
+# Webcam dan model kotak dijalankan oleh vision_service.py (jalankan lebih dulu)
+VISION_SERVICE_HOST = "127.0.0.1"
+VISION_SERVICE_PORT = 8765
+DETECTOR = "box"  # Detektor kotak di vision_service.Config.DETECTORS
 API_URL = "http://localhost:8000/upload/image"
-MODEL_PATH = 'backend/best_kotak5.pt'
 DETECTION_COOLDOWN = 5
 CONFIDENCE_THRESHOLD = 0.85
-TARGET_CLASS_ID = 0  # ganti sesuai ID kelas "kotak" di modelmu
+UPLOAD_SPOOL_DIR = 'backend/upload_spool/vision_detector'  # Folder khusus per uploader
 
 def main():
-    print(f"Memuat model YOLO dari {MODEL_PATH}...")
-    try:
-        model = YOLOv10(MODEL_PATH)
-        print("Model berhasil dimuat.")
-    except Exception as e:
-        print(f"Error: Gagal memuat model. Pastikan path '{MODEL_PATH}' benar.")
-        print(f"Detail error: {e}")
-        return
+    cap = VisionClient(VISION_SERVICE_HOST, VISION_SERVICE_PORT, detectors=[DETECTOR], frames="shm")
 
-    print("Membuka webcam...")
-    cap = cv2.VideoCapture(WEBCAM_INDEX, cv2.CAP_DSHOW)
-    if not cap.isOpened():
-        print("Error: Tidak bisa membuka webcam di index", WEBCAM_INDEX)
-        return
+    uploader = CaptureUploader(API_URL, UPLOAD_SPOOL_DIR)
+    uploader.start()
 
     last_capture_time = 0
     print("Memulai deteksi... Arahkan objek 'kotak' ke webcam.")
     print("Tekan 'q' pada jendela webcam untuk keluar.")
 
     while True:
-        ret, frame = cap.read()
-        if not ret:
-            print("⚠️  Gagal membaca frame dari webcam. Mencoba lagi...")
-            time.sleep(0.5)
-            continue
+        packet = cap.read_packet(writable=True)  # Frame digambari, jadi salin dari ring
+        if packet is None or packet['frame'] is None:
+            continue  # Menunggu vision service
 
-        results = model(frame, conf=CONFIDENCE_THRESHOLD, verbose=False)
-        frame_display = results[0].plot()
-        cv2.imshow('YOLO Detector', frame_display)
-
-        # Cek apakah ada kotak (kelas sesuai TARGET_CLASS_ID)
-        object_detected = any(int(box.cls[0]) == TARGET_CLASS_ID for box in results[0].boxes)
+        frame = packet['frame']
+        result = packet['detections'].get(DETECTOR) or {'objects': []}
+        boxes = [obj for obj in result['objects'] if obj['conf'] >= CONFIDENCE_THRESHOLD]
+        object_detected = bool(boxes)
 
+        # Upload dilakukan sebelum frame digambari, jadi tidak perlu salinan terpisah untuk tampilan
         if object_detected and (time.time() - last_capture_time > DETECTION_COOLDOWN):
             print("Objek 'kotak' terdeteksi! Mengambil gambar...")
 
             is_success, buffer = cv2.imencode(".jpg", frame)
-            if not is_success:
+            if is_success:
+                # Disimpan ke spool dan dikirim di background (dengan retry jika server tidak terjangkau)
+                uploader.submit_jpeg(buffer)
+            else:
                 print("⚠️  Gagal meng-encode frame.")
-                continue
-
-            files = {'file': ('capture.jpg', buffer.tobytes(), 'image/jpeg')}
-            try:
-                response = requests.post(API_URL, files=files, timeout=5)
-                if response.status_code == 200:
-                    print("✅ Gambar berhasil diunggah ke server.")
-                else:
-                    print(f"❌ Server error: {response.status_code} - {response.text}")
-            except requests.exceptions.RequestException as e:
-                print(f"❌ Gagal terhubung ke server: {e}")
 
             # Update cooldown timer apapun hasilnya (biar tidak spam)
             last_capture_time = time.time()
 
+        for obj in boxes:
+            x1, y1, x2, y2 = obj['box']
+            cv2.rectangle(frame, (x1, y1), (x2, y2), (255, 0, 0), 2)
+            cv2.putText(frame, f"kotak {obj['conf']:.2f}", (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 0, 0), 2)
+        cv2.imshow('YOLO Detector', frame)
+
         if cv2.waitKey(1) & 0xFF == ord('q'):
             break
 
     cap.release()
     cv2.destroyAllWindows()
+    uploader.stop()
+    print(f"Statistik upload: {uploader.stats()}")
     print("Program dihentikan.")
 
 if __name__ == "__main__":
@@ -0,0 +1,54 @@
+import json
+import struct
+
+# =================================================================
+# Format frame biner untuk stream video (/ws/mission_control -> /ws/frontend)
+# =================================================================
+# Semua angka big-endian:
+#   magic     2 byte   b'VF' (frame video) atau b'VD' (hasil deteksi saja)
+#   versi     1 byte   VISION_FRAME_VERSION
+#   flags     1 byte   (cadangan, saat ini 0)
+#   meta_len  uint32   panjang metadata dalam byte
+#   meta      JSON UTF-8 (type, status, extra_data, ...)
+#   jpeg      sisa payload, byte JPEG mentah (tanpa hex/base64);
+#             kosong untuk pesan deteksi
+#
+# Relay di main.py cukup melihat 2 byte magic untuk memilih antrian
+# (video/detections) tanpa mem-parse isi pesan.
+# =================================================================
+
+VISION_FRAME_MAGIC = b'VF'
+DETECTIONS_MAGIC = b'VD'
+VISION_FRAME_VERSION = 1
+VISION_FRAME_HEADER = struct.Struct('!2sBBI')
+
+# Pada socket TCP lokal vision_service.py tiap pesan diawali uint32 panjang pesan
+STREAM_LENGTH = struct.Struct('!I')
+
+
+def pack_vision_frame(meta, jpeg, magic=VISION_FRAME_MAGIC):
+    """Menggabungkan metadata (dict) dan byte JPEG menjadi satu pesan websocket biner."""
+    meta_bytes = json.dumps(meta, separators=(',', ':')).encode('utf-8')
+    header = VISION_FRAME_HEADER.pack(magic, VISION_FRAME_VERSION, 0, len(meta_bytes))
+    return b''.join((header, meta_bytes, jpeg))
+
+
+def pack_detections(meta):
+    """Pesan berisi hasil deteksi saja (tanpa gambar), dikirim secepat laju inferensi."""
+    return pack_vision_frame(meta, b'', magic=DETECTIONS_MAGIC)
+
+
+def message_topic(data):
+    """Menentukan topic relay dari 2 byte magic: 'detections' atau 'video'."""
+    return "detections" if data[:2] == DETECTIONS_MAGIC else "video"
+
+
+def unpack_vision_frame(data):
+    """Memecah pesan biner menjadi (meta, jpeg). JPEG dikembalikan sebagai memoryview tanpa salinan."""
+    magic, version, _flags, meta_len = VISION_FRAME_HEADER.unpack_from(data)
+    if magic not in (VISION_FRAME_MAGIC, DETECTIONS_MAGIC) or version != VISION_FRAME_VERSION:
+        raise ValueError(f"Frame visi tidak dikenal (magic={magic!r}, versi={version})")
+    start = VISION_FRAME_HEADER.size
+    view = memoryview(data)
+    meta = json.loads(bytes(view[start:start + meta_len]))
+    return meta, view[start + meta_len:]
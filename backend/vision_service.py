@@ -0,0 +1,316 @@
+# =================================================================
+# VISION SERVICE - SATU PROSES PEMILIK KAMERA DAN MODEL YOLO
+# =================================================================
+# Jalankan sekali:
+#   python backend/vision_service.py
+# Skrip lain (mission_controller.py, ROI_CORRECTION.py, coba.py,
+# vision_detector.py) menjadi client lewat vision_client.VisionClient,
+# sehingga kamera hanya dibuka sekali dan tiap model hanya dimuat sekali.
+#
+# Protokol (TCP lokal):
+#   client -> service : satu baris JSON per perubahan langganan,
+#                       misal {"detectors": ["buoy"], "frames": "shm"}
+#   service -> client : uint32 panjang + pesan vision_protocol
+#                       (b'VF' + JPEG jika frames=true, b'VD' tanpa gambar)
+#   meta pesan        : seq, capture_time, capture_monotonic,
+#                       detections {nama: {objects, source}}, stage_ms,
+#                       ring {name, shape, slots, seq}
+#
+# frames="shm": client di mesin yang sama membaca frame langsung dari
+# ring shared memory (frame_ring.py) berdasarkan ring.seq, tanpa JPEG.
+#
+# Detektor hanya dijalankan jika ada client yang melanggannya; model
+# dimuat saat pertama dilanggan (lihat model_manager.ModelCache).
+# =================================================================
+import asyncio
+import json
+
+import cv2
+import numpy as np
+
+from vision_protocol import pack_vision_frame, pack_detections, STREAM_LENGTH
+from detections import split_balls, find_best_gate
+from inference_modes import RegionInference, INFERENCE_FULL, INFERENCE_ROI_CROP, gate_region
+from tracking import DetectionScheduler
+from frame_pipeline import LatestSlot, RingCaptureStage, WorkerStage
+from frame_ring import FrameRing
+from model_manager import load_model, ModelCache
+
+
+class Config:
+    HOST = "127.0.0.1"
+    PORT = 8765
+    CAMERA_INDEX = 1
+    FRAME_WIDTH = 640
+    FRAME_HEIGHT = 480
+    JPEG_QUALITY = 90            # Frame untuk client lokal, bandwidth bukan masalah
+    CLIENT_QUEUE_SIZE = 2        # Client lambat hanya kehilangan frame lama
+    FRAME_RING_NAME = "aterkia_frames"
+    FRAME_RING_SLOTS = 8         # Frame tetap valid selama ~SLOTS/FPS detik setelah diambil
+
+    # --- Detektor yang tersedia untuk client ---
+    # labels: {class_id: label}; track: pakai DetectionScheduler (inferensi setiap N frame);
+    # gate: hasilnya dipakai sebagai fokus mode roi_crop.
+    DETECTORS = {
+        "buoy": {"path": 'backend/best5.pt', "model_class": "YOLOv10",
+                 "labels": {0: 'green', 1: 'red'}, "conf": 0.25, "track": True, "gate": True},
+        "box": {"path": 'backend/best_kotak5.pt', "model_class": "YOLOv10",
+                "labels": {0: 'box'}, "conf": 0.6},
+        # Model YOLOv8 yang dipakai ROI_CORRECTION.py sebelum pindah ke vision service
+        "buoy_v8": {"path": 'backend/best (3).pt', "model_class": "YOLO",
+                    "labels": {0: 'green', 1: 'red'}, "conf": 0.25, "track": True, "gate": True},
+    }
+
+    # --- Tracker: inferensi penuh hanya setiap N frame, sisanya diprediksi ---
+    DETECT_EVERY_N_FRAMES = 3
+    TRACK_MIN_CONFIDENCE_RATIO = 0.7  # Deteksi ulang jika confidence prediksi < 70% confidence saat dideteksi
+
+    # --- Mode inferensi: "full", "downscaled", atau "roi_crop" (lihat inference_modes.py) ---
+    INFERENCE_MODE = "roi_crop"
+    INFERENCE_IMGSZ = 640
+    DOWNSCALED_IMGSZ = 320
+    ROI_CROP_PADDING = 0.5
+    ROI_REACQUIRE_EVERY = 15
+
+    # --- Runtime model: "pytorch", "onnx", atau "openvino" (lihat model_manager.py) ---
+    INFERENCE_RUNTIME = "pytorch"
+    INFERENCE_INT8 = False
+    MODEL_CACHE_DIR = 'backend/model_cache'
+    PARITY_IMAGE = None
+    MODEL_MEMORY_BUDGET_MB = 256
+
+
+class VisionService:
+    def __init__(self, config):
+        self.config = config
+        self.models = ModelCache(
+            self._load_model, memory_budget_mb=self.config.MODEL_MEMORY_BUDGET_MB,
+            warmup_shape=(self.config.FRAME_HEIGHT, self.config.FRAME_WIDTH, 3),
+            warmup_kwargs={'imgsz': self.config.INFERENCE_IMGSZ})
+        self.detectors = {name: self._make_detector(spec) for name, spec in self.config.DETECTORS.items()}
+        self.clients = {}  # StreamWriter -> {'detectors', 'frames', 'queue'}
+        self.active_detectors = frozenset()
+        self.frame_modes = frozenset()  # Nilai 'frames' yang diminta client (True/False/"shm")
+        self._last_active = frozenset()
+        self.cap = self._init_camera()
+        self.ring = FrameRing.create(self.config.FRAME_RING_NAME,
+                                     (self.config.FRAME_HEIGHT, self.config.FRAME_WIDTH, 3),
+                                     slots=self.config.FRAME_RING_SLOTS)
+        self.raw_slot = LatestSlot()
+        self.processed_slot = LatestSlot()
+        self.output_slot = LatestSlot()
+        self.stages = []
+        self._inference_frame = None  # Buffer salinan frame milik stage inferensi
+        print("Vision service siap.")
+
+    def _load_model(self, path):
+        # Import ditunda: ultralytics (dan torch) baru dimuat saat detektor pertama dilanggan
+        import ultralytics
+        spec = next(s for s in self.config.DETECTORS.values() if s['path'] == path)
+        model_class = getattr(ultralytics, spec.get('model_class', 'YOLOv10'))
+        print(f"Memuat model {spec.get('model_class', 'YOLOv10')} {path} (runtime: {self.config.INFERENCE_RUNTIME})...")
+        return load_model(model_class, path, runtime=self.config.INFERENCE_RUNTIME, imgsz=self.config.INFERENCE_IMGSZ,
+                          int8=self.config.INFERENCE_INT8, cache_dir=self.config.MODEL_CACHE_DIR,
+                          parity_image=self.config.PARITY_IMAGE)
+
+    def _make_detector(self, spec):
+        if spec.get('gate'):
+            mode = self.config.INFERENCE_MODE
+        else:
+            # Tanpa gerbang tidak ada fokus untuk crop, jadi roi_crop sama dengan full
+            mode = INFERENCE_FULL if self.config.INFERENCE_MODE == INFERENCE_ROI_CROP else self.config.INFERENCE_MODE
+        inference = RegionInference(
+            None, spec['labels'], mode=mode, imgsz=self.config.INFERENCE_IMGSZ,
+            downscaled_imgsz=self.config.DOWNSCALED_IMGSZ, crop_padding=self.config.ROI_CROP_PADDING,
+            reacquire_every=self.config.ROI_REACQUIRE_EVERY, conf=spec.get('conf', 0.25))
+        scheduler = None
+        if spec.get('track'):
+            scheduler = DetectionScheduler(
+                inference.detect, interval=self.config.DETECT_EVERY_N_FRAMES,
+                min_confidence_ratio=self.config.TRACK_MIN_CONFIDENCE_RATIO)
+        return {'spec': spec, 'inference': inference, 'scheduler': scheduler}
+
+    def _init_camera(self):
+        print(f"Membuka kamera di indeks: {self.config.CAMERA_INDEX}")
+        cap = cv2.VideoCapture(self.config.CAMERA_INDEX, cv2.CAP_DSHOW)
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.config.FRAME_WIDTH)
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.config.FRAME_HEIGHT)
+        if not cap.isOpened():
+            raise IOError("FATAL: Tidak bisa membuka kamera.")
+        return cap
+
+    # -----------------------------------------------------------------
+    # Pipeline: kamera -> inferensi -> encoder (thread), lalu dibagikan ke client
+    # -----------------------------------------------------------------
+
+    def _start_pipeline(self):
+        self.stages = [
+            RingCaptureStage(self.cap, self.ring, self.raw_slot),
+            WorkerStage("inference", self.raw_slot, self.processed_slot, self._inference_stage),
+            WorkerStage("encoder", self.processed_slot, self.output_slot, self._encode_stage),
+        ]
+        for stage in self.stages:
+            stage.start()
+
+    def _stop_pipeline(self):
+        for stage in self.stages:
+            stage.stop()
+        for slot in (self.raw_slot, self.processed_slot, self.output_slot):
+            slot.close()
+        for stage in self.stages:
+            stage.join(timeout=2)
+        self.stages = []
+
+    def _inference_stage(self, item):
+        # Inferensi bisa lebih lama dari umur slot ring (SLOTS/FPS), jadi model dan
+        # tracker bekerja pada salinan privat; frame yang tertimpa saat disalin dibuang
+        if self._inference_frame is None or self._inference_frame.shape != item['frame'].shape:
+            self._inference_frame = np.empty_like(item['frame'])
+        if not item['frame_ref'].copy_to(self._inference_frame):
+            return None
+        frame = self._inference_frame
+        active = self.active_detectors
+        # Tracker detektor yang berhenti dilanggan sudah basi saat dilanggan lagi
+        for name in self._last_active - active:
+            if self.detectors[name]['scheduler']:
+                self.detectors[name]['scheduler'].reset()
+            self.detectors[name]['inference'].set_focus(None)
+        self._last_active = active
+
+        results = {}
+        for name in sorted(active):
+            detector = self.detectors[name]
+            model = self.models.get(detector['spec']['path'])
+            if model is None:
+                results[name] = {'objects': [], 'source': 'loading'}
+                continue
+            inference = detector['inference']
+            inference.model = model
+            if detector['scheduler']:
+                objects, ran_model = detector['scheduler'].process(frame)
+            else:
+                objects, ran_model = inference.detect(frame), True
+            if detector['spec'].get('gate'):
+                balls = split_balls(objects)
+                inference.set_focus(gate_region(find_best_gate(balls['red'], balls['green'])))
+            source = 'track' if not ran_model else ('crop' if inference.last_region else 'model')
+            results[name] = {'objects': objects, 'source': source}
+        return {**item, 'detections': results}
+
+    def _encode_stage(self, item):
+        meta = {
+            'type': 'vision_service',
+            'seq': item['seq'],
+            'capture_time': round(item['capture_time'], 4),
+            'capture_monotonic': round(item['capture_monotonic'], 4),
+            'detections': item['detections'],
+            'stage_ms': {stage.name: stage.last_ms for stage in self.stages},
+            'ring': {'name': self.ring.name, 'shape': self.ring.shape, 'slots': self.ring.slots, 'seq': item['seq']},
+        }
+        with_frame = detections_only = None
+        if True in self.frame_modes:
+            ok, buffer = cv2.imencode('.jpg', item['frame'], [cv2.IMWRITE_JPEG_QUALITY, self.config.JPEG_QUALITY])
+            # Slot ring yang tertimpa saat di-encode menghasilkan gambar campuran; lewati
+            if ok and item['frame_ref'].valid():
+                with_frame = pack_vision_frame(meta, buffer)
+        if self.frame_modes - {True}:
+            detections_only = pack_detections(meta)
+        return {'frame': with_frame, 'detections': detections_only}
+
+    # -----------------------------------------------------------------
+    # Server socket lokal
+    # -----------------------------------------------------------------
+
+    def _update_active_detectors(self):
+        active = frozenset(name for client in self.clients.values() for name in client['detectors'])
+        for name in active - self.active_detectors:
+            self.models.request(self.detectors[name]['spec']['path'])  # Muat + warmup di background
+        self.active_detectors = active
+        self.frame_modes = frozenset(client['frames'] for client in self.clients.values())
+        print(f"Detektor aktif: {sorted(active) or '-'} ({len(self.clients)} client)")
+
+    async def _handle_client(self, reader, writer):
+        peer = writer.get_extra_info('peername')
+        client = {'detectors': set(), 'frames': True, 'queue': asyncio.Queue(self.config.CLIENT_QUEUE_SIZE)}
+        self.clients[writer] = client
+        print(f"Client vision terhubung: {peer}")
+        sender = asyncio.create_task(self._client_sender(writer, client['queue']))
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                unknown = set(request.get('detectors', [])) - set(self.detectors)
+                if unknown:
+                    print(f"Peringatan: Detektor tidak dikenal diabaikan: {sorted(unknown)}")
+                client['detectors'] = set(request.get('detectors', [])) - unknown
+                frames = request.get('frames', True)
+                client['frames'] = frames if frames == "shm" else bool(frames)
+                self._update_active_detectors()
+        except ConnectionError:
+            pass
+        finally:
+            sender.cancel()
+            self.clients.pop(writer, None)
+            self._update_active_detectors()
+            writer.close()
+            print(f"Client vision terputus: {peer}")
+
+    async def _client_sender(self, writer, queue):
+        try:
+            while True:
+                payload = await queue.get()
+                writer.write(STREAM_LENGTH.pack(len(payload)))
+                writer.write(payload)
+                await writer.drain()
+        except ConnectionError:
+            pass
+
+    async def _publish_loop(self):
+        last_seq = self.output_slot.seq
+        while True:
+            last_seq, output = await asyncio.to_thread(self.output_slot.get_newer, last_seq, 1.0)
+            if output is None:
+                continue
+            for client in self.clients.values():
+                payload = output['frame'] if client['frames'] is True else output['detections']
+                if payload is None:
+                    continue
+                queue = client['queue']
+                if queue.full():
+                    queue.get_nowait()  # Buang yang paling lama
+                queue.put_nowait(payload)
+
+    async def run(self):
+        self._start_pipeline()
+        server = await asyncio.start_server(self._handle_client, self.config.HOST, self.config.PORT)
+        print(f"Vision service mendengarkan di {self.config.HOST}:{self.config.PORT}")
+        async with server:
+            await asyncio.gather(server.serve_forever(), self._publish_loop())
+
+    def cleanup(self):
+        if hasattr(self, 'stages'):
+            self._stop_pipeline()
+        if hasattr(self, 'cap') and self.cap.isOpened():
+            self.cap.release()
+            print("Kamera dilepaskan.")
+        if hasattr(self, 'ring'):
+            self.ring.close()
+
+
+if __name__ == "__main__":
+    service = None
+    try:
+        service = VisionService(Config())
+        asyncio.run(service.run())
+    except KeyboardInterrupt:
+        print("\nVision service dihentikan oleh pengguna.")
+    except Exception as e:
+        print(f"FATAL: Terjadi error pada level tertinggi: {e}")
+    finally:
+        if service:
+            service.cleanup()
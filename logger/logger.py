@@ -1,15 +1,40 @@
 import asyncio
+import threading
 import websockets
 from pymavlink import mavutil
 import json
 import time
+from urllib.parse import urlencode
+from telemetry_protocol import pack_telemetry
 
 # --- PENGATURAN ---
 SERIAL_PORT = 'COM10'
 BAUD_RATE = 115200
 # Pastikan ini adalah endpoint yang benar untuk telemetri di main.py Anda
 WEBSOCKET_URI = "ws://127.0.0.1:8000/ws/telemetry" 
-SEND_RATE_HZ = 5 # Kirim data 5 kali per detik
+# Identitas baris telemetri di database; satu kali logger berjalan = satu misi
+VEHICLE_ID = "default"
+MISSION_ID = time.strftime("%Y%m%d_%H%M%S")
+# "binary": frame ringkas dari telemetry_protocol.py, "json": format lama yang mudah dibaca
+TELEMETRY_ENCODING = "binary"
+SEND_TICK_HZ = 20 # Seberapa sering sender memeriksa field yang perlu dikirim
+KEYFRAME_INTERVAL_S = 2.0 # Snapshot lengkap berkala agar penerima selalu bisa sinkron ulang
+READ_QUEUE_SIZE = 1000
+
+# --- Kebijakan pengiriman per field ---
+# (interval minimum dalam detik, perubahan minimum agar dianggap berubah)
+# Attitude berubah cepat sehingga dikirim hingga 20 Hz; baterai cukup 1 Hz.
+FIELD_POLICIES = {
+    "roll": (0.05, 0.002),
+    "pitch": (0.05, 0.002),
+    "yaw": (0.05, 0.002),
+    "lat": (0.2, 1e-7),
+    "lon": (0.2, 1e-7),
+    "groundspeed": (0.2, 0.01),
+    "heading": (0.2, 1),
+    "voltage": (1.0, 0.01),
+    "current": (1.0, 0.01),
+}
 
 # --- Penampung Data Telemetri ---
 # Menggunakan dictionary agar mudah dikelola dan diperluas
@@ -25,48 +50,114 @@ telemetry_data = {
     "current": None,
 }
 
-async def read_mavlink(master):
-    """Tugas yang berjalan di background untuk terus membaca pesan MAVLink."""
-    while True:
+def parse_message(msg):
+    """Mengubah satu pesan MAVLink menjadi dict field telemetri yang diperbarui."""
+    msg_type = msg.get_type()
+    if msg_type == 'ATTITUDE':
+        return {"roll": msg.roll, "pitch": msg.pitch, "yaw": msg.yaw}
+    elif msg_type == 'GPS_RAW_INT' and msg.fix_type >= 3:
+        return {"lat": msg.lat / 1e7, "lon": msg.lon / 1e7}
+    elif msg_type == 'VFR_HUD':
+        return {"groundspeed": msg.groundspeed, "heading": msg.heading}
+    elif msg_type == 'SYS_STATUS':
+        return {
+            "voltage": msg.voltage_battery / 1000.0,  # Konversi dari mV ke V
+            # Current tidak selalu tersedia, beri nilai default jika -1
+            "current": msg.current_battery / 100.0 if msg.current_battery != -1 else 0.0,  # Konversi dari cA ke A
+        }
+    return None
+
+def mavlink_reader_thread(master, loop, queue, stop_event):
+    """
+    Thread khusus pembacaan serial. recv_match yang blocking tidak lagi
+    membekukan event loop; hasilnya diteruskan ke loop lewat antrian.
+    """
+    def offer(updates):
+        try:
+            queue.put_nowait(updates)
+        except asyncio.QueueFull:
+            pass  # Loop tertinggal: pembaruan ini akan tertimpa pesan berikutnya
+
+    while not stop_event.is_set():
         msg = master.recv_match(
-            type=['ATTITUDE', 'GPS_RAW_INT', 'VFR_HUD', 'SYS_STATUS'], 
+            type=['ATTITUDE', 'GPS_RAW_INT', 'VFR_HUD', 'SYS_STATUS'],
             blocking=True,
-            timeout=1.0 # Timeout agar tidak terjebak selamanya
+            timeout=0.5 # Timeout agar stop_event tetap diperiksa
         )
-        if msg:
-            msg_type = msg.get_type()
-            if msg_type == 'ATTITUDE':
-                telemetry_data["roll"] = msg.roll
-                telemetry_data["pitch"] = msg.pitch
-                telemetry_data["yaw"] = msg.yaw
-            elif msg_type == 'GPS_RAW_INT' and msg.fix_type >= 3:
-                telemetry_data["lat"] = msg.lat / 1e7
-                telemetry_data["lon"] = msg.lon / 1e7
-            elif msg_type == 'VFR_HUD':
-                telemetry_data["groundspeed"] = msg.groundspeed
-                telemetry_data["heading"] = msg.heading
-            elif msg_type == 'SYS_STATUS':
-                telemetry_data["voltage"] = msg.voltage_battery / 1000.0  # Konversi dari mV ke V
-                # Current tidak selalu tersedia, beri nilai default jika -1
-                telemetry_data["current"] = msg.current_battery / 100.0 if msg.current_battery != -1 else 0.0 # Konversi dari cA ke A
-        await asyncio.sleep(0.01) # Beri kesempatan tugas lain berjalan
+        updates = parse_message(msg) if msg else None
+        if updates:
+            loop.call_soon_threadsafe(offer, updates)
+
+async def apply_updates(queue):
+    """Menerapkan pembaruan dari thread pembaca ke telemetry_data (berjalan terus, lepas dari koneksi websocket)."""
+    while True:
+        telemetry_data.update(await queue.get())
+
+def _changed(old, new, min_change):
+    if old is None or new is None:
+        return old is not new
+    return abs(new - old) >= min_change
+
+class TelemetrySender:
+    """
+    Mengirim hanya field yang berubah (delta), masing-masing dibatasi laju
+    minimum sesuai FIELD_POLICIES, ditambah keyframe lengkap secara berkala.
+    Pesan: {"type": "telemetry", "kind": "key" | "delta", "data": {...}}
+    """
+
+    def __init__(self, policies=FIELD_POLICIES, keyframe_interval=KEYFRAME_INTERVAL_S):
+        self.policies = policies
+        self.keyframe_interval = keyframe_interval
+        self.last_sent = {}       # field -> nilai terakhir yang dikirim
+        self.last_sent_time = {}  # field -> waktu kirim terakhir
+        self.last_keyframe = None
+        self.stats = {"key": 0, "delta": 0, "bytes": 0}
+
+    def next_message(self, data, now):
+        """Pesan berikutnya untuk dikirim, atau None jika tidak ada yang perlu dikirim."""
+        if self.last_keyframe is None or now - self.last_keyframe >= self.keyframe_interval:
+            self.last_keyframe = now
+            changes, kind = dict(data), "key"
+        else:
+            changes, kind = {}, "delta"
+            for field, (min_interval, min_change) in self.policies.items():
+                value = data.get(field)
+                if now - self.last_sent_time.get(field, 0) < min_interval:
+                    continue
+                if _changed(self.last_sent.get(field), value, min_change):
+                    changes[field] = value
+            if not changes:
+                return None
+        for field, value in changes.items():
+            self.last_sent[field] = value
+            self.last_sent_time[field] = now
+        self.stats[kind] += 1
+        return {"type": "telemetry", "kind": kind, "data": changes}
+
+    def encode(self, payload):
+        """Serialisasi pesan sesuai TELEMETRY_ENCODING; delta merujuk nomor keyframe terakhir."""
+        if TELEMETRY_ENCODING == "binary":
+            return pack_telemetry(payload["kind"], payload["data"], self.stats["key"])
+        return json.dumps(payload, separators=(',', ':'))
 
 async def send_telemetry(websocket):
-    """Tugas yang berjalan di background untuk mengirim data telemetri secara berkala."""
+    """Tugas yang berjalan di background untuk mengirim perubahan telemetri."""
+    sender = TelemetrySender()  # Koneksi baru selalu diawali keyframe
     while True:
-        # Buat paket data yang akan dikirim
-        payload = {
-            "type": "telemetry",
-            "data": telemetry_data
-        }
-        try:
-            await websocket.send(json.dumps(payload))
-            print(f"Data telemetri terkirim -> Lat: {telemetry_data['lat']:.4f}, Lon: {telemetry_data['lon']:.4f}, V: {telemetry_data['voltage']:.2f}V", end="\r")
-        except websockets.ConnectionClosed:
-            print("\nKoneksi terputus saat mengirim, menunggu koneksi ulang...")
-            break # Keluar dari loop ini agar loop utama bisa mencoba konek ulang
-        
-        await asyncio.sleep(1.0 / SEND_RATE_HZ)
+        payload = sender.next_message(telemetry_data, time.monotonic())
+        if payload is not None:
+            try:
+                message = sender.encode(payload)
+                await websocket.send(message)
+                sender.stats["bytes"] += len(message)
+                lat, lon, voltage = telemetry_data['lat'], telemetry_data['lon'], telemetry_data['voltage']
+                print(f"Telemetri -> Lat: {lat or 0:.4f}, Lon: {lon or 0:.4f}, V: {voltage or 0:.2f}V "
+                      f"(key {sender.stats['key']}, delta {sender.stats['delta']}, {sender.stats['bytes'] // 1024} KB)", end="\r")
+            except websockets.ConnectionClosed:
+                print("\nKoneksi terputus saat mengirim, menunggu koneksi ulang...")
+                break # Keluar dari loop ini agar loop utama bisa mencoba konek ulang
+
+        await asyncio.sleep(1.0 / SEND_TICK_HZ)
 
 async def mavlink_logger():
     """Fungsi utama yang mengelola koneksi dan tugas."""
@@ -79,27 +170,36 @@ async def mavlink_logger():
         print(f"KRITIS: Gagal terhubung ke MAVLink: {e}")
         return
 
-    while True:
-        try:
-            async with websockets.connect(WEBSOCKET_URI) as websocket:
-                print(f"\nBerhasil terhubung ke WebSocket Server di {WEBSOCKET_URI}")
-                
-                # Jalankan kedua tugas (membaca dan mengirim) secara bersamaan
-                # Jika salah satu gagal (misal koneksi putus), keduanya akan berhenti
-                await asyncio.gather(
-                    read_mavlink(master),
-                    send_telemetry(websocket)
-                )
-
-        except (websockets.exceptions.ConnectionClosed, ConnectionRefusedError) as e:
-            print(f"\nKoneksi WebSocket terputus: {e}. Mencoba terhubung kembali dalam 5 detik...")
-            await asyncio.sleep(5)
-        except KeyboardInterrupt:
-            print("\nLogger dihentikan.")
-            break
-        except Exception as e:
-            print(f"\nTerjadi error: {e}. Mencoba lagi...")
-            await asyncio.sleep(5)
+    # Pembacaan serial berjalan terus di thread sendiri, juga saat websocket sedang terputus
+    queue = asyncio.Queue(maxsize=READ_QUEUE_SIZE)
+    stop_event = threading.Event()
+    reader = threading.Thread(target=mavlink_reader_thread, name="mavlink-reader",
+                              args=(master, asyncio.get_running_loop(), queue, stop_event), daemon=True)
+    reader.start()
+    updater = asyncio.create_task(apply_updates(queue))
+
+    try:
+        while True:
+            try:
+                uri = f"{WEBSOCKET_URI}?{urlencode({'vehicle_id': VEHICLE_ID, 'mission_id': MISSION_ID})}"
+                async with websockets.connect(uri) as websocket:
+                    print(f"\nBerhasil terhubung ke WebSocket Server di {WEBSOCKET_URI}")
+                    
+                    await send_telemetry(websocket)
+
+            except (websockets.exceptions.ConnectionClosed, ConnectionRefusedError) as e:
+                print(f"\nKoneksi WebSocket terputus: {e}. Mencoba terhubung kembali dalam 5 detik...")
+                await asyncio.sleep(5)
+            except KeyboardInterrupt:
+                print("\nLogger dihentikan.")
+                break
+            except Exception as e:
+                print(f"\nTerjadi error: {e}. Mencoba lagi...")
+                await asyncio.sleep(5)
+    finally:
+        stop_event.set()
+        updater.cancel()
+        reader.join(timeout=2)
 
 if __name__ == "__main__":
     asyncio.run(mavlink_logger())
@@ -0,0 +1,102 @@
+import struct
+
+# =================================================================
+# Format biner ringkas untuk telemetri (logger -> /ws/telemetry -> /ws/frontend)
+# =================================================================
+# Semua angka big-endian:
+#   magic         2 byte   b'TK' (keyframe, state lengkap) atau b'TD' (delta)
+#   versi         1 byte   TELEMETRY_FRAME_VERSION
+#   flags         1 byte   (cadangan, saat ini 0)
+#   key_seq       uint16   nomor keyframe; delta merujuk keyframe terakhir
+#   present_mask  uint16   bit ke-i = field ID i ada di frame ini
+#   null_mask     uint16   bit ke-i = field ID i bernilai null (tanpa byte nilai)
+#   nilai         field yang ada dan tidak null, urut field ID, tipe sesuai TELEMETRY_FIELDS
+#
+# Delta hanya berisi field yang berubah dan nilainya absolut (bukan selisih),
+# sehingga delta yang hilang hanya membuat field tertinggal sampai keyframe
+# berikutnya. Delta dengan key_seq berbeda dari keyframe terakhir diabaikan.
+#
+# Salinan dari backend/telemetry_protocol.py (logger dijalankan terpisah dari
+# backend); decoder-nya ada di frontend/index.html. Ketiganya harus tetap sama.
+# =================================================================
+
+KEYFRAME_MAGIC = b'TK'
+DELTA_MAGIC = b'TD'
+TELEMETRY_FRAME_VERSION = 1
+TELEMETRY_FRAME_HEADER = struct.Struct('!2sBBHHH')
+
+# Field ID = posisi dalam tuple ini (maksimal 16 field)
+TELEMETRY_FIELDS = (
+    ("roll", "f"),
+    ("pitch", "f"),
+    ("yaw", "f"),
+    ("lat", "d"),  # float32 hanya ~7 digit, tidak cukup untuk koordinat
+    ("lon", "d"),
+    ("groundspeed", "f"),
+    ("heading", "h"),
+    ("voltage", "f"),
+    ("current", "f"),
+)
+_FIELD_IDS = {name: i for i, (name, _) in enumerate(TELEMETRY_FIELDS)}
+
+
+def is_telemetry_frame(data):
+    return data[:2] in (KEYFRAME_MAGIC, DELTA_MAGIC)
+
+
+def pack_telemetry(kind, data, key_seq):
+    """Mengemas dict telemetri ('key' atau 'delta') menjadi satu pesan biner. Field tak dikenal diabaikan."""
+    present = nulls = 0
+    fmt, values = '!', []
+    for i, (name, code) in enumerate(TELEMETRY_FIELDS):
+        if name not in data:
+            continue
+        present |= 1 << i
+        value = data[name]
+        if value is None:
+            nulls |= 1 << i
+            continue
+        fmt += code
+        values.append(round(value) if code == 'h' else value)
+    magic = KEYFRAME_MAGIC if kind == "key" else DELTA_MAGIC
+    header = TELEMETRY_FRAME_HEADER.pack(magic, TELEMETRY_FRAME_VERSION, 0, key_seq & 0xFFFF, present, nulls)
+    return header + struct.pack(fmt, *values)
+
+
+def unpack_telemetry(data):
+    """Memecah pesan biner menjadi (kind, key_seq, data)."""
+    magic, version, _flags, key_seq, present, nulls = TELEMETRY_FRAME_HEADER.unpack_from(data)
+    if magic not in (KEYFRAME_MAGIC, DELTA_MAGIC) or version != TELEMETRY_FRAME_VERSION:
+        raise ValueError(f"Frame telemetri tidak dikenal (magic={magic!r}, versi={version})")
+    fmt, names, result = '!', [], {}
+    for i, (name, code) in enumerate(TELEMETRY_FIELDS):
+        if not present & (1 << i):
+            continue
+        result[name] = None
+        if not nulls & (1 << i):
+            fmt += code
+            names.append(name)
+    result.update(zip(names, struct.unpack_from(fmt, data, TELEMETRY_FRAME_HEADER.size)))
+    return ("key" if magic == KEYFRAME_MAGIC else "delta"), key_seq, result
+
+
+class TelemetryState:
+    """
+    State telemetri terakhir hasil menggabungkan keyframe dan delta.
+    `apply()` mengembalikan False jika delta merujuk keyframe yang tidak
+    diterima (state dibiarkan sampai keyframe berikutnya).
+    """
+
+    def __init__(self):
+        self.data = {}
+        self.key_seq = None
+
+    def apply(self, kind, data, key_seq=None):
+        if kind == "key":
+            self.data = dict(data)
+            self.key_seq = key_seq
+            return True
+        if key_seq is not None and key_seq != self.key_seq:
+            return False
+        self.data.update(data)
+        return True